@@ -31,6 +31,22 @@ DEFAULT_CONFIG = {
     "validation_upload_valid_items": "individual_validation.upload_valid_items",
     "validation_upload_valid_items_workflow": "individual-upload-valid-items.individual-upload-valid-items",
     "enable_python_workflows": True,
+    "import_chunk_size": 10000,
+    "import_bulk_create_batch_size": 1000,
+    "enable_async_import": False,
+    "import_duplicate_upload_policy": "attach",
+    "enable_import_memory_tracing": False,
+    "enable_columnar_validation": False,
+    "validation_workers": 1,
+    "validation_slice_size": 10000,
+    "enable_streaming_validation": False,
+    "validation_page_size": 10000,
+    "enable_registry_uniqueness_validation": False,
+    "enable_schema_validation": False,
+    "validation_backend": "python",
+    "validation_write_batch_size": 10000,
+    "validation_memo_size": 10000,
+    "sql_procedure_batch_size": 0,
     "enable_maker_checker_logic_import": True,
     "enable_maker_checker_for_individual_upload": True,
     "enable_maker_checker_for_group_upload": True,
@@ -74,6 +90,23 @@ class IndividualConfig(AppConfig):
     enable_python_workflows = None
     enable_maker_checker_logic_import = None
 
+    import_chunk_size = None
+    import_bulk_create_batch_size = None
+    enable_async_import = None
+    import_duplicate_upload_policy = None
+    enable_import_memory_tracing = None
+    enable_columnar_validation = None
+    validation_workers = None
+    validation_slice_size = None
+    enable_streaming_validation = None
+    validation_page_size = None
+    enable_registry_uniqueness_validation = None
+    enable_schema_validation = None
+    validation_backend = None
+    validation_write_batch_size = None
+    validation_memo_size = None
+    sql_procedure_batch_size = None
+
     validation_upload_valid_items_workflow = None
     validation_upload_valid_items = None
 
@@ -93,6 +126,8 @@ class IndividualConfig(AppConfig):
         self.__initialize_custom_filters()
         self._set_up_workflows()
         self.__register_masking_class()
+        self.__register_import_readers()
+        self.__register_column_validation_rules()
 
     @classmethod
     def __load_config(cls, cfg):
@@ -139,6 +174,22 @@ class IndividualConfig(AppConfig):
             masking_class_list=[IndividualMask(), IndividualHistoryMask()]
         )
 
+    @classmethod
+    def __register_import_readers(cls):
+        from individual.import_readers import ImportReaderRegistryPoint, DEFAULT_IMPORT_READERS
+        for reader in DEFAULT_IMPORT_READERS:
+            if not reader.is_available():
+                logger.info('%s requires %s, %s files are not supported', type(reader).__name__,
+                            ', '.join(reader.required_modules), ', '.join(reader.content_types))
+                continue
+            ImportReaderRegistryPoint.register_reader(reader)
+
+    @classmethod
+    def __register_column_validation_rules(cls):
+        from individual.import_validation import ColumnValidationRuleRegistryPoint, DEFAULT_COLUMN_VALIDATION_RULES
+        for rule in DEFAULT_COLUMN_VALIDATION_RULES:
+            ColumnValidationRuleRegistryPoint.register_rule(rule)
+
     def _set_up_workflows(self):
         from workflow.systems.python import PythonWorkflowAdaptor
         from individual.workflows import process_import_individuals_workflow, \
@@ -187,3 +238,9 @@ class IndividualConfig(AppConfig):
         if filename:
             return f"individual_upload/{filename}"
         return f"individual_upload"
+
+    @staticmethod
+    def get_individual_upload_chunk_path(upload_id, chunk_index=None):
+        if chunk_index is not None:
+            return f"individual_upload/.chunks/{upload_id}/{chunk_index:08d}"
+        return f"individual_upload/.chunks/{upload_id}"
@@ -81,8 +81,36 @@ class IndividualHistoryGQLType(DjangoObjectType):
         return queryset.filter(id__in=accessible_uuids)
 
 
+class UploadValidationFieldErrorGQLType(graphene.ObjectType):
+    field_name = graphene.String()
+    note = graphene.String()
+    count = graphene.Int()
+
+
+class UploadValidationStatisticsGQLType(graphene.ObjectType):
+    total = graphene.Int()
+    valid = graphene.Int()
+    invalid = graphene.Int()
+    percentage_of_invalid_items = graphene.Float()
+    field_errors = graphene.List(UploadValidationFieldErrorGQLType)
+
+    def resolve_field_errors(self, info):
+        # Counts of listed uploads are annotated, the histogram is fetched only if it's requested
+        if 'field_errors' not in self:
+            from individual.utils import fetch_upload_validation_statistics
+            return fetch_upload_validation_statistics(self['upload_id'])['field_errors']
+        return self['field_errors']
+
+
 class IndividualDataSourceUploadGQLType(DjangoObjectType):
     uuid = graphene.String(source='uuid')
+    validation_statistics = graphene.Field(UploadValidationStatisticsGQLType)
+
+    def resolve_validation_statistics(self, info):
+        from individual.services import IndividualDataSourceUploadStatisticsService
+        if hasattr(self, 'validation_total'):
+            return IndividualDataSourceUploadStatisticsService.get_annotated_statistics(self)
+        return IndividualDataSourceUploadStatisticsService.get_statistics(self.id)
 
     class Meta:
         model = IndividualDataSourceUpload
@@ -92,6 +120,7 @@ class IndividualDataSourceUploadGQLType(DjangoObjectType):
             "status": ["iexact", "istartswith", "icontains"],
             "source_type": ["iexact", "istartswith", "icontains"],
             "source_name": ["iexact", "istartswith", "icontains"],
+            "content_digest": ["exact"],
 
             "date_created": ["exact", "lt", "lte", "gt", "gte"],
             "date_updated": ["exact", "lt", "lte", "gt", "gte"],
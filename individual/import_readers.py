@@ -0,0 +1,355 @@
+"""
+Readers of the import files, shared by the import service and other spreadsheet consumers.
+Every reader yields the file content as DataFrame batches of a bounded size, so the whole file never has to be
+materialized in memory at once. Additional readers can be registered with ImportReaderRegistryPoint.
+"""
+import datetime
+import importlib.util
+import zipfile
+from abc import ABCMeta, abstractmethod
+from typing import Iterable, Iterator, Optional
+from xml.etree import ElementTree
+
+import pandas as pd
+
+
+class ImportReaderRegistryPoint:
+    REGISTERED_READERS = {}
+
+    @classmethod
+    def register_reader(cls, reader: 'ImportReader'):
+        for content_type in reader.content_types:
+            cls.REGISTERED_READERS[content_type] = reader
+
+    @classmethod
+    def is_supported(cls, content_type) -> bool:
+        return content_type in cls.REGISTERED_READERS
+
+    @classmethod
+    def get_reader(cls, content_type) -> 'ImportReader':
+        if content_type not in cls.REGISTERED_READERS:
+            raise ValueError("Unsupported content type: {}".format(content_type))
+        return cls.REGISTERED_READERS[content_type]
+
+
+class ImportReader(metaclass=ABCMeta):
+    content_types = ()
+    # Optional packages the reader depends on, see extras_require of setup.py
+    required_modules = ()
+    # Readers of columnar formats load only the columns accepted by the import
+    column_projection = False
+    read_batch_size = 10000
+
+    @abstractmethod
+    def iter_batches(self, file, batch_size: int, columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        pass
+
+    def read(self, file, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Readers supporting pandas options take them as keyword arguments, the others raise TypeError on them.
+        """
+        batches = list(self.iter_batches(file, self.read_batch_size, columns))
+        if not batches:
+            return pd.DataFrame()
+        return pd.concat(batches, ignore_index=True)
+
+    def is_available(self) -> bool:
+        return all(importlib.util.find_spec(module) is not None for module in self.required_modules)
+
+
+class CsvReader(ImportReader):
+    content_types = ('text/csv',)
+
+    def iter_batches(self, file, batch_size, columns=None):
+        usecols = _column_filter(columns)
+        for chunk in pd.read_csv(file, chunksize=batch_size, usecols=usecols):
+            yield _restore_integers(chunk)
+
+    def read(self, file, columns=None, **kwargs):
+        return pd.read_csv(file, usecols=_column_filter(columns), **kwargs)
+
+
+class SpreadsheetReader(ImportReader, metaclass=ABCMeta):
+    """
+    Base of the row oriented readers, first row of the first sheet is the header.
+    Date cells are passed as ISO strings, dates are staged in the same format as in the csv files.
+    """
+
+    @abstractmethod
+    def _iter_rows(self, file) -> Iterator[tuple]:
+        pass
+
+    def iter_batches(self, file, batch_size, columns=None):
+        rows = self._iter_rows(file)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = _normalize_header(header)
+        columns = set(columns) if columns is not None else None
+        selected = [index for index, name in enumerate(header) if columns is None or name in columns]
+        selected_header = [header[index] for index in selected]
+
+        batch = []
+        for row in rows:
+            if all(_is_empty(value) for value in row):
+                continue
+            batch.append([_cell_value(row[index]) if index < len(row) else None for index in selected])
+            if len(batch) >= batch_size:
+                yield pd.DataFrame.from_records(batch, columns=selected_header)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=selected_header)
+
+    def read(self, file, columns=None, **kwargs):
+        if kwargs:
+            # pandas specific options are supported only by the eager reader
+            return pd.read_excel(file, usecols=_column_filter(columns), **kwargs)
+        return super().read(file, columns)
+
+
+class XlsxReader(SpreadsheetReader):
+    content_types = ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',)
+    required_modules = ('openpyxl',)
+
+    def _iter_rows(self, file):
+        import openpyxl
+        # Read-only mode parses the sheet xml lazily instead of building the whole workbook
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
+class XlsReader(SpreadsheetReader):
+    content_types = ('application/vnd.ms-excel',)
+    required_modules = ('xlrd',)
+
+    def _iter_rows(self, file):
+        import xlrd
+        # BIFF format is limited to 65536 rows per sheet, on_demand skips loading of the remaining sheets
+        workbook = xlrd.open_workbook(file_contents=file.read(), on_demand=True)
+        try:
+            sheet = workbook.sheet_by_index(0)
+            for cells in sheet.get_rows():
+                yield tuple(self._xls_cell_value(cell, workbook.datemode) for cell in cells)
+        finally:
+            workbook.release_resources()
+
+    @staticmethod
+    def _xls_cell_value(cell, datemode):
+        import xlrd
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate_as_datetime(cell.value, datemode)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_NUMBER and cell.value == int(cell.value):
+            return int(cell.value)
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return None
+        return cell.value
+
+
+class OdsReader(SpreadsheetReader):
+    """
+    Streams content.xml of the document, processed rows are removed from the parsed tree.
+    """
+    content_types = ('application/vnd.oasis.opendocument.spreadsheet',)
+
+    _table_ns = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+    _office_ns = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+    _table = f'{{{_table_ns}}}table'
+    _row = f'{{{_table_ns}}}table-row'
+    _cells = (f'{{{_table_ns}}}table-cell', f'{{{_table_ns}}}covered-table-cell')
+    _rows_repeated = f'{{{_table_ns}}}number-rows-repeated'
+    _columns_repeated = f'{{{_table_ns}}}number-columns-repeated'
+
+    def _iter_rows(self, file):
+        with zipfile.ZipFile(file) as document, document.open('content.xml') as content:
+            parents = []
+            for event, element in ElementTree.iterparse(content, events=('start', 'end')):
+                if event == 'start':
+                    parents.append(element)
+                    continue
+                parents.pop()
+                if element.tag == self._table:
+                    # Only the first sheet is imported
+                    return
+                if element.tag != self._row:
+                    continue
+                row = self._row_values(element)
+                if row:
+                    for _ in range(int(element.get(self._rows_repeated, 1))):
+                        yield row
+                element.clear()
+                if parents:
+                    parents[-1].remove(element)
+
+    def _row_values(self, element):
+        values = []
+        for cell in element:
+            if cell.tag not in self._cells:
+                continue
+            value = self._ods_cell_value(cell)
+            values.extend([value] * int(cell.get(self._columns_repeated, 1)))
+        # Trailing empty cells are usually repeated up to the sheet width
+        while values and values[-1] is None:
+            values.pop()
+        return tuple(values)
+
+    def _ods_cell_value(self, cell):
+        value_type = cell.get(f'{{{self._office_ns}}}value-type')
+        if value_type in ('float', 'percentage', 'currency'):
+            value = float(cell.get(f'{{{self._office_ns}}}value'))
+            return int(value) if value.is_integer() else value
+        if value_type == 'boolean':
+            return cell.get(f'{{{self._office_ns}}}boolean-value') == 'true'
+        if value_type == 'date':
+            return cell.get(f'{{{self._office_ns}}}date-value')
+        if value_type == 'time':
+            return cell.get(f'{{{self._office_ns}}}time-value')
+        text = '\n'.join(''.join(paragraph.itertext()) for paragraph in cell)
+        return text if value_type or text else None
+
+
+class ParquetReader(ImportReader):
+    content_types = ('application/vnd.apache.parquet', 'application/x-parquet')
+    required_modules = ('pyarrow',)
+    column_projection = True
+
+    def iter_batches(self, file, batch_size, columns=None):
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(file)
+        projection = _project_columns(parquet_file.schema_arrow.names, columns)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=projection):
+            yield _arrow_to_dataframe(pa, batch)
+
+    def read(self, file, columns=None):
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(file)
+        table = parquet_file.read(columns=_project_columns(parquet_file.schema_arrow.names, columns))
+        return _arrow_to_dataframe(pa, table)
+
+
+class ArrowReader(ImportReader):
+    content_types = ('application/vnd.apache.arrow.file',)
+    required_modules = ('pyarrow',)
+    column_projection = True
+    stream = False
+
+    def iter_batches(self, file, batch_size, columns=None):
+        pa = _import_pyarrow()
+        if self.stream:
+            reader = pa.ipc.open_stream(file)
+            batches = iter(reader)
+        else:
+            reader = pa.ipc.open_file(file)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+
+        projection = _project_columns(reader.schema.names, columns)
+        for batch in batches:
+            batch = batch.select(projection)
+            # Batches are stored with the writer's size, they are re-sliced to the requested size
+            for offset in range(0, batch.num_rows, batch_size):
+                yield _arrow_to_dataframe(pa, batch.slice(offset, batch_size))
+
+
+class ArrowStreamReader(ArrowReader):
+    content_types = ('application/vnd.apache.arrow.stream',)
+    stream = True
+
+
+DEFAULT_IMPORT_READERS = [
+    CsvReader(),
+    XlsxReader(),
+    XlsReader(),
+    OdsReader(),
+    ParquetReader(),
+    ArrowReader(),
+    ArrowStreamReader(),
+]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise ValueError("Parquet and Arrow imports require the pyarrow package") from exc
+    return pyarrow
+
+
+def _column_filter(columns):
+    if columns is None:
+        return None
+    columns = set(columns)
+    return lambda column: column in columns
+
+
+def _project_columns(file_columns, columns):
+    if columns is None:
+        return list(file_columns)
+    columns = set(columns)
+    return [column for column in file_columns if column in columns]
+
+
+def _restore_integers(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Dtypes are inferred per chunk, a column of integers with a missing value is read as float. Integral values
+    # are restored so the same value is staged as 2 in every chunk, not as 2.0 in the chunks with a gap.
+    for column in chunk.select_dtypes(include='float').columns:
+        values = chunk[column]
+        integral = values.notna() & (values % 1 == 0) & (values.abs() < 2 ** 53)
+        if integral.any():
+            restored = values.astype(object)
+            restored[integral] = [int(value) for value in values[integral]]
+            chunk[column] = restored
+    return chunk
+
+
+def _normalize_header(header):
+    header = list(header)
+    while header and _is_empty(header[-1]):
+        header.pop()
+    return [f'Unnamed: {index}' if _is_empty(name) else str(name) for index, name in enumerate(header)]
+
+
+def _is_empty(value):
+    return value is None or value == ''
+
+
+def _cell_value(value):
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time.min:
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if value == '':
+        return None
+    return value
+
+
+def _arrow_to_dataframe(pa, batch) -> pd.DataFrame:
+    # Temporal columns are cast to ISO strings, staged json keeps dates in the YYYY-MM-DD format
+    # expected by the upload procedures instead of epoch timestamps.
+    arrays = []
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_date(field.type):
+            column = column.cast(pa.string())
+        elif pa.types.is_timestamp(field.type):
+            column = _arrow_timestamp_strings(pa, column)
+        arrays.append(column)
+    names = batch.schema.names
+    if isinstance(batch, pa.Table):
+        return pa.Table.from_arrays(arrays, names=names).to_pandas()
+    return pa.RecordBatch.from_arrays(arrays, names=names).to_pandas()
+
+
+def _arrow_timestamp_strings(pa, column):
+    # Same as _cell_value, timestamps at midnight are dates (e.g. dob written by pandas), others keep the time
+    pc = pa.compute
+    dates = pc.cast(column, pa.date32(), safe=False)
+    at_midnight = pc.equal(pc.cast(dates, column.type), column)
+    return pc.if_else(at_midnight, dates.cast(pa.string()), pc.strftime(column, format='%Y-%m-%dT%H:%M:%S'))
@@ -0,0 +1,12 @@
+from individual.import_validation.rules import (
+    ColumnValidationResult,
+    ColumnValidationRule,
+    ColumnValidationRuleRegistryPoint,
+    EmailColumnValidationRule,
+    DEFAULT_COLUMN_VALIDATION_RULES,
+)
+from individual.import_validation.engine import ColumnarValidator
+from individual.import_validation.schema import CompiledSchema, compile_schema
+from individual.import_validation.memo import ValidationMemo
+from individual.import_validation.pool import ValidationWorkerPool
+from individual.import_validation.sql import SqlUploadValidation
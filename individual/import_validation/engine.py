@@ -0,0 +1,173 @@
+import math
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from individual.import_validation.rules import ColumnValidationResult, ColumnValidationRuleRegistryPoint
+
+UNIQUENESS_NOTE = 'Duplicated value'
+REGISTERED_NOTE = 'Value already registered'
+# Notes of the checks depending on other rows, their result can change without a change of the row
+CROSS_ROW_NOTES = (UNIQUENESS_NOTE, REGISTERED_NOTE)
+
+
+def is_missing_value(value):
+    """
+    Missing keys and nulls of the staged json (NaN in dataframes) are not validated by the calculations,
+    required fields are checked by the schema.
+    """
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def calculate_values(calculation, validation_name, calculation_uuid, field_name, values, memo=None):
+    """
+    Scalar fallback, validates values one by one with the validation calculation.
+    With a ValidationMemo, pure calculations run once per distinct value.
+    """
+    if memo is not None:
+        return [
+            memo.calculate(calculation, validation_name, calculation_uuid, field_name, value)
+            for value in values
+        ]
+    return [
+        calculation.calculate_if_active_for_object(
+            validation_name,
+            calculation_uuid,
+            field_name=field_name,
+            field_value=value
+        )
+        for value in values
+    ]
+
+
+class ColumnarValidator:
+    """
+    Validates staged rows column by column. Fields with validationCalculation use the ColumnValidationRule
+    registered for the calculation name, other calculations are called for every value. If the upload id and
+    a ValidationWorkerPool are provided, such calculations run in the pool workers that fetch the rows themselves.
+    Uniqueness is checked on the whole column, when the dataframe is only a page of the upload, values duplicated
+    in the whole upload are provided by field in duplicated_values. If registered_values lookup is provided
+    (see individual.utils.fetch_registered_values), values of the unique fields are also checked against
+    the existing individuals with one lookup per field, a row updating the individual owning the value is valid.
+    If a CompiledSchema is provided, its type, required, enum and date checks run first.
+    Results of pure calculations are reused for repeated values if a ValidationMemo is provided.
+
+    Result has the format of IndividualImportService.process_chunk, except that row contains only the id
+    of the data source and validations contain only failed checks.
+    """
+
+    CROSS_ROW_NOTES = CROSS_ROW_NOTES
+
+    def __init__(self, properties, calculation, calculation_uuid, upload_id=None, pool=None, duplicated_values=None,
+                 registered_values=None, schema=None, memo=None):
+        self.properties = properties
+        self.calculation = calculation
+        self.calculation_uuid = calculation_uuid
+        self.upload_id = upload_id
+        self.pool = pool
+        self.duplicated_values = duplicated_values
+        self.registered_values = registered_values
+        self.schema = schema
+        self.memo = memo
+        self._active_rules = {}
+
+    def validate(self, dataframe: pd.DataFrame, slice_bounds=None, pooled=True, cross_row_only=False) -> List[dict]:
+        """
+        slice_bounds limit data sources validated by the pool workers, by default the whole upload is validated.
+        With pooled False, calculations run in the current process. With cross_row_only, only the checks
+        depending on other rows (uniqueness) are run.
+        """
+        failures = {}
+        pooled_validations = []
+        use_pool = pooled and self.pool is not None and self.upload_id
+        if self.schema is not None and not cross_row_only:
+            for key, field, result in self.schema.validate(dataframe):
+                self._add_failures(failures, key, field, result)
+
+        for field, field_properties in self.properties.items():
+            if field not in dataframe.columns:
+                continue
+            values = dataframe[field]
+            # Missing and null values are skipped by the rules and uniqueness, like by the database backend
+            missing = values.map(is_missing_value).astype(bool)
+
+            if "validationCalculation" in field_properties and not cross_row_only:
+                validation_name = field_properties["validationCalculation"]["name"]
+                rule = ColumnValidationRuleRegistryPoint.get_rule(validation_name)
+                if rule is not None:
+                    # Inactive calculation doesn't validate the values, like calculate_if_active_for_object
+                    if self._is_rule_active(rule):
+                        result = rule.validate(values, field)
+                        result = ColumnValidationResult(result.valid | missing, result.notes)
+                        self._add_failures(failures, field, field, result)
+                elif use_pool:
+                    pooled_validations.append((field, validation_name))
+                else:
+                    self._add_failures(failures, field, field, self._calculate(validation_name, values, field))
+
+            if "uniqueness" in field_properties:
+                if self.duplicated_values is not None:
+                    duplicated = values.isin(self.duplicated_values.get(field, ()))
+                else:
+                    duplicated = values.duplicated(keep=False)
+                result = ColumnValidationResult(~duplicated | missing, UNIQUENESS_NOTE)
+                self._add_failures(failures, f'{field}_uniqueness', field, result)
+                if self.registered_values is not None:
+                    self._add_failures(failures, f'{field}_registered', field, self._check_registered(dataframe, field))
+
+        row_ids = dataframe['id'].tolist()
+        if pooled_validations:
+            positions = {str(row_id): position for position, row_id in enumerate(row_ids)}
+            pooled_failures = self.pool.validate_upload(self.upload_id, pooled_validations, slice_bounds, self.memo)
+            for source_id, validations in pooled_failures.items():
+                position = positions.get(str(source_id))
+                if position is not None:
+                    failures.setdefault(position, {}).update(validations)
+
+        return [
+            {'row': {'id': row_id}, 'validations': failures.get(position, {})}
+            for position, row_id in enumerate(row_ids)
+        ]
+
+    def _is_rule_active(self, rule):
+        if rule.name not in self._active_rules:
+            self._active_rules[rule.name] = rule.is_active(self.calculation, self.calculation_uuid)
+        return self._active_rules[rule.name]
+
+    def _check_registered(self, dataframe, field):
+        values = dataframe[field]
+        registered = self.registered_values(field, values.dropna().unique().tolist())
+        # Update uploads identify the updated individual with ID, its own value is not a conflict.
+        #  UUIDs are compared case-insensitively, the ID can be written in upper case.
+        own_ids = [None] * len(values)
+        if 'ID' in dataframe.columns:
+            own_ids = dataframe['ID'].astype(str).str.lower().tolist()
+        registered = {value: {str(id_).lower() for id_ in ids} for value, ids in registered.items()}
+        valid = [
+            not pd.notna(value) or not registered.get(value, set()) - {own_id}
+            for value, own_id in zip(values.tolist(), own_ids)
+        ]
+        return ColumnValidationResult(pd.Series(valid, index=values.index), REGISTERED_NOTE)
+
+    def _calculate(self, validation_name, values, field):
+        # Same as in the pool workers, missing values are not validated
+        present = [not is_missing_value(value) for value in values.tolist()]
+        calculated = iter(calculate_values(
+            self.calculation, validation_name, self.calculation_uuid, field, values[present].tolist(), self.memo
+        ))
+        results = [next(calculated) if is_present else None for is_present in present]
+        # Calculation returns no result if it's not active, the value is not validated then
+        valid = [result is None or bool(result.get('success', False)) for result in results]
+        notes = [result.get('note') if result else None for result in results]
+        return ColumnValidationResult(pd.Series(valid, index=values.index), pd.Series(notes, index=values.index))
+
+    @staticmethod
+    def _add_failures(failures, key, field, result: ColumnValidationResult):
+        invalid = np.flatnonzero(~result.valid.to_numpy(dtype=bool))
+        if isinstance(result.notes, pd.Series):
+            notes = result.notes.to_numpy()[invalid]
+        else:
+            notes = [result.notes] * len(invalid)
+        for position, note in zip(invalid.tolist(), notes):
+            failures.setdefault(position, {})[key] = {'success': False, 'field_name': field, 'note': note}
@@ -0,0 +1,93 @@
+"""
+Memoization of validation calculation results for repeated field values. Only calculations declared pure
+(result depends only on the field name and value, see is_pure_validation) are memoized.
+"""
+import math
+from collections import OrderedDict
+
+from individual.import_validation.rules import ColumnValidationRuleRegistryPoint
+
+# NaN is not equal to itself, all NaN values share one key
+_NAN = object()
+
+
+class ValidationMemo:
+    """
+    Bounded LRU of results keyed by (validation name, field, value). Values of different types are not mixed up,
+    1, 1.0 and True have separate results.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._pure = {}
+
+    def is_pure(self, validation_name):
+        if validation_name not in self._pure:
+            self._pure[validation_name] = is_pure_validation(validation_name)
+        return self._pure[validation_name]
+
+    def calculate(self, calculation, validation_name, calculation_uuid, field_name, field_value):
+        """
+        Result of calculate_if_active_for_object, from the memo for pure calculations.
+        """
+        key = self._key(validation_name, field_name, field_value) if self.is_pure(validation_name) else None
+        if key is None:
+            return calculation.calculate_if_active_for_object(
+                validation_name, calculation_uuid, field_name=field_name, field_value=field_value
+            )
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        self.misses += 1
+        result = calculation.calculate_if_active_for_object(
+            validation_name, calculation_uuid, field_name=field_name, field_value=field_value
+        )
+        self._results[key] = result
+        if len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+        return result
+
+    def counters(self):
+        return {'memo_hits': self.hits, 'memo_misses': self.misses}
+
+    def merge(self, counters):
+        """
+        Adds counters of a memo used in another process.
+        """
+        self.hits += counters.get('memo_hits', 0)
+        self.misses += counters.get('memo_misses', 0)
+
+    @staticmethod
+    def _key(validation_name, field_name, field_value):
+        if isinstance(field_value, float) and math.isnan(field_value):
+            field_value = _NAN
+        key = (validation_name, field_name, type(field_value), field_value)
+        try:
+            hash(key)
+        except TypeError:
+            # Lists and dicts are validated every time
+            return None
+        return key
+
+
+def is_pure_validation(validation_name) -> bool:
+    """
+    A calculation is pure if the column rule replacing it or its validation strategy class has `pure = True`.
+    """
+    rule = ColumnValidationRuleRegistryPoint.get_rule(validation_name)
+    if rule is not None and rule.pure:
+        return True
+    return bool(getattr(_get_validation_strategy(validation_name), 'pure', False))
+
+
+def _get_validation_strategy(validation_name):
+    try:
+        from calcrule_validations.strategies import ValidationStrategyStorage
+    except ImportError:
+        return None
+    return ValidationStrategyStorage.choose_strategy(validation_name)
@@ -0,0 +1,172 @@
+"""
+Long-lived process pool validating staged rows with the validation calculations.
+Workers are started once with Django set up and the calculation loaded, tasks only carry the upload id and
+the bounds of the validated slice, rows are fetched by the workers themselves.
+"""
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import threading
+
+from django.db import connection
+
+_worker_calculation = None
+# Results of pure calculations are shared by the slices of one upload, the memo is cleared when the worker
+#  gets a slice of another upload, so results don't outlive a change of the calculation configuration
+_worker_memo = None
+_worker_memo_upload_id = None
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+    from calculation.services import get_calculation_object
+    from individual.apps import IndividualConfig
+    from individual.import_validation.memo import ValidationMemo
+
+    global _worker_calculation
+    _worker_calculation = get_calculation_object(IndividualConfig.validation_calculation_uuid)
+
+
+def _get_worker_memo(upload_id):
+    from individual.apps import IndividualConfig
+    from individual.import_validation.memo import ValidationMemo
+
+    global _worker_memo, _worker_memo_upload_id
+    if _worker_memo is None or _worker_memo_upload_id != upload_id:
+        _worker_memo = ValidationMemo(IndividualConfig.validation_memo_size)
+        _worker_memo_upload_id = upload_id
+    return _worker_memo
+
+
+def validate_sources_slice(upload_id, first_id, last_id, validations):
+    """
+    Runs the calculation validations for the data sources of the upload with ids between the bounds (inclusive).
+    Validations are (field, validation name) pairs. Returns failed validations by data source id
+    and the memo counters of the slice.
+    """
+    from individual.apps import IndividualConfig
+    from individual.import_validation.engine import is_missing_value
+    from individual.models import IndividualDataSource
+
+    calculation_uuid = IndividualConfig.validation_calculation_uuid
+    sources = IndividualDataSource.objects \
+        .filter(upload_id=upload_id, is_deleted=False, id__gte=first_id, id__lte=last_id) \
+        .values_list('id', 'json_ext')
+
+    memo = _get_worker_memo(str(upload_id))
+    hits, misses = memo.hits, memo.misses
+    failures = {}
+    for source_id, json_ext in sources.iterator():
+        for field, validation_name in validations:
+            if is_missing_value(json_ext.get(field)):
+                continue
+            result = memo.calculate(_worker_calculation, validation_name, calculation_uuid, field, json_ext[field])
+            if result is not None and not result.get('success', False):
+                failures.setdefault(str(source_id), {})[field] = {
+                    'success': False, 'field_name': field, 'note': result.get('note')
+                }
+    return failures, {'memo_hits': memo.hits - hits, 'memo_misses': memo.misses - misses}
+
+
+class ValidationWorkerPool:
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Returns the pool shared by all validations of the process, it's created on the first use.
+        Spawned workers don't inherit database connections of the parent process.
+        """
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=cls.get_workers_number(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown()
+                cls._executor = None
+
+    @staticmethod
+    def get_workers_number():
+        # 1 validates in the current process, 0 starts one worker per CPU
+        from individual.apps import IndividualConfig
+        if IndividualConfig.validation_workers == 0:
+            return os.cpu_count() or 1
+        return IndividualConfig.validation_workers or 1
+
+    @staticmethod
+    def can_dispatch():
+        # Workers use their own connections, rows staged in an open transaction are not visible to them.
+        # Daemonic processes (e.g. celery prefork workers) are not allowed to start the pool processes.
+        return not connection.in_atomic_block and not multiprocessing.current_process().daemon
+
+    @classmethod
+    def validate_upload(cls, upload_id, validations, slice_bounds=None, memo=None):
+        """
+        Validates data sources of the upload in the given (first id, last id) slices, by default the whole upload
+        in slices of validation_slice_size rows. Returns failed validations by data source id.
+        Memo counters of the workers are added to the given ValidationMemo.
+        """
+        from individual.apps import IndividualConfig
+
+        if slice_bounds is None:
+            slice_bounds = cls._slice_bounds(upload_id, IndividualConfig.validation_slice_size)
+        executor = cls.get_executor()
+        futures = [
+            executor.submit(validate_sources_slice, upload_id, first_id, last_id, validations)
+            for first_id, last_id in slice_bounds
+        ]
+        failures = {}
+        for future in concurrent.futures.as_completed(futures):
+            slice_failures, memo_counters = future.result()
+            failures.update(slice_failures)
+            if memo is not None:
+                memo.merge(memo_counters)
+        return failures
+
+    @classmethod
+    def split_bounds(cls, source_ids, parts=None):
+        """
+        Splits ids ordered by the database into at most `parts` slices, by default one slice per worker.
+        """
+        parts = parts or cls.get_workers_number()
+        slice_size = max(1, math.ceil(len(source_ids) / parts))
+        return [
+            (source_ids[start], source_ids[min(start + slice_size, len(source_ids)) - 1])
+            for start in range(0, len(source_ids), slice_size)
+        ]
+
+    @staticmethod
+    def _slice_bounds(upload_id, slice_size):
+        from individual.models import IndividualDataSource
+
+        source_ids = IndividualDataSource.objects \
+            .filter(upload_id=upload_id, is_deleted=False) \
+            .order_by('id') \
+            .values_list('id', flat=True)
+
+        bounds = []
+        first_id = last_id = None
+        count = 0
+        for source_id in source_ids.iterator():
+            if first_id is None:
+                first_id = source_id
+            last_id = source_id
+            count += 1
+            if count == slice_size:
+                bounds.append((first_id, last_id))
+                first_id, count = None, 0
+        if first_id is not None:
+            bounds.append((first_id, last_id))
+        return bounds
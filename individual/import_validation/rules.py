@@ -0,0 +1,88 @@
+"""
+Column validation rules, vectorized counterparts of the validation calculation strategies.
+A rule receives all values of a field as pandas Series and returns the validity mask with notes at once.
+"""
+import re
+from abc import ABCMeta, abstractmethod
+from typing import NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+
+
+class ColumnValidationResult(NamedTuple):
+    # True for valid values, aligned with the validated Series
+    valid: pd.Series
+    # Note of every invalid value, a single string is used for all of them
+    notes: Union[pd.Series, str]
+
+
+class ColumnValidationRule(metaclass=ABCMeta):
+    # Name of the validation calculation strategy (validationCalculation.name in individual_schema) the rule replaces
+    name = None
+    # Result of the replaced calculation depends only on the field and its value, the calculation can be memoized
+    #  when it's called for every value (row by row validation), see ValidationMemo
+    pure = False
+
+    @abstractmethod
+    def validate(self, values: pd.Series, field_name: str) -> ColumnValidationResult:
+        pass
+
+    def is_active(self, calculation, calculation_uuid) -> bool:
+        """
+        The rule is run only if the validation calculation would run the strategy, inactive strategies
+        return no result from calculate_if_active_for_object and the values are not validated.
+        """
+        return calculation is not None and bool(calculation.active_for_object(self.name, calculation_uuid))
+
+    def sql_predicate(self) -> Optional[Tuple[str, list]]:
+        """
+        PostgreSQL predicate of a valid value with its parameters, used by the database validation backend.
+        The predicate refers to the json value as {value} (jsonb) and to its text as {text}.
+        Rules without a predicate are run in python.
+        """
+        return None
+
+
+class ColumnValidationRuleRegistryPoint:
+    REGISTERED_RULES = {}
+
+    @classmethod
+    def register_rule(cls, rule: ColumnValidationRule):
+        cls.REGISTERED_RULES[rule.name] = rule
+
+    @classmethod
+    def get_rule(cls, name) -> ColumnValidationRule:
+        """
+        Returns None if the validation has no vectorized rule, such validations use the scalar calculation.
+        """
+        return cls.REGISTERED_RULES.get(name)
+
+
+class EmailColumnValidationRule(ColumnValidationRule):
+    """
+    Vectorized EmailValidationStrategy, checks the format of the whole column with the compiled pattern of the strategy
+    instead of a calculation call per value.
+    """
+    name = 'EmailValidationStrategy'
+    pure = True
+    # Pattern of EmailValidationStrategy.validate (calcrule_validations), applied with re.match like there
+    pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+    # Same pattern for PostgreSQL, $ of re.match also matches before a trailing newline
+    sql_pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9.-]+\n?$"
+    note = 'Invalid email format'
+
+    def __init__(self):
+        self._regex = re.compile(self.pattern)
+
+    def validate(self, values, field_name):
+        # re.match is applied directly, pandas string matching differs from it at a trailing newline
+        valid = values.map(lambda value: isinstance(value, str) and self._regex.match(value) is not None)
+        return ColumnValidationResult(valid.astype(bool), self.note)
+
+    def sql_predicate(self):
+        return "jsonb_typeof({value}) = 'string' AND {text} ~ %s", [self.sql_pattern]
+
+
+DEFAULT_COLUMN_VALIDATION_RULES = [
+    EmailColumnValidationRule(),
+]
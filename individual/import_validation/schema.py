@@ -0,0 +1,149 @@
+"""
+Pre-validation of staged rows against individual_schema. The schema is compiled once into checks of the columns,
+supported keywords are `required`, and `type`, `enum`, `format: date`, `pattern`, `minimum` and `maximum`
+of the properties. Values are checked as they can be read from an import file, numbers and booleans given as text
+are accepted. Empty values are only reported for required fields.
+"""
+import json
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from individual.import_validation.rules import ColumnValidationResult
+
+# Checked even if missing in individual_schema, upload procedures convert dob with to_date(dob, 'YYYY-MM-DD')
+BUILTIN_PROPERTIES = {
+    'dob': {'type': 'string', 'format': 'date'},
+}
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}'
+BOOLEAN_TEXTS = ('true', 'false')
+REQUIRED_NOTE = 'Missing required value'
+
+
+@lru_cache(maxsize=8)
+def compile_schema(schema_text: str) -> 'CompiledSchema':
+    """
+    Compiled schema for the individual_schema config text, cached so the schema is compiled once per config value.
+    """
+    return CompiledSchema(json.loads(schema_text or '{}'))
+
+
+class CompiledSchema:
+
+    def __init__(self, schema: dict):
+        properties = {**BUILTIN_PROPERTIES, **schema.get('properties', {})}
+        self.required = list(schema.get('required', []))
+        self.checks = []
+        for field, field_properties in properties.items():
+            types = field_properties.get('type')
+            if types:
+                types = [types] if isinstance(types, str) else list(types)
+                self.checks.append((field, 'type', types))
+            if 'enum' in field_properties:
+                self.checks.append((field, 'enum', list(field_properties['enum'])))
+            if field_properties.get('format') == 'date':
+                self.checks.append((field, 'format', 'date'))
+            for keyword in ('pattern', 'minimum', 'maximum'):
+                if keyword in field_properties:
+                    self.checks.append((field, keyword, field_properties[keyword]))
+
+    def validate(self, dataframe: pd.DataFrame) -> Iterator[Tuple[str, str, ColumnValidationResult]]:
+        """
+        Yields (validation key, field, result) for every check of the schema.
+        """
+        for field in self.required:
+            if field in dataframe.columns:
+                present = dataframe[field].notna()
+            else:
+                present = pd.Series(False, index=dataframe.index)
+            yield f'{field}_required', field, ColumnValidationResult(present, REQUIRED_NOTE)
+
+        for field, keyword, argument in self.checks:
+            if field not in dataframe.columns:
+                continue
+            values = dataframe[field]
+            present = values.notna()
+            if keyword == 'type':
+                valid = _matches_types(values, argument)
+            elif keyword == 'enum':
+                valid = values.isin(argument) | values.astype(str).isin([str(option) for option in argument])
+            elif keyword == 'format':
+                valid = _is_date(values)
+            elif keyword == 'pattern':
+                # Applies to strings only, like in JSON schema the pattern is not anchored
+                is_text = values.map(lambda value: isinstance(value, str))
+                valid = ~is_text | values.where(is_text, '').astype(str).str.contains(argument, regex=True)
+            else:
+                # Applies to numbers only, other values are reported by the type check
+                numbers = _as_numbers(values)
+                valid = ~(numbers < argument if keyword == 'minimum' else numbers > argument)
+            note = self.check_note(keyword, argument)
+            yield f'{field}_{keyword}', field, ColumnValidationResult(~present | valid, note)
+
+
+    @staticmethod
+    def check_note(keyword, argument):
+        if keyword == 'type':
+            return f"Invalid type, expected {' or '.join(argument)}"
+        if keyword == 'enum':
+            return f"Invalid value, expected one of {', '.join(str(option) for option in argument)}"
+        if keyword == 'format':
+            return 'Invalid date, expected YYYY-MM-DD'
+        if keyword == 'pattern':
+            return f'Invalid value, expected to match {argument}'
+        return f"Value {'lower' if keyword == 'minimum' else 'greater'} than {argument}"
+
+
+def _matches_types(values: pd.Series, types: List[str]) -> pd.Series:
+    valid = pd.Series(False, index=values.index)
+    for type_name in types:
+        if type_name in ('integer', 'number'):
+            numbers = _as_numbers(values)
+            matches = numbers.notna()
+            if type_name == 'integer':
+                matches &= (numbers % 1 == 0)
+        elif type_name == 'boolean':
+            matches = _is_boolean(values)
+        elif type_name == 'string':
+            matches = ~_is_container(values)
+        elif type_name == 'null':
+            matches = values.isna()
+        else:
+            # Types not supported by the pre-validation are not checked
+            matches = pd.Series(True, index=values.index)
+        valid |= matches
+    return valid
+
+
+def _as_numbers(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values):
+        return pd.Series(np.nan, index=values.index)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    is_bool = values.map(lambda value: isinstance(value, bool))
+    return pd.to_numeric(values.where(~is_bool & ~_is_container(values)), errors='coerce').astype(float)
+
+
+def _is_boolean(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values):
+        return pd.Series(True, index=values.index)
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.Series(False, index=values.index)
+    is_bool = values.map(lambda value: isinstance(value, bool))
+    is_text = values.map(lambda value: isinstance(value, str))
+    return is_bool | (is_text & values.astype(str).str.lower().isin(BOOLEAN_TEXTS))
+
+
+def _is_container(values: pd.Series) -> pd.Series:
+    if values.dtype != object:
+        return pd.Series(False, index=values.index)
+    return values.map(lambda value: isinstance(value, (dict, list)))
+
+
+def _is_date(values: pd.Series) -> pd.Series:
+    is_text = values.map(lambda value: isinstance(value, str))
+    texts = values.where(is_text, '').astype(str)
+    parsed = pd.to_datetime(texts.where(texts.str.fullmatch(DATE_PATTERN), None), format='%Y-%m-%d', errors='coerce')
+    return is_text & parsed.notna()
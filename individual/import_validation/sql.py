@@ -0,0 +1,200 @@
+"""
+Set-based validation in PostgreSQL. Checks that can be written as predicates over "Json_ext" (schema keywords,
+uniqueness, column rules with a SQL predicate) are compiled into a single UPDATE of validations of the upload
+data sources, so the rows don't leave the database. Validation calculations without a predicate are left
+to the python validation, see python_properties.
+
+Predicates follow the python checks of CompiledSchema and ColumnarValidator and save the same notes.
+"""
+import json
+from typing import List, Optional, Tuple
+
+from django.db import connection
+
+from individual.import_validation.engine import REGISTERED_NOTE, UNIQUENESS_NOTE
+from individual.import_validation.rules import ColumnValidationRuleRegistryPoint
+from individual.import_validation.schema import REQUIRED_NOTE, CompiledSchema
+
+NUMBER_PATTERN = r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'
+DATE_PATTERN = r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$'
+
+
+def _literal(text):
+    # Keys are inlined like in the upload procedures, % is escaped for the query parameters substitution
+    return "'" + str(text).replace("'", "''").replace('%', '%%') + "'"
+
+
+class SqlUploadValidation:
+
+    def __init__(self, properties: dict, schema: Optional[CompiledSchema] = None, registry_uniqueness=False,
+                 calculation=None, calculation_uuid=None):
+        self.properties = properties
+        self.schema = schema
+        self.registry_uniqueness = registry_uniqueness
+        # Column rules are compiled only if the validation calculation they replace is active
+        self.calculation = calculation
+        self.calculation_uuid = calculation_uuid
+        # Fields with a validation calculation that has to be run in python
+        self.python_properties = {}
+        # Subqueries filtered by the upload, every one takes the upload id as its parameter
+        self._ctes: List[str] = []
+        self._checks: List[Tuple[str, list, str, str]] = []
+        self._compile()
+
+    def execute(self, upload_id) -> int:
+        """
+        Replaces validation errors of the data sources of the upload with the failed compiled checks.
+        Content stamps of the rows are cleared, the next python validation validates them again.
+        Returns the number of validated data sources.
+        """
+        sql, params = self.get_sql(upload_id)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def get_sql(self, upload_id):
+        params = [str(upload_id)] * len(self._ctes)
+
+        errors = "'[]'::jsonb"
+        if self._checks:
+            rows = []
+            for ordinal, (predicate, predicate_params, field, note) in enumerate(self._checks):
+                rows.append(
+                    f"({ordinal}, CASE WHEN coalesce({predicate}, false) "
+                    f"THEN jsonb_build_object('field_name', %s::text, 'note', %s::text) END)"
+                )
+                params.extend([*predicate_params, field, note])
+            errors = (
+                "(SELECT coalesce(jsonb_agg(check_error ORDER BY ordinal), '[]'::jsonb) "
+                f"FROM (VALUES {', '.join(rows)}) AS checks(ordinal, check_error) WHERE check_error IS NOT NULL)"
+            )
+        params.append(str(upload_id))
+
+        sql = f"""
+            {'WITH ' + ', '.join(self._ctes) if self._ctes else ''}
+            UPDATE individual_individualdatasource AS ds
+            SET validations = coalesce(ds.validations, '{{}}'::jsonb)
+                    || jsonb_build_object('validation_errors', {errors}),
+                content_hash = NULL,
+                validation_version = NULL
+            WHERE ds.upload_id = %s::UUID AND ds."isDeleted" = False
+        """
+        return sql, params
+
+    def _compile(self):
+        if self.schema is not None:
+            for field in self.schema.required:
+                self._add_check(f"coalesce(jsonb_typeof({self._value(field)}), 'null') = 'null'", [], field,
+                                REQUIRED_NOTE)
+            for field, keyword, argument in self.schema.checks:
+                predicate, params = self._compile_keyword(field, keyword, argument)
+                value = self._value(field)
+                self._add_check(f"jsonb_typeof({value}) <> 'null' AND NOT coalesce({predicate}, false)", params,
+                                field, CompiledSchema.check_note(keyword, argument))
+
+        for field, field_properties in self.properties.items():
+            if "validationCalculation" in field_properties:
+                self._compile_calculation(field, field_properties["validationCalculation"])
+
+            if "uniqueness" in field_properties:
+                self._compile_uniqueness(field)
+
+    def _compile_calculation(self, field, validation_calculation):
+        rule = ColumnValidationRuleRegistryPoint.get_rule(validation_calculation["name"])
+        if rule is not None and not rule.is_active(self.calculation, self.calculation_uuid):
+            # Values of an inactive validation calculation are not validated
+            return
+        compiled = rule.sql_predicate() if rule is not None else None
+        if compiled is None:
+            self.python_properties[field] = {"validationCalculation": validation_calculation}
+            return
+        predicate, params = compiled
+        predicate = predicate.format(value=self._value(field), text=self._text(field))
+        self._add_check(f"{self._is_present(field)} AND NOT coalesce({predicate}, false)", params, field, rule.note)
+
+    def _compile_keyword(self, field, keyword, argument):
+        value, text = self._value(field), self._text(field)
+        if keyword == 'type':
+            return ' OR '.join(f'({self._type_predicate(type_name, value, text)})' for type_name in argument), []
+        if keyword == 'enum':
+            return f"(%s::jsonb @> {value} OR {text} = ANY(%s))", [
+                json.dumps(argument), [option if isinstance(option, str) else json.dumps(option) for option in argument]
+            ]
+        if keyword == 'format':
+            return (
+                f"CASE WHEN jsonb_typeof({value}) <> 'string' THEN false "
+                f"WHEN {text} !~ %s THEN false "
+                f"WHEN substr({text}, 1, 4)::int = 0 THEN false "
+                f"ELSE substr({text}, 9, 2)::int <= extract(day from make_date("
+                f"substr({text}, 1, 4)::int, substr({text}, 6, 2)::int, 1) + interval '1 month - 1 day') END"
+            ), [DATE_PATTERN]
+        if keyword == 'pattern':
+            return f"jsonb_typeof({value}) <> 'string' OR {text} ~ %s", [argument]
+        operator = '>=' if keyword == 'minimum' else '<='
+        return (
+            f"CASE jsonb_typeof({value}) WHEN 'number' THEN ({text})::numeric {operator} %s "
+            f"WHEN 'string' THEN CASE WHEN {text} ~ %s THEN ({text})::numeric {operator} %s ELSE true END "
+            f"ELSE true END"
+        ), [argument, NUMBER_PATTERN, argument]
+
+    @staticmethod
+    def _type_predicate(type_name, value, text):
+        if type_name == 'integer':
+            return (
+                f"CASE jsonb_typeof({value}) WHEN 'number' THEN mod(({text})::numeric, 1) = 0 "
+                f"WHEN 'string' THEN CASE WHEN {text} ~ {_literal(NUMBER_PATTERN)} "
+                f"THEN mod(({text})::numeric, 1) = 0 ELSE false END ELSE false END"
+            )
+        if type_name == 'number':
+            return f"jsonb_typeof({value}) = 'number' OR {text} ~ {_literal(NUMBER_PATTERN)}"
+        if type_name == 'boolean':
+            return f"jsonb_typeof({value}) = 'boolean' OR lower({text}) IN ('true', 'false')"
+        if type_name == 'string':
+            return f"jsonb_typeof({value}) NOT IN ('object', 'array')"
+        if type_name == 'null':
+            return f"jsonb_typeof({value}) = 'null'"
+        return 'true'
+
+    def _compile_uniqueness(self, field):
+        name = f'duplicated_{len(self._ctes)}'
+        key = _literal(field)
+        self._ctes.append(
+            f'{name} AS (SELECT "Json_ext" -> {key} AS value FROM individual_individualdatasource '
+            f'WHERE upload_id = %s::UUID AND "isDeleted" = False AND jsonb_typeof("Json_ext" -> {key}) <> \'null\' '
+            f'GROUP BY 1 HAVING count(*) > 1)'
+        )
+        self._add_check(f"{self._value(field)} IN (SELECT value FROM {name})", [], field, UNIQUENESS_NOTE)
+        if self.registry_uniqueness:
+            # Served by the indexes of the create_uniqueness_indexes command
+            self._add_check(
+                f'EXISTS (SELECT 1 FROM individual_individual i WHERE i."isDeleted" = False '
+                f'AND i."Json_ext" ->> {key} = {self._registered_text(field)} '
+                f'AND lower(i."UUID"::text) IS DISTINCT FROM lower(ds."Json_ext" ->> \'ID\'))',
+                [], field, REGISTERED_NOTE
+            )
+
+    def _add_check(self, predicate, params, field, note):
+        self._checks.append((predicate, params, field, note))
+
+    @classmethod
+    def _is_present(cls, field):
+        # Missing keys and json nulls are not validated, the same as in the python validation
+        return f"coalesce(jsonb_typeof({cls._value(field)}), 'null') <> 'null'"
+
+    @staticmethod
+    def _value(field):
+        return f'(ds."Json_ext" -> {_literal(field)})'
+
+    @staticmethod
+    def _text(field):
+        return f'(ds."Json_ext" ->> {_literal(field)})'
+
+    @classmethod
+    def _registered_text(cls, field):
+        # Integral numbers compared without the fraction like by individual.utils.fetch_registered_values,
+        #  2.0 read from a spreadsheet matches the registered 2
+        value, text = cls._value(field), cls._text(field)
+        return (
+            f"(CASE jsonb_typeof({value}) WHEN 'number' THEN CASE WHEN mod(({text})::numeric, 1) = 0 "
+            f"THEN round(({text})::numeric)::text ELSE {text} END ELSE {text} END)"
+        )
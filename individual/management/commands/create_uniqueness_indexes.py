@@ -0,0 +1,63 @@
+import json
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from individual.apps import IndividualConfig
+from individual.models import Individual
+
+# PostgreSQL truncates longer identifiers
+MAX_INDEX_NAME_LENGTH = 63
+
+
+def get_unique_fields():
+    properties = json.loads(IndividualConfig.individual_schema).get('properties', {})
+    return [field for field, field_properties in properties.items() if 'uniqueness' in field_properties]
+
+
+def uniqueness_index_name(field):
+    return f"individual_json_ext_{re.sub(r'[^a-z0-9_]', '_', field.lower())}_idx"[:MAX_INDEX_NAME_LENGTH]
+
+
+def uniqueness_index_sql(field):
+    """
+    Expression index on json_ext->>field of individuals that are not deleted, the expression and the condition
+    match the lookup of individual.utils.fetch_registered_values.
+    """
+    quote_name = connection.ops.quote_name
+    json_ext = quote_name(Individual._meta.get_field('json_ext').column)
+    is_deleted = quote_name(Individual._meta.get_field('is_deleted').column)
+    key = field.replace("'", "''")
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_name(uniqueness_index_name(field))} "
+        f"ON {quote_name(Individual._meta.db_table)} (({json_ext} ->> '{key}')) WHERE {is_deleted} = false"
+    )
+
+
+class Command(BaseCommand):
+    help = "Create expression indexes on json_ext of individuals for fields with uniqueness in individual_schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--field', action='append', dest='fields',
+                            help="Index only the given field, can be repeated (default: all unique fields)")
+        parser.add_argument('--dry-run', action='store_true', help="Print the SQL without executing it")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Uniqueness indexes are supported on PostgreSQL only")
+
+        fields = options['fields'] or get_unique_fields()
+        if not fields:
+            self.stderr.write("No field with uniqueness in individual_schema")
+            return
+
+        for field in fields:
+            sql = uniqueness_index_sql(field)
+            if options['dry_run']:
+                self.stdout.write(f"{sql};")
+                continue
+            # CONCURRENTLY can't run inside of a transaction, the connection is in autocommit mode here
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+            self.stdout.write(f"Index {uniqueness_index_name(field)} on {field} created")
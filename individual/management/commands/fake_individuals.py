@@ -1,13 +1,17 @@
+import collections
+import concurrent.futures
 import csv
-from faker import Faker
-from datetime import datetime, timedelta
-import random
-import json
+import os
 import tempfile
+from datetime import date
 
-from django.core.management.base import BaseCommand
+import numpy as np
+import pandas as pd
+from faker import Faker
 
-fake = Faker()
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import CharField, Value
+from django.db.models.functions import MD5, Cast, Concat
 
 json_schema = {
     "email": {"type": "string"},
@@ -21,52 +25,354 @@ json_schema = {
     "beneficiary_data_source": {"type": "string"}
 }
 
-def generate_fake_individual(group_code, recipient_info, individual_role):
+COLUMNS = [
+    "first_name", "last_name", "dob", "group_code", "recipient_info", "individual_role", "email", "able_bodied",
+    "national_id", "national_id_type", "educated_level", "chronic_illness", "number_of_elderly",
+    "number_of_children", "beneficiary_data_source",
+]
+
+NATIONAL_ID_TYPES = ("ID", "Passport", "Driver's License")
+EDUCATED_LEVELS = ("primary", "secondary", "tertiary", "none")
+EMAIL_DOMAINS = ("example.com", "example.org", "example.net")
+
+# Faker is too slow to be called per row, values are drawn from pools generated once with the seed
+NAME_POOL_SIZE = 2000
+COMPANY_POOL_SIZE = 500
+
+XLSX_MAX_ROWS = 1048575
+
+# Columns missing here are written as strings
+ARROW_TYPES = {
+    "group_code": "int64",
+    "recipient_info": "int64",
+    "able_bodied": "bool",
+    "chronic_illness": "bool",
+    "number_of_elderly": "int64",
+    "number_of_children": "int64",
+}
+
+# Columns where invalid rows hold text instead of a number
+INVALID_TEXT_COLUMNS = ("number_of_children",)
+
+
+def parse_household_sizes(value):
+    """
+    Parses household size distribution given as `size:weight` pairs, e.g. `1:1,2:2,3:4,4:4,5:2`.
+    """
+    sizes, weights = [], []
+    try:
+        for item in value.split(','):
+            size, _, weight = item.partition(':')
+            sizes.append(int(size))
+            weights.append(float(weight) if weight else 1.0)
+    except ValueError:
+        raise CommandError(f"Invalid household size distribution: {value}")
+    if not sizes or min(sizes) < 1 or min(weights) < 0 or sum(weights) <= 0:
+        raise CommandError(f"Invalid household size distribution: {value}")
+    weights = np.array(weights)
+    return np.array(sizes), weights / weights.sum()
+
+
+def build_generation_params(seed, household_sizes='5', reference_date=None, invalid_share=0.0):
+    """
+    Parameters of generate_block shared by all blocks of the dataset.
+    """
+    from individual.models import GroupIndividual
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    sizes, weights = parse_household_sizes(household_sizes)
     return {
-        "first_name": fake.first_name(),
-        "last_name": fake.last_name(),
-        "dob": fake.date_of_birth(minimum_age=16, maximum_age=90).isoformat(),
-        "group_code": group_code,
-        "recipient_info": recipient_info,
-        "individual_role": individual_role,
-        "email": fake.email(),
-        "able_bodied": fake.boolean(),
-        "national_id": fake.unique.ssn(),
-        "national_id_type": fake.random_element(elements=("ID", "Passport", "Driver's License")),
-        "educated_level": fake.random_element(elements=("primary", "secondary", "tertiary", "none")),
-        "chronic_illness": fake.boolean(),
-        "number_of_elderly": fake.random_int(min=0, max=5),
-        "number_of_children": fake.random_int(min=0, max=10),
-        "beneficiary_data_source": fake.company()
+        'seed': seed,
+        'household_sizes': sizes,
+        'household_weights': weights,
+        'reference_date': (reference_date or date.today()).isoformat(),
+        'invalid_share': invalid_share,
+        'first_names': [fake.first_name() for _ in range(NAME_POOL_SIZE)],
+        'last_names': [fake.last_name() for _ in range(NAME_POOL_SIZE)],
+        'companies': [fake.company() for _ in range(COMPANY_POOL_SIZE)],
+        'head_role': GroupIndividual.Role.HEAD.value,
+        # Exclude the head from role choices so that one group only has one head
+        'roles': [choice.value for choice in GroupIndividual.Role if choice != GroupIndividual.Role.HEAD],
+        'with_update_ids': False,
+        'update_ids': [],
     }
 
 
+def generate_block(block_index, start, size, params):
+    """
+    Generates rows [start, start + size) of the dataset. Random state depends only on the seed and the block index,
+    so the output doesn't depend on the number of workers. Households never span blocks, group codes are unique
+    because they are derived from the row number of the household head.
+    """
+    rng = np.random.default_rng([params['seed'], block_index])
+
+    household_sizes = _draw_household_sizes(rng, params['household_sizes'], params['household_weights'], size)
+    household_starts = np.repeat(np.cumsum(household_sizes) - household_sizes, household_sizes)[:size]
+    position = np.arange(size) - household_starts
+    is_head = position == 0
+
+    first_names = np.array(params['first_names'], dtype=object)
+    last_names = np.array(params['last_names'], dtype=object)
+    first_name = first_names[rng.integers(0, len(first_names), size)]
+    # Members of a household share the last name of its head
+    last_name = last_names[rng.integers(0, len(last_names), size)][household_starts]
+
+    roles = np.array(params['roles'], dtype=object)
+    individual_role = np.where(is_head, params['head_role'], roles[rng.integers(0, len(roles), size)])
+
+    reference_date = np.datetime64(params['reference_date'], 'D')
+    age_days = rng.integers(16 * 365, 90 * 365 + 1, size)
+    dob = np.datetime_as_string(reference_date - age_days.astype('timedelta64[D]'), unit='D').astype(object)
+
+    row_number = np.arange(start, start + size)
+    domains = np.array(EMAIL_DOMAINS, dtype=object)[rng.integers(0, len(EMAIL_DOMAINS), size)]
+    email = [f"{first.lower()}.{last.lower()}{number}@{domain}"
+             for first, last, number, domain in zip(first_name, last_name, row_number, domains)]
+    national_id = [f"{number // 1000000 % 1000:03d}-{number // 10000 % 100:02d}-{number % 10000:04d}"
+                   for number in row_number]
+    companies = np.array(params['companies'], dtype=object)
+
+    dataframe = pd.DataFrame({
+        "first_name": first_name,
+        "last_name": last_name,
+        "dob": dob,
+        "group_code": (start + household_starts + 1).astype(np.int64),
+        "recipient_info": is_head.astype(np.int64),
+        "individual_role": individual_role,
+        "email": email,
+        "able_bodied": rng.random(size) < 0.5,
+        "national_id": national_id,
+        "national_id_type": np.array(NATIONAL_ID_TYPES, dtype=object)[rng.integers(0, len(NATIONAL_ID_TYPES), size)],
+        "educated_level": np.array(EDUCATED_LEVELS, dtype=object)[rng.integers(0, len(EDUCATED_LEVELS), size)],
+        "chronic_illness": rng.random(size) < 0.5,
+        "number_of_elderly": rng.integers(0, 6, size),
+        "number_of_children": rng.integers(0, 11, size),
+        "beneficiary_data_source": companies[rng.integers(0, len(companies), size)],
+    }, columns=COLUMNS)
+
+    _make_invalid(rng, dataframe, params['invalid_share'])
+
+    if params['with_update_ids']:
+        ids = np.full(size, None, dtype=object)
+        update_ids = params['update_ids']
+        if update_ids:
+            ids[rng.choice(size, len(update_ids), replace=False)] = update_ids
+        dataframe["ID"] = ids
+
+    return dataframe
+
+
+def _draw_household_sizes(rng, sizes, weights, rows):
+    drawn = []
+    total = 0
+    estimate = int(rows / float(np.dot(sizes, weights))) + 1
+    while total < rows:
+        batch = rng.choice(sizes, size=estimate, p=weights)
+        drawn.append(batch)
+        total += int(batch.sum())
+    household_sizes = np.concatenate(drawn)
+    # Last household is truncated to the block size, it still has its head
+    return household_sizes[:np.searchsorted(np.cumsum(household_sizes), rows) + 1]
+
+
+def _make_invalid(rng, dataframe, share):
+    """
+    Breaks one field of the selected rows so that the sample schema or the email validation rejects it.
+    """
+    if share <= 0:
+        return
+    invalid = np.flatnonzero(rng.random(len(dataframe)) < share)
+    kind = rng.integers(0, 4, len(invalid))
+    dataframe.loc[dataframe.index[invalid[kind == 0]], "first_name"] = None
+    dataframe.loc[dataframe.index[invalid[kind == 1]], "dob"] = "not-a-date"
+    dataframe.loc[dataframe.index[invalid[kind == 2]], "email"] = "invalid-email"
+    for column in INVALID_TEXT_COLUMNS:
+        dataframe[column] = dataframe[column].astype(object)
+    dataframe.loc[dataframe.index[invalid[kind == 3]], "number_of_children"] = "many"
+
+
+class CsvOutput:
+    suffix = '.csv'
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.header = True
+
+    def write(self, dataframe):
+        dataframe.to_csv(self.file, header=self.header, index=False, quoting=csv.QUOTE_MINIMAL)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxOutput:
+    suffix = '.xlsx'
+
+    def __init__(self, path):
+        import openpyxl
+        self.path = path
+        # Write-only workbook streams rows to a temporary file instead of keeping cells in memory
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.header = True
+
+    def write(self, dataframe):
+        if self.header:
+            self.sheet.append(list(dataframe.columns))
+            self.header = False
+        for row in dataframe.itertuples(index=False, name=None):
+            self.sheet.append([value.item() if isinstance(value, np.generic) else value for value in row])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetOutput:
+    suffix = '.parquet'
+
+    def __init__(self, path, string_columns=()):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.path = path
+        self.string_columns = string_columns
+        self.writer = None
+        self.schema = None
+
+    def write(self, dataframe):
+        pa = self.pa
+        if self.writer is None:
+            # Schema is fixed explicitly, columns empty in the first block would be inferred as null type
+            self.schema = pa.schema([
+                (column, pa.type_for_alias(
+                    'string' if column in self.string_columns else ARROW_TYPES.get(column, 'string')
+                )) for column in dataframe.columns
+            ])
+            self.writer = pa.parquet.ParquetWriter(self.path, self.schema)
+        dataframe = dataframe.astype({column: str for column in self.string_columns})
+        self.writer.write_table(pa.Table.from_pandas(dataframe, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+OUTPUT_FORMATS = {
+    'csv': CsvOutput,
+    'xlsx': XlsxOutput,
+    'parquet': ParquetOutput,
+}
+
 
 class Command(BaseCommand):
-    help = "Create test individual csv for uploading"
+    help = "Create test individual file for uploading"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100, help="Number of individuals (default: 100)")
+        parser.add_argument('--household-sizes', default='5',
+                            help="Household size distribution as size:weight pairs, e.g. 1:1,2:2,3:4,4:4,5:2 "
+                                 "(default: 5, households of five members)")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Seed of the generator, the same seed and reference date give the same file")
+        parser.add_argument('--reference-date', type=date.fromisoformat, default=None,
+                            help="Date the ages are computed from, YYYY-MM-DD (default: today)")
+        parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='csv', help="Output format")
+        parser.add_argument('--invalid-share', type=float, default=0.0,
+                            help="Share of rows with a deliberately invalid field (default: 0)")
+        parser.add_argument('--update-share', type=float, default=0.0,
+                            help="Share of rows with ID of an existing individual (default: 0)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of generating processes (default: number of CPUs)")
+        parser.add_argument('--block-size', type=int, default=50000,
+                            help="Number of rows generated by a worker at once (default: 50000)")
+        parser.add_argument('--output', default=None, help="Output file path (default: new temporary file)")
 
     def handle(self, *args, **options):
-        from individual.models import GroupIndividual
+        count = options['count']
+        if count < 1 or options['block_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--count, --block-size and --workers have to be positive")
+        for share in ('invalid_share', 'update_share'):
+            if not 0 <= options[share] <= 1:
+                raise CommandError(f"--{share.replace('_', '-')} has to be between 0 and 1")
+        if options['format'] == 'xlsx' and count > XLSX_MAX_ROWS:
+            raise CommandError(f"XLSX sheet is limited to {XLSX_MAX_ROWS} individuals")
+
+        seed = options['seed'] if options['seed'] is not None else int(np.random.SeedSequence().entropy % 2 ** 32)
+        blocks = self._split_blocks(count, options['block_size'])
+        params = build_generation_params(
+            seed, options['household_sizes'], options['reference_date'], options['invalid_share']
+        )
+        update_ids = self._sample_update_ids(seed, count, options['update_share'])
+        params['with_update_ids'] = options['update_share'] > 0
+
+        output_class = OUTPUT_FORMATS[options['format']]
+        path = options['output']
+        if not path:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=output_class.suffix) as tmp_file:
+                path = tmp_file.name
+
+        output_options = {}
+        if options['format'] == 'parquet' and options['invalid_share'] > 0:
+            # Numeric column holding invalid text can only be stored as a string column
+            output_options['string_columns'] = INVALID_TEXT_COLUMNS
+        output = output_class(path, **output_options)
+        try:
+            for dataframe in self._generate(blocks, params, update_ids, options['workers']):
+                output.write(dataframe)
+        finally:
+            output.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {count} fake individuals {options["format"]} at {path} (seed {seed})'
+        ))
 
-        individuals = []
-        num_individuals = 100
-        num_households = 20
+    @staticmethod
+    def _split_blocks(count, block_size):
+        return [(index, start, min(block_size, count - start))
+                for index, start in enumerate(range(0, count, block_size))]
 
-        # Exclude the head from role choices so that one group only has one head in randomnes
-        available_role_choices = [choice for choice in GroupIndividual.Role if choice != GroupIndividual.Role.HEAD]
+    def _sample_update_ids(self, seed, count, share):
+        from individual.models import Individual
 
-        for group_code in range(1, num_households+1):
-            for i in range(num_individuals // num_households):
-                recipient_info = 1 if i == 0 else 0
-                individual_role = GroupIndividual.Role.HEAD if i == 0 else random.choice(available_role_choices)
-                individual = generate_fake_individual(group_code, recipient_info, individual_role)
-                individuals.append(individual)
+        if share <= 0:
+            return []
+        individuals = Individual.objects.filter(is_deleted=False)
+        wanted = round(count * share)
+        available = individuals.count()
+        if available < wanted:
+            self.stdout.write(self.style.WARNING(
+                f'Only {available} existing individuals available for {wanted} updated rows'
+            ))
+        # Sampled in the database, ordered by a hash of the seed and the id so the same seed selects the same
+        #  individuals, only the selected ids are read
+        sample_key = MD5(Concat(Value(f'{seed}:'), Cast('id', output_field=CharField())))
+        selected = individuals.annotate(sample_key=sample_key).order_by('sample_key', 'id')[:wanted]
+        return [str(individual_id) for individual_id in selected.values_list('id', flat=True)]
 
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv', newline='') as tmp_file:
-            writer = csv.DictWriter(tmp_file, fieldnames=list(individuals[0].keys()))
-            writer.writeheader()
-            for individual in individuals:
-                writer.writerow(individual)
+    @staticmethod
+    def _generate(blocks, params, update_ids, workers):
+        """
+        Yields generated blocks in order. At most two blocks per worker are in flight,
+        memory use doesn't depend on the number of rows.
+        """
+        def block_args(index, start, size):
+            # Updated rows are spread over blocks proportionally to their size
+            total = blocks[-1][1] + blocks[-1][2]
+            first, last = len(update_ids) * start // total, len(update_ids) * (start + size) // total
+            return index, start, size, {**params, 'update_ids': update_ids[first:last]}
 
-            self.stdout.write(self.style.SUCCESS(f'Successfully created {num_individuals} fake individuals csv at {tmp_file.name}'))
+        if workers == 1:
+            for block in blocks:
+                yield generate_block(*block_args(*block))
+            return
 
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            for block in blocks:
+                pending.append(executor.submit(generate_block, *block_args(*block)))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
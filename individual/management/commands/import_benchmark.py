@@ -0,0 +1,242 @@
+import io
+import json
+import platform
+from datetime import date, datetime
+from importlib import metadata
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from individual.management.commands.fake_individuals import build_generation_params, generate_block
+from individual.profiling import StageProfiler
+from individual.utils import get_import_columns
+
+BLOCK_SIZE = 50000
+# Fixed so that the same seed gives the same data between runs
+REFERENCE_DATE = date(2024, 1, 1)
+
+
+class _NoopWorkflow:
+    name = 'benchmark'
+
+    def run(self, payload):
+        return {'success': True}
+
+
+def _aggregation_event_class():
+    from individual.signals.on_validation_import_valid_items import IndividualItemsImportTaskCompletionEvent
+
+    class BenchmarkImportTaskCompletionEvent(IndividualItemsImportTaskCompletionEvent):
+        """
+        Runs only the group aggregation, the upload procedure is measured as a separate stage.
+        """
+
+        def _get_workflow(self, group, name):
+            return _NoopWorkflow()
+
+    return BenchmarkImportTaskCompletionEvent
+
+
+class Command(BaseCommand):
+    help = "Run the python individual import workflow on synthetic data and report metrics of each stage as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Number of imported individuals (default: 10000)")
+        parser.add_argument('--sizes', default=None,
+                            help="Comma separated numbers of rows, the import is run once per size and time per row "
+                                 "of every stage is reported to check the scaling, --rows is ignored")
+        parser.add_argument('--household-sizes', default='1:1,2:2,3:4,4:4,5:2',
+                            help="Household size distribution as size:weight pairs")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the generated data (default: 0)")
+        parser.add_argument('--invalid-share', type=float, default=0.0,
+                            help="Share of rows with a deliberately invalid field (default: 0)")
+        parser.add_argument('--username', default='admin', help="User running the import (default: admin)")
+        parser.add_argument('--no-trace-memory', action='store_true',
+                            help="Don't measure peak memory with tracemalloc, it slows the import down")
+        parser.add_argument('--keep', action='store_true',
+                            help="Keep the imported data, by default everything is removed after the run")
+        parser.add_argument('--output', default=None, help="Path of the JSON report (default: stdout)")
+
+    def handle(self, *args, **options):
+        from core.models import User
+
+        sizes = self._parse_sizes(options['sizes']) if options['sizes'] else [options['rows']]
+        if min(sizes) < 1:
+            raise CommandError("Number of rows has to be positive")
+        user = User.objects.filter(username=options['username']).first()
+        if not user:
+            raise CommandError(f"User {options['username']} not found")
+
+        runs = [self._run(user, {**options, 'rows': rows}) for rows in sizes]
+        if not options['sizes']:
+            self._write_report(runs[0], options['output'])
+            return
+
+        report = {
+            'benchmark': 'individual_import_scaling',
+            'timestamp': datetime.now().isoformat(),
+            'module_version': self._module_version(),
+            'python_version': platform.python_version(),
+            'database': connection.vendor,
+            'sizes': sizes,
+            # Time per row of a stage that scales linearly stays the same for all sizes
+            'scaling': self._scaling(runs),
+            'runs': runs,
+        }
+        self._write_report(report, options['output'])
+
+    def _run(self, user, options):
+        import_file = self._build_import_file(options)
+        profiler = StageProfiler(trace_memory=not options['no_trace_memory'])
+        # No outer transaction, the import commits like in production. In an atomic block validation would
+        #  stay out of the worker pool and slices of the upload procedure would be savepoints only.
+        upload = self._run_import(user, import_file, profiler)
+        upload.refresh_from_db()
+        if not options['keep']:
+            self._remove_upload(upload.id)
+
+        return {
+            'benchmark': 'individual_import',
+            'timestamp': datetime.now().isoformat(),
+            'module_version': self._module_version(),
+            'python_version': platform.python_version(),
+            'database': connection.vendor,
+            'rows': options['rows'],
+            'seed': options['seed'],
+            'invalid_share': options['invalid_share'],
+            'upload_status': upload.status,
+            'rows_imported': upload.rows_imported,
+            'kept': options['keep'],
+            **profiler.results(),
+            # Metrics recorded by the import itself, the same as stored for production uploads
+            'upload_stage_metrics': upload.stage_metrics,
+        }
+
+    @staticmethod
+    def _parse_sizes(sizes):
+        try:
+            return [int(size) for size in sizes.split(',') if size.strip()]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes {sizes}, expected comma separated numbers")
+
+    @staticmethod
+    def _scaling(runs):
+        """
+        Microseconds per row of every stage by number of rows.
+        """
+        scaling = {}
+        for run in runs:
+            for stage in run['stages']:
+                scaling.setdefault(stage['name'], {})[str(run['rows'])] = round(
+                    stage['wall_time_s'] * 1e6 / run['rows'], 3
+                )
+        return scaling
+
+    def _run_import(self, user, import_file, profiler):
+        from individual.models import IndividualDataSource, IndividualDataUploadRecords
+        from individual.services import IndividualImportService
+        from individual.workflows.individual_upload_valid import upload_sql
+        from individual.workflows.utils import SqlProcedurePythonWorkflow
+
+        service = IndividualImportService(user)
+        with profiler.stage('save_sources') as stage:
+            upload = service._save_sources(import_file)
+            upload.refresh_from_db()
+            stage['rows'] = upload.rows_staged
+        rows = upload.rows_staged
+
+        upload_record = IndividualDataUploadRecords(
+            data_upload=upload, workflow=_NoopWorkflow.name, json_ext={'group_aggregation_column': None}
+        )
+        upload_record.save(user=user.user)
+
+        with profiler.stage('validate', rows):
+            service.validate_import_individuals(upload.id, IndividualDataSource.objects.filter(upload_id=upload.id))
+
+        if connection.vendor != 'postgresql':
+            self.stderr.write("Upload procedure requires PostgreSQL, upload_sql and aggregation stages are skipped")
+        else:
+            with profiler.stage('upload_sql', rows):
+                workflow = SqlProcedurePythonWorkflow(str(upload.id), str(user.id))
+                workflow.validate_dataframe_headers()
+                workflow.execute(upload_sql, [str(upload.id), str(user.id)])
+
+            with profiler.stage('aggregation', rows):
+                _aggregation_event_class()('benchmark.noop', upload_record, upload.id, user).run_workflow()
+
+        with profiler.stage('synchronize', rows):
+            service.synchronize_data_for_reporting(upload.id)
+        return upload
+
+    @staticmethod
+    @transaction.atomic
+    def _remove_upload(upload_id):
+        """
+        Removes everything created by the benchmark import, together with the history of the removed rows.
+        """
+        from individual.models import (
+            Group, GroupDataSource, GroupIndividual, Individual, IndividualDataSource, IndividualDataSourceUpload,
+            IndividualDataUploadRecords,
+        )
+
+        individual_ids = list(IndividualDataSource.objects.filter(upload_id=upload_id, individual_id__isnull=False)
+                              .values_list('individual_id', flat=True))
+        group_ids = list(GroupDataSource.objects.filter(upload_id=upload_id, group_id__isnull=False)
+                         .values_list('group_id', flat=True))
+        # Dependent rows first, foreign keys are checked by the database
+        querysets = [
+            GroupIndividual.objects.filter(group_id__in=group_ids),
+            GroupIndividual.objects.filter(individual_id__in=individual_ids),
+            GroupDataSource.objects.filter(upload_id=upload_id),
+            IndividualDataSource.objects.filter(upload_id=upload_id),
+            IndividualDataUploadRecords.objects.filter(data_upload_id=upload_id),
+            Group.objects.filter(id__in=group_ids),
+            Individual.objects.filter(id__in=individual_ids),
+            IndividualDataSourceUpload.objects.filter(id=upload_id),
+        ]
+        for queryset in querysets:
+            ids = list(queryset.values_list('id', flat=True))
+            # Plain DELETE skips the signals, removed rows would be recorded in the history otherwise
+            Command._delete_rows(queryset.model.history.model, ids)
+            Command._delete_rows(queryset.model, ids)
+
+    @staticmethod
+    def _delete_rows(model, ids, batch_size=1000):
+        id_field = model._meta.get_field('id')
+        table = connection.ops.quote_name(model._meta.db_table)
+        column = connection.ops.quote_name(id_field.column)
+        values = [id_field.get_db_prep_value(id_, connection) for id_ in ids]
+        with connection.cursor() as cursor:
+            for start in range(0, len(values), batch_size):
+                batch = values[start:start + batch_size]
+                cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(["%s"] * len(batch))})', batch)
+
+    @staticmethod
+    def _build_import_file(options):
+        params = build_generation_params(
+            options['seed'], options['household_sizes'], REFERENCE_DATE, options['invalid_share']
+        )
+        # Generated columns missing in the configured individual_schema would fail the header validation
+        columns = get_import_columns()
+        content = io.StringIO()
+        for index, start in enumerate(range(0, options['rows'], BLOCK_SIZE)):
+            dataframe = generate_block(index, start, min(BLOCK_SIZE, options['rows'] - start), params)
+            dataframe = dataframe[[column for column in dataframe.columns if column in columns]]
+            dataframe.to_csv(content, header=index == 0, index=False)
+        return SimpleUploadedFile('benchmark.csv', content.getvalue().encode('utf-8'), content_type='text/csv')
+
+    @staticmethod
+    def _module_version():
+        try:
+            return metadata.version('openimis-be-individual')
+        except metadata.PackageNotFoundError:
+            return None
+
+    def _write_report(self, report, path):
+        if not path:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stderr.write(f"Benchmark report saved to {path}")
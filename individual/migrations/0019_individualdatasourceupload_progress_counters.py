@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0018_alter_groupindividual_group_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='rows_staged',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='rows_staged',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='rows_validated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='rows_validated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='rows_imported',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='rows_imported',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0019_individualdatasourceupload_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='content_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='content_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0020_individualdatasourceupload_content_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='stage_metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='stage_metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
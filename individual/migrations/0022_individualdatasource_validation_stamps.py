@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0021_individualdatasourceupload_stage_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualdatasource',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasource',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='individualdatasource',
+            name='validation_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasource',
+            name='validation_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='rows_invalid',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='rows_invalid',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,657 @@
+from django.db import migrations
+
+# Upload procedures installed once instead of being sent as DO blocks by every workflow run, which also
+# recreated filter_jsonb and probed failing_entry_individual_upload taking catalog locks. A changed procedure
+# is installed under a new version suffix by a new migration, workflows call the version they were written for.
+# Procedures taking the accepted data source ids run the upload for them only, sliced runs call them per slice.
+# Update procedures flag data sources pointing to an unknown individual instead of failing the whole upload.
+
+INDIVIDUAL_JSON_UUID_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_json_uuid_v1(value text)
+RETURNS UUID AS $$
+    -- NULL instead of a cast error for ids that are not canonical UUIDs
+    SELECT CASE WHEN value ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN value::UUID END
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+INDIVIDUAL_FLAG_UNKNOWN_IDS_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_flag_unknown_ids_v1(current_upload_id UUID, accepted UUID[])
+RETURNS INT AS $$
+DECLARE
+    unknown_id_error jsonb := jsonb_build_object('field_name', 'ID', 'note', 'Individual not found');
+    flagged INT;
+    newly_invalid INT;
+BEGIN
+    WITH unknown_id AS (
+        SELECT ds."UUID", coalesce(ds.validations -> 'validation_errors', '[]'::jsonb) AS errors
+        FROM individual_individualdatasource ds
+        WHERE ds.upload_id = current_upload_id
+          AND ds."isDeleted" = False
+          AND ds.individual_id IS NULL
+          AND (accepted IS NULL OR ds."UUID" = ANY(accepted))
+          -- Anti-join on the primary key of individuals, missing and malformed ids are not found either
+          AND NOT EXISTS (
+              SELECT 1 FROM individual_individual i
+              WHERE i."UUID" = individual_json_uuid_v1(ds."Json_ext" ->> 'ID')
+          )
+    ), flagged_sources AS (
+        UPDATE individual_individualdatasource ds
+        SET validations = coalesce(ds.validations, '{}'::jsonb)
+                || jsonb_build_object('validation_errors', u.errors || jsonb_build_array(unknown_id_error))
+        FROM unknown_id u
+        WHERE ds."UUID" = u."UUID"
+          AND NOT u.errors @> jsonb_build_array(unknown_id_error)
+        RETURNING u.errors = '[]'::jsonb AS was_valid
+    )
+    SELECT count(*), count(*) FILTER (WHERE was_valid) INTO flagged, newly_invalid FROM flagged_sources;
+
+    IF newly_invalid > 0 THEN
+        UPDATE individual_individualdatasourceupload
+        SET rows_invalid = rows_invalid + newly_invalid
+        WHERE "UUID" = current_upload_id;
+    END IF;
+    RETURN flagged;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_BASE_UPLOAD_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_base_upload_v1(current_upload_id UUID, userUUID UUID)
+RETURNS void AS $$
+ DECLARE
+            failing_entries UUID[];
+            failing_entries_invalid_json UUID[];
+            failing_entries_first_name UUID[];
+            failing_entries_last_name UUID[];
+            failing_entries_dob UUID[];
+            BEGIN
+    -- Check if all required fields are present in the entries
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_first_name
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND NOT "Json_ext" ? 'first_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_last_name
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND NOT "Json_ext" ? 'last_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_dob
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND NOT "Json_ext" ? 'dob';  
+    
+    -- If any entries do not meet the criteria or missing required fields, set the error message in the upload table and do not proceed further
+    IF failing_entries_invalid_json IS NOT NULL or failing_entries_first_name IS NOT NULL OR failing_entries_last_name IS NOT NULL OR failing_entries_dob IS NOT NULL THEN
+        UPDATE individual_individualdatasourceupload
+        SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                            'error', 'Invalid entries',
+                            'timestamp', NOW()::text,
+                            'upload_id', current_upload_id::text,
+                            'failing_entries_first_name', failing_entries_first_name,
+                            'failing_entries_last_name', failing_entries_last_name,
+                            'failing_entries_dob', failing_entries_dob,
+                            'failing_entries_invalid_json', failing_entries_invalid_json
+                        ))
+        WHERE "UUID" = current_upload_id;
+       update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+    -- If no invalid entries, then proceed with the data manipulation
+    ELSE
+        BEGIN
+          -- Individual UUIDs are assigned up front so data sources are linked back by their primary key,
+          -- gen_random_uuid() is volatile, the CTE is evaluated once
+          WITH new_source AS (
+            SELECT "UUID" AS source_id, gen_random_uuid() AS individual_id, "Json_ext"
+            FROM individual_individualdatasource
+            WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False
+          ), new_entry AS (
+            INSERT INTO individual_individual(
+            "UUID", "isDeleted", version, "UserCreatedUUID", "UserUpdatedUUID",
+            "Json_ext", first_name, last_name, dob
+            )
+            SELECT individual_id, false, 1, userUUID, userUUID,
+            "Json_ext", "Json_ext"->>'first_name', "Json_ext" ->> 'last_name', to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD')
+            FROM new_source
+            RETURNING "UUID"
+          )
+          UPDATE individual_individualdatasource
+          SET individual_id = new_entry."UUID"
+          FROM new_entry
+          JOIN new_source ON new_source.individual_id = new_entry."UUID"
+          WHERE individual_individualdatasource."UUID" = new_source.source_id;
+            update individual_individualdatasourceupload set status='SUCCESS', error='{}' where "UUID" = current_upload_id;
+            EXCEPTION
+            WHEN OTHERS then
+            update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+                UPDATE individual_individualdatasourceupload
+                SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                                    'error', SQLERRM,
+                                    'timestamp', NOW()::text,
+                                    'upload_id', current_upload_id::text
+                                ))
+                WHERE "UUID" = current_upload_id;
+        END;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_BASE_UPLOAD_PARTIAL_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_base_upload_partial_v1(current_upload_id UUID, userUUID UUID, accepted UUID[])
+RETURNS void AS $$
+ DECLARE
+            failing_entries UUID[];
+            failing_entries_invalid_json UUID[];
+            failing_entries_first_name UUID[];
+            failing_entries_last_name UUID[];
+            failing_entries_dob UUID[];
+            BEGIN
+    -- Check if all required fields are present in the entries
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_first_name
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND (accepted IS NULL OR "UUID" = ANY(accepted)) AND NOT "Json_ext" ? 'first_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_last_name
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND (accepted IS NULL OR "UUID" = ANY(accepted)) AND NOT "Json_ext" ? 'last_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_dob
+    FROM individual_individualdatasource
+    WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False AND (accepted IS NULL OR "UUID" = ANY(accepted)) AND NOT "Json_ext" ? 'dob';  
+    
+    -- If any entries do not meet the criteria or missing required fields, set the error message in the upload table and do not proceed further
+    IF failing_entries_invalid_json IS NOT NULL or failing_entries_first_name IS NOT NULL OR failing_entries_last_name IS NOT NULL OR failing_entries_dob IS NOT NULL THEN
+        UPDATE individual_individualdatasourceupload
+        SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                            'error', 'Invalid entries',
+                            'timestamp', NOW()::text,
+                            'upload_id', current_upload_id::text,
+                            'failing_entries_first_name', failing_entries_first_name,
+                            'failing_entries_last_name', failing_entries_last_name,
+                            'failing_entries_dob', failing_entries_dob,
+                            'failing_entries_invalid_json', failing_entries_invalid_json
+                        ))
+        WHERE "UUID" = current_upload_id;
+       update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+    -- If no invalid entries, then proceed with the data manipulation
+    ELSE
+        BEGIN
+          -- Individual UUIDs are assigned up front so data sources are linked back by their primary key,
+          -- gen_random_uuid() is volatile, the CTE is evaluated once
+          WITH new_source AS (
+            SELECT "UUID" AS source_id, gen_random_uuid() AS individual_id, "Json_ext"
+            FROM individual_individualdatasource
+            WHERE upload_id=current_upload_id and individual_id is null and "isDeleted"=False
+            AND (accepted IS NULL OR "UUID" = ANY(accepted))
+          ), new_entry AS (
+            INSERT INTO individual_individual(
+            "UUID", "isDeleted", version, "UserCreatedUUID", "UserUpdatedUUID",
+            "Json_ext", first_name, last_name, dob
+            )
+            SELECT individual_id, false, 1, userUUID, userUUID,
+            "Json_ext", "Json_ext"->>'first_name', "Json_ext" ->> 'last_name', to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD')
+            FROM new_source
+            RETURNING "UUID"
+          )
+          UPDATE individual_individualdatasource
+          SET individual_id = new_entry."UUID"
+          FROM new_entry
+          JOIN new_source ON new_source.individual_id = new_entry."UUID"
+          WHERE individual_individualdatasource."UUID" = new_source.source_id;
+            update individual_individualdatasourceupload set status='SUCCESS', error='{}' where "UUID" = current_upload_id;
+            EXCEPTION
+            WHEN OTHERS then
+            update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+                UPDATE individual_individualdatasourceupload
+                SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                                    'error', SQLERRM,
+                                    'timestamp', NOW()::text,
+                                    'upload_id', current_upload_id::text
+                                ))
+                WHERE "UUID" = current_upload_id;
+        END;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_UPLOAD_VALID_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_upload_valid_v1(current_upload_id UUID, userUUID UUID)
+RETURNS void AS $$
+DECLARE
+    failing_entries UUID[];
+    json_schema jsonb;
+    failing_entries_invalid_json UUID[];
+    failing_entries_first_name UUID[];
+    failing_entries_last_name UUID[];
+    failing_entries_dob UUID[];
+BEGIN
+    -- Check if all required fields are present in the entries
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_first_name
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'first_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_last_name
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'last_name';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_dob
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'dob';
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_invalid_json
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT validate_json_schema(json_schema, "Json_ext");
+    -- If any entries do not meet the criteria or missing required fields, set the error message in the upload table and do not proceed further
+    IF failing_entries_invalid_json IS NOT NULL OR failing_entries_first_name IS NOT NULL OR failing_entries_last_name IS NOT NULL OR failing_entries_dob IS NOT NULL THEN
+        UPDATE individual_individualdatasourceupload
+        SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                            'error', 'Invalid entries',
+                            'timestamp', NOW()::text,
+                            'upload_id', current_upload_id::text,
+                            'failing_entries_first_name', failing_entries_first_name,
+                            'failing_entries_last_name', failing_entries_last_name,
+                            'failing_entries_dob', failing_entries_dob,
+                            'failing_entries_invalid_json', failing_entries_invalid_json
+                        ))
+        WHERE "UUID" = current_upload_id;
+
+        UPDATE individual_individualdatasourceupload SET status = 'FAIL' WHERE "UUID" = current_upload_id;
+    ELSE
+        -- If no invalid entries, then proceed with the data manipulation
+        -- Individual UUIDs are assigned up front so data sources are linked back by their primary key,
+        -- gen_random_uuid() is volatile, the CTE is evaluated once
+        WITH new_source AS (
+            SELECT "UUID" AS source_id, gen_random_uuid() AS individual_id, "Json_ext"
+            FROM individual_individualdatasource
+            WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND validations ->> 'validation_errors' = '[]'
+        ), new_entry AS (
+            INSERT INTO individual_individual(
+                "UUID", "isDeleted", version, "UserCreatedUUID", "UserUpdatedUUID",
+                "Json_ext", first_name, last_name, dob
+            )
+            SELECT individual_id, false, 1, userUUID, userUUID,
+                   "Json_ext", "Json_ext"->>'first_name', "Json_ext" ->> 'last_name', to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD')
+            FROM new_source
+            RETURNING "UUID"
+        )
+        UPDATE individual_individualdatasource
+        SET individual_id = ne."UUID"
+        FROM new_entry ne
+        JOIN new_source ns ON ns.individual_id = ne."UUID"
+        WHERE individual_individualdatasource."UUID" = ns.source_id;
+
+        -- Change status to SUCCESS if no invalid items, change to PARTIAL_SUCCESS otherwise 
+            UPDATE individual_individualdatasourceupload
+            SET 
+                status = CASE
+                    WHEN (
+                        SELECT count(*) 
+                        FROM individual_individualdatasource
+                        WHERE upload_id=current_upload_id
+                            AND "isDeleted"=FALSE
+                            AND validations ->> 'validation_errors' = '[]'
+                    ) = (
+                        SELECT count(*) 
+                        FROM individual_individualdatasource
+                        WHERE upload_id=current_upload_id
+                            AND "isDeleted"=FALSE
+                    ) THEN 'SUCCESS'
+                    ELSE 'PARTIAL_SUCCESS'
+                END,
+                error = '{}'
+            WHERE "UUID" = current_upload_id;
+    END IF;
+EXCEPTION WHEN OTHERS THEN
+    UPDATE individual_individualdatasourceupload SET status = 'FAIL', error = jsonb_build_object(
+        'error', SQLERRM,
+        'timestamp', NOW()::text,
+        'upload_id', current_upload_id::text
+    )
+    WHERE "UUID" = current_upload_id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_UPLOAD_VALID_PARTIAL_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_upload_valid_partial_v1(current_upload_id UUID, userUUID UUID, accepted UUID[])
+RETURNS void AS $$
+DECLARE
+    failing_entries UUID[];
+    failing_entries_first_name UUID[];
+    failing_entries_last_name UUID[];
+    failing_entries_dob UUID[];
+    new_entry_results UUID[];
+    new_entry_result UUID;
+BEGIN
+    -- Check if all required fields are present in the entries, with accepted filter applied if not NULL
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_first_name
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'first_name'
+    AND (accepted IS NULL OR "UUID" = ANY(accepted));
+    
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_last_name
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'last_name'
+    AND (accepted IS NULL OR "UUID" = ANY(accepted));
+    
+    SELECT ARRAY_AGG("UUID") INTO failing_entries_dob
+    FROM individual_individualdatasource
+    WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND NOT "Json_ext" ? 'dob'
+    AND (accepted IS NULL OR "UUID" = ANY(accepted));
+    
+    -- If any entries do not meet the criteria or missing required fields, set the error message in the upload table and do not proceed further
+    IF failing_entries_first_name IS NOT NULL OR failing_entries_last_name IS NOT NULL OR failing_entries_dob IS NOT NULL THEN
+        UPDATE individual_individualdatasourceupload
+        SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                            'error', 'Invalid entries',
+                            'timestamp', NOW()::text,
+                            'upload_id', current_upload_id::text,
+                            'failing_entries_first_name', failing_entries_first_name,
+                            'failing_entries_last_name', failing_entries_last_name,
+                            'failing_entries_dob', failing_entries_dob
+                        ))
+        WHERE "UUID" = current_upload_id;
+
+        UPDATE individual_individualdatasourceupload SET status = 'FAIL' WHERE "UUID" = current_upload_id;
+    ELSE
+        -- If no invalid entries, then proceed with the data manipulation, considering the accepted filter
+        -- Individual UUIDs are assigned up front so data sources are linked back by their primary key,
+        -- gen_random_uuid() is volatile, the CTE is evaluated once
+        WITH new_source AS (
+            SELECT "UUID" AS source_id, gen_random_uuid() AS individual_id, "Json_ext"
+            FROM individual_individualdatasource
+            WHERE upload_id = current_upload_id AND individual_id IS NULL AND "isDeleted" = False AND validations ->> 'validation_errors' = '[]'
+            AND (accepted IS NULL OR "UUID" = ANY(accepted))
+        ), new_entry AS (
+            INSERT INTO individual_individual(
+                "UUID", "isDeleted", version, "UserCreatedUUID", "UserUpdatedUUID",
+                "Json_ext", first_name, last_name, dob
+            )
+            SELECT individual_id, false, 1, userUUID, userUUID,
+                   "Json_ext", "Json_ext"->>'first_name', "Json_ext" ->> 'last_name', to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD')
+            FROM new_source
+            RETURNING "UUID"
+        )
+        UPDATE individual_individualdatasource
+        SET individual_id = ne."UUID"
+        FROM new_entry ne
+        JOIN new_source ns ON ns.individual_id = ne."UUID"
+        WHERE individual_individualdatasource."UUID" = ns.source_id;
+    END IF;
+EXCEPTION WHEN OTHERS THEN
+    UPDATE individual_individualdatasourceupload SET status = 'FAIL', error = jsonb_build_object(
+        'error', SQLERRM,
+        'timestamp', NOW()::text,
+        'upload_id', current_upload_id::text
+    )
+    WHERE "UUID" = current_upload_id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_BASE_UPDATE_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_base_update_v1(current_upload_id UUID, userUUID UUID)
+RETURNS void AS $$
+BEGIN
+        begin 
+          -- Data sources pointing to an unknown individual get a per-row error and are left out of the update,
+          --  errors of the flagging are handled like the errors of the update
+          PERFORM individual_flag_unknown_ids_v1(current_upload_id, NULL);
+          with updated_individuals as ( UPDATE individual_individual
+            SET first_name = COALESCE(f."Json_ext"->>'first_name', first_name),
+            last_name = COALESCE(f."Json_ext"->>'last_name', last_name),
+            dob = COALESCE(to_date(f."Json_ext"->>'dob', 'YYYY-MM-DD'), dob),
+            "DateUpdated" = NOW(),
+            "Json_ext" = f."Json_ext"
+            FROM individual_individualdatasource f
+            -- Scoped to the upload, served by the (upload_id, individual_json_uuid_v1("Json_ext" ->> 'ID')) index
+            WHERE f.upload_id = current_upload_id
+            AND f."isDeleted" = False
+            AND individual_individual."UUID" = individual_json_uuid_v1(f."Json_ext" ->> 'ID')
+            returning individual_individual."UUID", f."UUID" as "individualdatasource_id")
+
+            UPDATE individual_individualdatasource
+      SET individual_id = u."UUID"
+      FROM updated_individuals u
+      WHERE upload_id=current_upload_id 
+        and individual_individualdatasource.individual_id is null 
+        and "isDeleted"=False 
+        and individual_individualdatasource."UUID" = u.individualdatasource_id;
+
+
+            update individual_individualdatasourceupload set status='PARTIAL_SUCCESS', error='{}' where "UUID" = current_upload_id;
+            EXCEPTION
+              WHEN OTHERS then
+
+              update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+                  UPDATE individual_individualdatasourceupload
+                  SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                                      'error', SQLERRM,
+                                      'timestamp', NOW()::text,
+                                      'upload_id', current_upload_id::text
+                                  ))
+                  WHERE "UUID" = current_upload_id;
+                END;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_BASE_UPDATE_PARTIAL_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_base_update_partial_v1(current_upload_id UUID, userUUID UUID, accepted UUID[])
+RETURNS void AS $$
+BEGIN
+        begin 
+          -- Data sources pointing to an unknown individual get a per-row error and are left out of the update,
+          --  errors of the flagging are handled like the errors of the update
+          PERFORM individual_flag_unknown_ids_v1(current_upload_id, accepted);
+          with updated_individuals as ( UPDATE individual_individual
+            SET first_name = COALESCE(f."Json_ext"->>'first_name', first_name),
+            last_name = COALESCE(f."Json_ext"->>'last_name', last_name),
+            dob = COALESCE(to_date(f."Json_ext"->>'dob', 'YYYY-MM-DD'), dob),
+            "DateUpdated" = NOW(),
+            "Json_ext" = f."Json_ext"
+            FROM individual_individualdatasource f
+            -- Scoped to the upload, served by the (upload_id, individual_json_uuid_v1("Json_ext" ->> 'ID')) index
+            WHERE f.upload_id = current_upload_id
+            AND f."isDeleted" = False
+            AND f."UUID" = ANY(accepted)
+            AND individual_individual."UUID" = individual_json_uuid_v1(f."Json_ext" ->> 'ID')
+            returning individual_individual."UUID", f."UUID" as "individualdatasource_id")
+
+            UPDATE individual_individualdatasource
+      SET individual_id = u."UUID"
+      FROM updated_individuals u
+      WHERE upload_id=current_upload_id 
+        and individual_individualdatasource.individual_id is null 
+        and "isDeleted"=False 
+        and individual_individualdatasource."UUID" = u.individualdatasource_id;
+
+
+            update individual_individualdatasourceupload set status='PARTIAL_SUCCESS', error='{}' where "UUID" = current_upload_id;
+            EXCEPTION
+              WHEN OTHERS then
+
+              update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+                  UPDATE individual_individualdatasourceupload
+                  SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                                      'error', SQLERRM,
+                                      'timestamp', NOW()::text,
+                                      'upload_id', current_upload_id::text
+                                  ))
+                  WHERE "UUID" = current_upload_id;
+                END;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_UPDATE_VALID_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_update_valid_v1(current_upload_id UUID, userUUID UUID)
+RETURNS void AS $$
+BEGIN
+        begin 
+          -- Data sources pointing to an unknown individual get a per-row error and are left out of the update,
+          --  errors of the flagging are handled like the errors of the update
+          PERFORM individual_flag_unknown_ids_v1(current_upload_id, NULL);
+            -- Update individual_individual
+          with updated_individuals as ( UPDATE individual_individual
+            SET first_name = COALESCE(ids."Json_ext"->>'first_name', first_name),
+            last_name = COALESCE(ids."Json_ext"->>'last_name', last_name),
+            dob = COALESCE(to_date(ids."Json_ext"->>'dob', 'YYYY-MM-DD'), dob),
+            "DateUpdated" = NOW(),
+            "Json_ext" = ids."Json_ext"
+            FROM individual_individualdatasource ids 
+            -- Scoped to the upload, served by the (upload_id, individual_json_uuid_v1("Json_ext" ->> 'ID')) index
+            WHERE ids.upload_id = current_upload_id
+            AND ids."isDeleted" = False
+            AND individual_individual."UUID" = individual_json_uuid_v1(ids."Json_ext" ->> 'ID')
+            AND validations ->> 'validation_errors' = '[]'
+            returning individual_individual."UUID", ids."UUID" as "individualdatasource_id")
+
+            UPDATE individual_individualdatasource
+      SET individual_id = u."UUID"
+      FROM updated_individuals u
+      WHERE upload_id=current_upload_id 
+        and individual_individualdatasource.individual_id is null 
+        and "isDeleted"=False 
+        and individual_individualdatasource."UUID" = u.individualdatasource_id
+        and validations ->> 'validation_errors' = '[]';
+
+            -- Change status to SUCCESS if no invalid items, change to PARTIAL_SUCCESS otherwise 
+            UPDATE individual_individualdatasourceupload
+            SET 
+                status = CASE
+                    WHEN (
+                        SELECT count(*) 
+                        FROM individual_individualdatasource
+                        WHERE upload_id=current_upload_id
+                            AND "isDeleted"=FALSE
+                            AND validations ->> 'validation_errors' = '[]'
+                    ) = (
+                        SELECT count(*) 
+                        FROM individual_individualdatasource
+                        WHERE upload_id=current_upload_id
+                            AND "isDeleted"=FALSE
+                    ) THEN 'SUCCESS'
+                    ELSE 'PARTIAL_SUCCESS'
+                END,
+                error = '{}'
+            WHERE "UUID" = current_upload_id;
+            EXCEPTION
+              WHEN OTHERS then
+
+              update individual_individualdatasourceupload set status='FAIL' where "UUID" = current_upload_id;
+                  UPDATE individual_individualdatasourceupload
+                  SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                                      'error', SQLERRM,
+                                      'timestamp', NOW()::text,
+                                      'upload_id', current_upload_id::text
+                                  ))
+                  WHERE "UUID" = current_upload_id;
+                END;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INDIVIDUAL_UPDATE_VALID_PARTIAL_V1_SQL = """
+CREATE OR REPLACE FUNCTION individual_update_valid_partial_v1(current_upload_id UUID, userUUID UUID, accepted UUID[])
+RETURNS void AS $$
+BEGIN
+      BEGIN 
+        -- Data sources pointing to an unknown individual get a per-row error and are left out of the update,
+        --  errors of the flagging are handled like the errors of the update
+        PERFORM individual_flag_unknown_ids_v1(current_upload_id, accepted);
+          WITH updated_individuals AS ( 
+            UPDATE individual_individual
+            SET first_name = COALESCE(ids."Json_ext"->>'first_name', first_name),
+                last_name = COALESCE(ids."Json_ext"->>'last_name', last_name),
+                dob = COALESCE(to_date(ids."Json_ext"->>'dob', 'YYYY-MM-DD'), dob),
+                "DateUpdated" = NOW(),
+                "Json_ext" = ids."Json_ext"
+            FROM individual_individualdatasource ids
+            -- Scoped to the upload, served by the (upload_id, individual_json_uuid_v1("Json_ext" ->> 'ID')) index
+            WHERE ids.upload_id = current_upload_id
+            AND ids."isDeleted" = False
+            AND (ids."UUID" = ANY(accepted))
+            AND individual_individual."UUID" = individual_json_uuid_v1(ids."Json_ext" ->> 'ID')
+            AND validations ->> 'validation_errors' = '[]'
+            RETURNING individual_individual."UUID", ids."UUID" as individualdatasource_id)
+           
+          UPDATE individual_individualdatasource
+          SET individual_id = u."UUID"
+          FROM updated_individuals u
+          WHERE upload_id = current_upload_id 
+            AND individual_individualdatasource.individual_id IS NULL 
+            AND "isDeleted" = False 
+            AND individual_individualdatasource."UUID" = u.individualdatasource_id
+            AND (individual_individualdatasource."UUID" = ANY(accepted))
+            AND validations ->> 'validation_errors' = '[]';
+            
+          EXCEPTION
+            WHEN OTHERS THEN
+              UPDATE individual_individualdatasourceupload SET status = 'FAIL' WHERE "UUID" = current_upload_id;
+              UPDATE individual_individualdatasourceupload
+              SET error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                              'error', SQLERRM,
+                              'timestamp', NOW()::text,
+                              'upload_id', current_upload_id::text
+                          ))
+              WHERE "UUID" = current_upload_id;
+      END;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Update procedures join individuals on individual_json_uuid_v1("Json_ext" ->> 'ID') of the staged rows
+CREATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS individual_datasource_upload_json_uuid_idx
+    ON individual_individualdatasource (upload_id, individual_json_uuid_v1("Json_ext" ->> 'ID'))
+    WHERE "isDeleted" = false
+"""
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS individual_datasource_upload_json_uuid_idx"
+
+PROCEDURES_SQL = [
+    INDIVIDUAL_JSON_UUID_V1_SQL,
+    INDIVIDUAL_FLAG_UNKNOWN_IDS_V1_SQL,
+    INDIVIDUAL_BASE_UPLOAD_V1_SQL,
+    INDIVIDUAL_BASE_UPLOAD_PARTIAL_V1_SQL,
+    INDIVIDUAL_UPLOAD_VALID_V1_SQL,
+    INDIVIDUAL_UPLOAD_VALID_PARTIAL_V1_SQL,
+    INDIVIDUAL_BASE_UPDATE_V1_SQL,
+    INDIVIDUAL_BASE_UPDATE_PARTIAL_V1_SQL,
+    INDIVIDUAL_UPDATE_VALID_V1_SQL,
+    INDIVIDUAL_UPDATE_VALID_PARTIAL_V1_SQL,
+]
+
+# Dropped in reverse order, the update procedures call individual_flag_unknown_ids_v1 and the index uses
+# individual_json_uuid_v1
+PROCEDURE_SIGNATURES = [
+    'individual_update_valid_partial_v1(UUID, UUID, UUID[])',
+    'individual_update_valid_v1(UUID, UUID)',
+    'individual_base_update_partial_v1(UUID, UUID, UUID[])',
+    'individual_base_update_v1(UUID, UUID)',
+    'individual_upload_valid_partial_v1(UUID, UUID, UUID[])',
+    'individual_upload_valid_v1(UUID, UUID)',
+    'individual_base_upload_partial_v1(UUID, UUID, UUID[])',
+    'individual_base_upload_v1(UUID, UUID)',
+    'individual_flag_unknown_ids_v1(UUID, UUID[])',
+    'individual_json_uuid_v1(text)',
+]
+
+
+def create_procedures(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # No params, the SQL is sent as is without placeholders substitution
+    for sql in PROCEDURES_SQL:
+        schema_editor.execute(sql, params=None)
+    schema_editor.execute(CREATE_INDEX_SQL, params=None)
+
+
+def drop_procedures(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_INDEX_SQL, params=None)
+    for signature in PROCEDURE_SIGNATURES:
+        schema_editor.execute(f"DROP FUNCTION IF EXISTS {signature}", params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0022_individualdatasource_validation_stamps'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_procedures, drop_procedures),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('individual', '0023_upload_procedures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualdatasourceupload',
+            name='sql_procedure_checkpoint',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalindividualdatasourceupload',
+            name='sql_procedure_checkpoint',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -74,11 +74,28 @@ class IndividualDataSourceUpload(HistoryModel):
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     error = models.JSONField(blank=True, default=dict)
 
+    rows_staged = models.IntegerField(default=0)
+    rows_validated = models.IntegerField(default=0)
+    rows_invalid = models.IntegerField(default=0)
+    rows_imported = models.IntegerField(default=0)
+
+    # sha256 of the uploaded file, identical re-uploads are matched by it
+    content_digest = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+
+    # Duration, rows, queries and memory of the import stages keyed by the stage name
+    stage_metrics = models.JSONField(blank=True, default=dict)
+
+    # Last data source of the last slice committed by a batched run of the upload procedure, next run resumes after it
+    sql_procedure_checkpoint = models.UUIDField(null=True, blank=True)
+
 
 class IndividualDataSource(HistoryModel):
     individual = models.ForeignKey(Individual, models.DO_NOTHING, blank=True, null=True)
     upload = models.ForeignKey(IndividualDataSourceUpload, models.DO_NOTHING, blank=True, null=True)
     validations = models.JSONField(blank=True, default=dict)
+    # sha256 of json_ext and of the validation configuration at the last validation, unchanged rows are not revalidated
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    validation_version = models.CharField(max_length=64, null=True, blank=True)
 
 
 class IndividualDataUploadRecords(HistoryModel):
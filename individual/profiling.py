@@ -0,0 +1,148 @@
+"""
+Measurement of the import stages: wall time, number of database queries and peak memory.
+"""
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.db import DatabaseError, connection
+
+logger = logging.getLogger(__name__)
+
+# Peaks of the stages being measured in the current thread, kept because every stage resets the tracemalloc peak
+_traced_stages = threading.local()
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries issued through the connection, works with DEBUG disabled.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class StageProfiler:
+    """
+    Collects metrics of named stages. Peak memory is measured with tracemalloc, which only traces
+    allocations of the current process and slows allocation heavy code down, it can be disabled with trace_memory.
+    Queries are counted on the default connection of the current thread. Stages can be nested,
+    also across profilers, peak memory of the outer stage includes the inner ones.
+    RSS is reported as the change of the current resident set size over the stage, `process_peak_rss_bytes`
+    is the peak of the whole process lifetime and doesn't belong to the stage.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measures the wrapped block, yields the stage metrics dict so the block can set `rows` once they are known.
+        """
+        metrics = {'name': name, 'rows': rows}
+        counter = QueryCounter()
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            self._fold_traced_peak()
+            # Python 3.9+, on 3.8 the peak of a stage can include allocations from before the stage
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self._traced_peaks().append(0)
+        start_rss = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                yield metrics
+        finally:
+            metrics['wall_time_s'] = round(time.perf_counter() - start, 6)
+            metrics['queries'] = counter.count
+            if self.trace_memory:
+                self._fold_traced_peak()
+                metrics['peak_traced_memory_bytes'] = self._traced_peaks().pop()
+                if started_tracing:
+                    tracemalloc.stop()
+            end_rss = current_rss_bytes()
+            metrics['rss_delta_bytes'] = end_rss - start_rss if end_rss is not None and start_rss is not None else None
+            metrics['process_peak_rss_bytes'] = max_rss_bytes()
+            self.stages.append(metrics)
+
+    @staticmethod
+    def _traced_peaks():
+        if not hasattr(_traced_stages, 'peaks'):
+            _traced_stages.peaks = []
+        return _traced_stages.peaks
+
+    @classmethod
+    def _fold_traced_peak(cls):
+        peak = tracemalloc.get_traced_memory()[1]
+        peaks = cls._traced_peaks()
+        peaks[:] = [max(stage_peak, peak) for stage_peak in peaks]
+
+    def results(self):
+        return {
+            'stages': self.stages,
+            'total': {
+                'wall_time_s': round(sum(stage['wall_time_s'] for stage in self.stages), 6),
+                'queries': sum(stage['queries'] for stage in self.stages),
+                'process_peak_rss_bytes': max_rss_bytes(),
+            },
+        }
+
+
+@contextmanager
+def upload_stage(upload_id, name, rows=None):
+    """
+    Measures a stage of the upload workflow and stores the metrics in IndividualDataSourceUpload.stage_metrics.
+    Metrics of a failed stage are stored with `failed` flag if the transaction allows it.
+    """
+    from individual.apps import IndividualConfig
+    from individual.utils import record_upload_stage_metrics
+
+    profiler = StageProfiler(trace_memory=IndividualConfig.enable_import_memory_tracing)
+    failed = False
+    try:
+        with profiler.stage(name, rows) as metrics:
+            yield metrics
+    except Exception:
+        failed = True
+        raise
+    finally:
+        metrics = dict(profiler.stages[-1], failed=failed, finished_at=datetime.now().isoformat())
+        try:
+            record_upload_stage_metrics(upload_id, metrics.pop('name'), metrics)
+        except DatabaseError as exc:
+            logger.warning("Metrics of upload %s stage %s not saved: %s", upload_id, name, exc)
+
+
+def max_rss_bytes():
+    """
+    Peak resident set size of the process, ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def current_rss_bytes():
+    """
+    Current resident set size of the process read from /proc/self/statm, None where it's not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
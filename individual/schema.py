@@ -24,6 +24,7 @@ from individual.gql_queries import IndividualGQLType, IndividualHistoryGQLType,
     GroupSummaryEnrollmentGQLType, GroupDataSourceGQLType
 from individual.models import Individual, IndividualDataSource, Group, \
     GroupIndividual, IndividualDataSourceUpload, IndividualDataUploadRecords, GroupDataSource
+from individual.services import IndividualDataSourceUploadStatisticsService
 
 
 def patch_details(data_df: pd.DataFrame):
@@ -287,7 +288,9 @@ class Query(ExportableQueryMixin, graphene.ObjectType):
 
         Query._check_permissions(info.context.user,
                                  IndividualConfig.gql_individual_search_perms)
-        query = IndividualDataSourceUpload.objects.filter(*filters)
+        query = IndividualDataSourceUploadStatisticsService.annotate_counts(
+            IndividualDataSourceUpload.objects.filter(*filters)
+        )
         return gql_optimizer.query(query, info)
 
     def resolve_group(self, info, **kwargs):
@@ -1,12 +1,16 @@
+import hashlib
+import io
 import logging
 import json
 import uuid
 import pandas as pd
-import concurrent.futures
 import math
+from typing import Iterator
 from pandas import DataFrame
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db import transaction
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.db import transaction, connection
 
 from calculation.services import get_calculation_object
 from core.custom_filters import CustomFilterWizardStorage
@@ -14,7 +18,8 @@ from core.models import User
 from core.services import BaseService
 from core.signals import register_service_signal
 from django.utils.translation import gettext as _
-from django.db.models import Q, OuterRef, Subquery
+from django.db.models import Count, Q, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from individual.apps import IndividualConfig
 from individual.models import (
     Individual,
@@ -26,9 +31,26 @@ from individual.models import (
 )
 from individual.utils import (
     load_dataframe,
-    fetch_summary_of_valid_items,
+    get_import_columns,
+    copy_individual_data_sources,
+    compute_content_digest,
+    update_upload_progress,
+    increment_upload_counters,
+    compute_row_hash,
+    get_validation_version,
+    iter_data_source_pages,
+    fetch_duplicated_values,
+    fetch_registered_values,
+    write_data_source_validations,
+    fetch_upload_validation_statistics,
     fetch_summary_of_broken_items
 )
+from individual.import_readers import ImportReaderRegistryPoint, ImportReader
+from individual.import_validation import (
+    ColumnarValidator, SqlUploadValidation, ValidationMemo, ValidationWorkerPool, compile_schema
+)
+from individual.import_validation.engine import is_missing_value
+from individual.profiling import upload_stage
 from individual.validation import (
     IndividualValidation,
     IndividualDataSourceValidation,
@@ -40,11 +62,27 @@ from core.services.utils import check_authentication as check_authentication, ou
 from tasks_management.models import Task
 from tasks_management.services import UpdateCheckerLogicServiceMixin, CreateCheckerLogicServiceMixin, \
     crud_business_data_builder, DeleteCheckerLogicServiceMixin
+from workflow.services import WorkflowService
 from workflow.systems.base import WorkflowHandler
 
 logger = logging.getLogger(__name__)
 
 
+def resolve_workflow(workflow_name, workflow_group) -> WorkflowHandler:
+    result = WorkflowService.get_workflows(workflow_name, workflow_group)
+    if not result.get('success'):
+        raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
+
+    workflows = result.get('data', {}).get('workflows')
+
+    if not workflows:
+        raise ValueError('Workflow not found: group={} name={}'.format(workflow_group, workflow_name))
+    if len(workflows) > 1:
+        raise ValueError('Multiple workflows found: group={} name={}'.format(workflow_group, workflow_name))
+
+    return workflows[0]
+
+
 class IndividualService(BaseService, UpdateCheckerLogicServiceMixin, DeleteCheckerLogicServiceMixin):
     @register_service_signal('individual_service.create')
     def create(self, obj_data):
@@ -149,6 +187,57 @@ class IndividualDataSourceService(BaseService):
         super().__init__(user, validation_class)
 
 
+class IndividualDataSourceUploadStatisticsService:
+    """
+    Validation statistics of an upload computed in the database, data sources are not loaded.
+    """
+
+    @staticmethod
+    def get_statistics(upload_id) -> dict:
+        statistics = fetch_upload_validation_statistics(upload_id)
+        statistics['percentage_of_invalid_items'] = \
+            IndividualDataSourceUploadStatisticsService._percentage_of_invalid_items(statistics)
+        return statistics
+
+    @staticmethod
+    def annotate_counts(queryset):
+        """
+        Annotates uploads with validation_total, validation_valid and validation_invalid, counts of listed uploads
+        are computed by the listing query instead of a query per upload.
+        """
+        sources = IndividualDataSource.objects.filter(upload_id=OuterRef('pk'), is_deleted=False)
+        validated = sources.filter(validations__validation_errors__isnull=False)
+        return queryset.annotate(
+            validation_total=_count_subquery(sources),
+            validation_valid=_count_subquery(validated.filter(validations__validation_errors=[])),
+            validation_invalid=_count_subquery(validated.exclude(validations__validation_errors=[])),
+        )
+
+    @staticmethod
+    def get_annotated_statistics(upload) -> dict:
+        """
+        Statistics of an upload annotated by annotate_counts, without field_errors.
+        """
+        statistics = {
+            'upload_id': upload.id,
+            'total': upload.validation_total,
+            'valid': upload.validation_valid,
+            'invalid': upload.validation_invalid,
+        }
+        statistics['percentage_of_invalid_items'] = \
+            IndividualDataSourceUploadStatisticsService._percentage_of_invalid_items(statistics)
+        return statistics
+
+    @staticmethod
+    def _percentage_of_invalid_items(statistics):
+        validated = statistics['valid'] + statistics['invalid']
+        return round(statistics['invalid'] / validated * 100, 2) if validated else 0
+
+
+def _count_subquery(queryset):
+    return Coalesce(Subquery(queryset.order_by().values('upload').annotate(count=Count('id')).values('count')), 0)
+
+
 class GroupService(BaseService, CreateCheckerLogicServiceMixin, UpdateCheckerLogicServiceMixin):
     OBJECT_TYPE = Group
 
@@ -512,17 +601,6 @@ class GroupAndGroupIndividualAlignmentService:
 
 
 class IndividualImportService:
-    import_loaders = {
-        # .csv
-        'text/csv': lambda f: pd.read_csv(f),
-        # .xlsx
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': lambda f: pd.read_excel(f),
-        # .xls
-        'application/vnd.ms-excel': lambda f: pd.read_excel(f),
-        # .ods
-        'application/vnd.oasis.opendocument.spreadsheet': lambda f: pd.read_excel(f),
-    }
-
     def __init__(self, user):
         super().__init__()
         self.user = user
@@ -531,19 +609,124 @@ class IndividualImportService:
     def import_individuals(self,
                            import_file: InMemoryUploadedFile,
                            workflow: WorkflowHandler,
-                           group_aggregation_column: str):
-        upload = self._save_sources(import_file)
+                           group_aggregation_column: str,
+                           upload: IndividualDataSourceUpload = None,
+                           content_digest: str = None):
+        upload = self._save_sources(import_file, upload, content_digest)
         self._create_individual_data_upload_records(workflow, upload, group_aggregation_column)
         self._trigger_workflow(workflow, upload)
         return {'success': True, 'data': {'upload_uuid': upload.uuid}}
 
+    @register_service_signal('individual.import_individuals_async')
+    def import_individuals_async(self,
+                                 import_file: InMemoryUploadedFile,
+                                 workflow: WorkflowHandler,
+                                 group_aggregation_column: str,
+                                 upload: IndividualDataSourceUpload = None,
+                                 content_digest: str = None):
+        """
+        Registers the upload and delegates parsing, staging and the workflow to the celery worker.
+        Import file has to be already saved in the individual upload storage.
+        """
+        from individual.tasks import task_import_individuals
+        if upload is None:
+            upload = self._create_upload_entry(import_file.name, content_digest)
+        self._create_individual_data_upload_records(workflow, upload, group_aggregation_column)
+        task_args = (str(self.user.id), str(upload.uuid), import_file.content_type, workflow.name, workflow.group)
+        transaction.on_commit(lambda: task_import_individuals.delay(*task_args))
+        return {'success': True, 'data': {'upload_uuid': upload.uuid}}
+
+    def import_individuals_from_storage(self, upload_id: uuid, content_type: str, workflow_name: str,
+                                        workflow_group: str):
+        """
+        Background part of import_individuals_async, reads the stored upload file and runs the workflow.
+        """
+        upload = IndividualDataSourceUpload.objects.get(id=upload_id)
+        try:
+            upload.status = IndividualDataSourceUpload.Status.IN_PROGRESS
+            upload.save(username=self.user.login_name)
+
+            workflow = resolve_workflow(workflow_name, workflow_group)
+            file_path = IndividualConfig.get_individual_upload_file_path(upload.source_name)
+            with default_storage.open(file_path, 'rb') as stored_file:
+                import_file = UploadedFile(stored_file, name=upload.source_name, content_type=content_type)
+                self._save_sources(import_file, upload)
+        except Exception as exc:
+            logger.error("Error while importing individuals in background", exc_info=exc)
+            upload.status = IndividualDataSourceUpload.Status.FAIL
+            upload.error = {'import': str(exc)}
+            upload.save(username=self.user.login_name)
+            return upload
+
+        self._trigger_workflow(workflow, upload)
+        return upload
+
+    def store_import_file(self, import_file):
+        """
+        Saves the import file in the individual upload storage, sha256 of the content is computed while it's written.
+        Returns the digest and the earlier upload of the same content, if there is one the file is not kept.
+        """
+        file_path = IndividualConfig.get_individual_upload_file_path(import_file.name)
+        if default_storage.exists(file_path) and not self.remove_failed_upload_file(import_file.name):
+            # Retried upload clashes with its own file, the clash is an error only if the content differs
+            content_digest = compute_content_digest(import_file)
+            duplicate = self.get_duplicate_upload(content_digest)
+            if duplicate is None:
+                raise FileExistsError("File {} already exists".format(import_file.name))
+            return content_digest, duplicate
+
+        import_file.seek(0)
+        content = _ContentDigestReader(import_file)
+        default_storage.save(file_path, File(io.BufferedReader(content), name=import_file.name))
+        import_file.seek(0)
+        duplicate = self.get_duplicate_upload(content.hexdigest())
+        if duplicate is not None:
+            default_storage.delete(file_path)
+        return content.hexdigest(), duplicate
+
+    @staticmethod
+    def remove_failed_upload_file(filename: str, exclude_id: uuid = None) -> bool:
+        """
+        Removes the stored file if all uploads of the file name failed, so a failed upload can be retried
+        with the same file name. Returns True if the file was removed.
+        """
+        uploads = IndividualDataSourceUpload.objects.filter(source_name=filename, is_deleted=False)
+        if exclude_id:
+            uploads = uploads.exclude(id=exclude_id)
+        if not uploads.exists() or uploads.exclude(status=IndividualDataSourceUpload.Status.FAIL).exists():
+            return False
+        default_storage.delete(IndividualConfig.get_individual_upload_file_path(filename))
+        return True
+
+    def get_duplicate_upload(self, content_digest: str, exclude_id: uuid = None):
+        # Failed uploads can be retried with the same file
+        queryset = IndividualDataSourceUpload.objects \
+            .filter(content_digest=content_digest, is_deleted=False) \
+            .exclude(status=IndividualDataSourceUpload.Status.FAIL)
+        if exclude_id:
+            queryset = queryset.exclude(id=exclude_id)
+        return queryset.order_by('-date_created').first()
+
+    def handle_duplicate_upload(self, duplicate: IndividualDataSourceUpload):
+        if IndividualConfig.import_duplicate_upload_policy == 'reject':
+            raise FileExistsError("Identical file was already uploaded as {}, upload {}".format(
+                duplicate.source_name, duplicate.uuid
+            ))
+        return {'success': True, 'data': {'upload_uuid': duplicate.uuid, 'duplicate': True}}
+
     @transaction.atomic
-    def _save_sources(self, import_file):
+    def _save_sources(self, import_file, upload=None, content_digest=None):
         # Method separated as workflow execution must be independent of the atomic transaction.
-        upload = self._create_upload_entry(import_file.name)
-        dataframe = self._load_import_file(import_file)
-        self._validate_dataframe(dataframe)
-        self._save_data_source(dataframe, upload)
+        if upload is None:
+            upload = self._create_upload_entry(import_file.name, content_digest)
+        with upload_stage(upload.id, 'save_sources') as stage:
+            rows_staged = 0
+            for chunk in self._iter_import_file_chunks(import_file):
+                rows_staged += self._save_data_source(chunk, upload)
+            if not rows_staged:
+                raise ValueError("Import file is empty")
+            stage['rows'] = rows_staged
+        update_upload_progress(upload.id, rows_staged=rows_staged)
         return upload
 
     @transaction.atomic
@@ -556,33 +739,221 @@ class IndividualImportService:
         record.save(user=self.user.user)
 
     def validate_import_individuals(self, upload_id: uuid, individual_sources):
-        dataframe = self._load_dataframe(individual_sources)
-        validated_dataframe, invalid_items = self._validate_possible_individuals(
-            dataframe,
-            upload_id
+        if IndividualConfig.validation_backend == 'sql' and connection.vendor == 'postgresql':
+            return self._validate_import_individuals_in_database(upload_id)
+        if IndividualConfig.enable_columnar_validation and IndividualConfig.enable_streaming_validation:
+            # Data sources are paged from the database, individual_sources are not loaded
+            return self._validate_import_individuals_streaming(upload_id)
+        with upload_stage(upload_id, 'validate') as stage:
+            dataframe = self._load_dataframe(individual_sources)
+            stage['rows'] = len(dataframe)
+            memo = self._get_validation_memo()
+            validated_dataframe, rows_invalid = self._validate_possible_individuals(
+                dataframe,
+                upload_id,
+                memo=memo
+            )
+            stage.update(memo.counters())
+        return {
+            'success': True,
+            'data': validated_dataframe,
+            'summary_invalid_items': fetch_summary_of_broken_items(upload_id),
+            'summary_invalid_count': rows_invalid,
+        }
+
+    def _validate_import_individuals_streaming(self, upload_id: uuid):
+        """
+        Validates data sources of the upload in pages of validation_page_size rows, validation errors of a page
+        are saved before the next page is fetched. Validated rows are not kept, `data` of the result is None.
+        Rows validated before with the same content and validation version are not revalidated, see _validate_page.
+        """
+        properties = json.loads(IndividualConfig.individual_schema).get("properties", {})
+        calculation_uuid = IndividualConfig.validation_calculation_uuid
+        calculation = get_calculation_object(calculation_uuid)
+        pool = ValidationWorkerPool \
+            if ValidationWorkerPool.get_workers_number() > 1 and ValidationWorkerPool.can_dispatch() else None
+
+        with upload_stage(upload_id, 'validate') as stage:
+            # Uniqueness is checked across pages, duplicated values of the whole upload are fetched up front
+            duplicated_values = {
+                field: fetch_duplicated_values(upload_id, field)
+                for field, field_properties in properties.items() if "uniqueness" in field_properties
+            }
+            # Shared by all pages, values repeated in different pages are validated once
+            memo = self._get_validation_memo()
+            validator = ColumnarValidator(
+                properties, calculation, calculation_uuid, upload_id, pool, duplicated_values,
+                registered_values=self._get_registered_values_lookup(), schema=self._get_compiled_schema(), memo=memo
+            )
+            validation_version = get_validation_version()
+            pages = iter_data_source_pages(
+                upload_id, IndividualConfig.validation_page_size, fields=self.STREAMING_VALIDATION_FIELDS
+            )
+            rows_validated = rows_revalidated = 0
+            for page in pages:
+                revalidated, invalid_delta = self._validate_page(validator, page, validation_version)
+                rows_validated += len(page)
+                rows_revalidated += revalidated
+                update_upload_progress(upload_id, rows_validated=rows_validated)
+                if invalid_delta:
+                    increment_upload_counters(upload_id, rows_invalid=invalid_delta)
+            stage['rows'] = rows_validated
+            stage['rows_revalidated'] = rows_revalidated
+            stage.update(memo.counters())
+
+        rows_invalid = fetch_upload_validation_statistics(upload_id)['invalid']
+        return {
+            'success': True,
+            'data': None,
+            'summary_invalid_items': fetch_summary_of_broken_items(upload_id),
+            'summary_invalid_count': rows_invalid,
+        }
+
+    def _validate_import_individuals_in_database(self, upload_id: uuid):
+        """
+        Runs the checks compiled by SqlUploadValidation with one UPDATE in the database. Validation calculations
+        that can't be compiled are run on pages of the data sources, their errors are added to the database ones.
+        """
+        properties = json.loads(IndividualConfig.individual_schema).get("properties", {})
+        calculation_uuid = IndividualConfig.validation_calculation_uuid
+        calculation = get_calculation_object(calculation_uuid)
+        validation = SqlUploadValidation(
+            properties,
+            schema=self._get_compiled_schema(),
+            registry_uniqueness=IndividualConfig.enable_registry_uniqueness_validation,
+            calculation=calculation,
+            calculation_uuid=calculation_uuid,
         )
-        return {'success': True, 'data': validated_dataframe, 'summary_invalid_items': invalid_items}
+        with upload_stage(upload_id, 'validate') as stage:
+            rows_validated = validation.execute(upload_id)
+            memo = self._get_validation_memo()
+            if validation.python_properties:
+                pool = ValidationWorkerPool \
+                    if ValidationWorkerPool.get_workers_number() > 1 and ValidationWorkerPool.can_dispatch() else None
+                validator = ColumnarValidator(
+                    validation.python_properties, calculation, calculation_uuid, upload_id, pool, memo=memo
+                )
+                pages = iter_data_source_pages(
+                    upload_id, IndividualConfig.validation_page_size, fields=('id', 'json_ext', 'validations')
+                )
+                for page in pages:
+                    self._add_page_validation_errors(validator, page)
+            stage['rows'] = rows_validated
+            stage.update(memo.counters())
+
+        rows_invalid = fetch_upload_validation_statistics(upload_id)['invalid']
+        update_upload_progress(upload_id, rows_validated=rows_validated, rows_invalid=rows_invalid)
+        return {
+            'success': True,
+            'data': None,
+            'summary_invalid_items': fetch_summary_of_broken_items(upload_id),
+            'summary_invalid_count': rows_invalid,
+        }
+
+    def _add_page_validation_errors(self, validator: ColumnarValidator, page):
+        source_ids = [source['id'] for source in page]
+        slice_bounds = ValidationWorkerPool.split_bounds(source_ids) if validator.pool is not None else None
+        results = validator.validate(self._page_dataframe(page), slice_bounds)
+
+        records = []
+        for source, result in zip(page, results):
+            errors = self._get_validation_errors(result['validations'])
+            if errors:
+                validations = source['validations']
+                records.append({
+                    'id': source['id'],
+                    'validations': {**validations, 'validation_errors': validations.get('validation_errors', []) + errors}
+                })
+        write_data_source_validations(records)
+
+    STREAMING_VALIDATION_FIELDS = ('id', 'json_ext', 'validations', 'content_hash', 'validation_version')
+
+    def _validate_page(self, validator: ColumnarValidator, page, validation_version):
+        """
+        Validates rows of the page whose json_ext or validation version changed since their last validation.
+        Other rows keep their validation errors, only the checks depending on other rows (uniqueness) are refreshed.
+        Saves the changed results, returns the number of revalidated rows and the change of the number of invalid rows.
+        """
+        changed, unchanged = [], []
+        for source in page:
+            row_hash = compute_row_hash(source['json_ext'])
+            is_current = source['content_hash'] == row_hash and source['validation_version'] == validation_version
+            (unchanged if is_current else changed).append(source)
+            source['content_hash'] = row_hash
+
+        results = {}
+        if changed:
+            changed_ids = [source['id'] for source in changed]
+            # Pool workers validate every row between the bounds, partially changed pages are validated locally
+            pooled = len(changed) == len(page) and validator.pool is not None
+            slice_bounds = ValidationWorkerPool.split_bounds(changed_ids) if pooled else None
+            for result in validator.validate(self._page_dataframe(changed), slice_bounds, pooled=pooled):
+                results[result['row']['id']] = self._get_validation_errors(result['validations'])
+        if unchanged:
+            for result in validator.validate(self._page_dataframe(unchanged), cross_row_only=True):
+                results[result['row']['id']] = self._get_validation_errors(result['validations'])
+
+        unchanged_ids = {source['id'] for source in unchanged}
+        records = []
+        invalid_delta = 0
+        for source in page:
+            previous_errors = source['validations'].get('validation_errors', [])
+            errors = results[source['id']]
+            if source['id'] in unchanged_ids:
+                errors = [
+                    error for error in previous_errors if error.get('note') not in ColumnarValidator.CROSS_ROW_NOTES
+                ] + errors
+                if self._same_validation_errors(errors, previous_errors):
+                    continue
+            invalid_delta += bool(errors) - bool(previous_errors)
+            records.append({
+                'id': source['id'],
+                'validations': {**source['validations'], 'validation_errors': errors},
+                'content_hash': source['content_hash'],
+                'validation_version': validation_version,
+            })
+
+        write_data_source_validations(records)
+        return len(changed), invalid_delta
+
+    @staticmethod
+    def _page_dataframe(sources):
+        dataframe = pd.DataFrame([source['json_ext'] or {} for source in sources])
+        dataframe['id'] = [source['id'] for source in sources]
+        return dataframe
+
+    @staticmethod
+    def _same_validation_errors(errors, other_errors):
+        def key(error):
+            return str(error.get('field_name')), str(error.get('note'))
+        return sorted(errors, key=key) == sorted(other_errors, key=key)
 
     def synchronize_data_for_reporting(self, upload_id: uuid):
-        self._synchronize_individual(upload_id)
+        with upload_stage(upload_id, 'synchronize'):
+            self._synchronize_individual(upload_id)
 
 
     @staticmethod
-    def process_chunk(chunk, properties, unique_validations, calculation, calculation_uuid):
+    def process_chunk(chunk, properties, unique_validations, calculation, calculation_uuid, memo=None):
         validated_dataframe = []
         for _, row in chunk.iterrows():
             field_validation = {'row': row.to_dict(), 'validations': {}}
             for field, field_properties in properties.items():
                 
-                # Validation Calculation
-                if "validationCalculation" in field_properties and field in row:
+                # Validation Calculation, missing values are not validated like in the columnar validation
+                if "validationCalculation" in field_properties and field in row and not is_missing_value(row[field]):
                     validation_name = field_properties["validationCalculation"]["name"]
-                    field_validation['validations'][field] = calculation.calculate_if_active_for_object(
-                        validation_name,
-                        calculation_uuid,
-                        field_name=field,
-                        field_value=row[field]
-                    )
+                    if memo is not None:
+                        field_validation['validations'][field] = memo.calculate(
+                            calculation, validation_name, calculation_uuid, field, row[field]
+                        )
+                    else:
+                        field_validation['validations'][field] = calculation.calculate_if_active_for_object(
+                            validation_name,
+                            calculation_uuid,
+                            field_name=field,
+                            field_value=row[field]
+                        )
                 
                 # Uniqueness Check
                 if "uniqueness" in field_properties and field in row:
@@ -592,41 +963,89 @@ class IndividualImportService:
         
         return validated_dataframe
     
-    def _validate_possible_individuals(self, dataframe: DataFrame, upload_id: uuid, num_workers=4):
+    def _validate_possible_individuals(self, dataframe: DataFrame, upload_id: uuid, num_workers=None, memo=None):
         schema_dict = json.loads(IndividualConfig.individual_schema)
         properties = schema_dict.get("properties", {})
         
         calculation_uuid = IndividualConfig.validation_calculation_uuid
         calculation = get_calculation_object(calculation_uuid)
         
+        num_workers = num_workers or ValidationWorkerPool.get_workers_number()
+        if IndividualConfig.enable_columnar_validation:
+            # Pool workers read committed rows only, validation inside of a transaction stays in the process
+            pool = ValidationWorkerPool if num_workers > 1 and ValidationWorkerPool.can_dispatch() else None
+            validated_dataframe = ColumnarValidator(
+                properties, calculation, calculation_uuid, upload_id, pool,
+                registered_values=self._get_registered_values_lookup(), schema=self._get_compiled_schema(), memo=memo
+            ).validate(dataframe)
+        else:
+            validated_dataframe = self._validate_rows(
+                dataframe, properties, calculation, calculation_uuid, num_workers, memo
+            )
+
+        self.save_validation_error_in_data_source_bulk(validated_dataframe)
+        rows_invalid = fetch_upload_validation_statistics(upload_id)['invalid']
+        update_upload_progress(upload_id, rows_validated=len(validated_dataframe), rows_invalid=rows_invalid)
+        return validated_dataframe, rows_invalid
+
+    @staticmethod
+    def _get_registered_values_lookup():
+        return fetch_registered_values if IndividualConfig.enable_registry_uniqueness_validation else None
+
+    @staticmethod
+    def _get_compiled_schema():
+        return compile_schema(IndividualConfig.individual_schema) if IndividualConfig.enable_schema_validation else None
+
+    @staticmethod
+    def _get_validation_memo():
+        return ValidationMemo(IndividualConfig.validation_memo_size)
+
+    @staticmethod
+    def _process_chunk_with_memo(chunk, properties, unique_validations, calculation, calculation_uuid, memo):
+        # Runs in a worker process, the memo is a copy and its counters are returned with the results
+        results = IndividualImportService.process_chunk(
+            chunk, properties, unique_validations, calculation, calculation_uuid, memo
+        )
+        return results, memo.counters()
+
+    def _validate_rows(self, dataframe, properties, calculation, calculation_uuid, num_workers=1, memo=None):
+        """
+        Validates rows one by one, split between the validation pool workers if there is more than one.
+        Chunks are pickled to the workers, validation inside of a transaction stays in the current process.
+        """
         unique_fields = [field for field, props in properties.items() if "uniqueness" in props]
         unique_validations = {}
         if unique_fields:
+            # Missing values are not duplicates, the same as in the columnar and database validation
             unique_validations = {
-                field: dataframe[field].duplicated(keep=False) 
+                field: dataframe[field].duplicated(keep=False) & dataframe[field].notna()
                 for field in unique_fields
             }
 
-        chunk_size = math.ceil(len(dataframe) / num_workers)
-        data_chunks = [dataframe[i:i + chunk_size] for i in range(0, dataframe.shape[0], chunk_size)]
+        memo = memo if memo is not None else self._get_validation_memo()
+        if num_workers <= 1 or not ValidationWorkerPool.can_dispatch():
+            return self.process_chunk(dataframe, properties, unique_validations, calculation, calculation_uuid, memo)
 
+        chunk_size = math.ceil(len(dataframe) / num_workers)
+        executor = ValidationWorkerPool.get_executor()
+        futures = [
+            executor.submit(
+                self._process_chunk_with_memo,
+                dataframe[start:start + chunk_size],
+                properties,
+                unique_validations,
+                calculation,
+                calculation_uuid,
+                ValidationMemo(memo.max_size),
+            )
+            for start in range(0, len(dataframe), chunk_size)
+        ]
         validated_dataframe = []
-        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
-            futures = [executor.submit(
-                self.process_chunk, 
-                chunk, 
-                properties, 
-                unique_validations, 
-                calculation, 
-                calculation_uuid
-            ) for chunk in data_chunks]
-            
-            for future in concurrent.futures.as_completed(futures):
-                validated_dataframe.extend(future.result())
-
-        self.save_validation_error_in_data_source_bulk(validated_dataframe)
-        invalid_items = fetch_summary_of_broken_items(upload_id)
-        return validated_dataframe, invalid_items
+        for future in futures:
+            results, memo_counters = future.result()
+            validated_dataframe.extend(results)
+            memo.merge(memo_counters)
+        return validated_dataframe
 
     def _handle_uniqueness(self, row, field, field_properties, dataframe):
         unique_class_validation = IndividualConfig.unique_class_validation
@@ -655,38 +1074,55 @@ class IndividualImportService:
         )
         return result_row
 
-    def _create_upload_entry(self, filename):
-        upload = IndividualDataSourceUpload(source_name=filename, source_type='individual import')
+    def _create_upload_entry(self, filename, content_digest=None):
+        upload = IndividualDataSourceUpload(
+            source_name=filename, source_type='individual import', content_digest=content_digest
+        )
         upload.save(username=self.user.login_name)
         return upload
 
     def _validate_dataframe(self, dataframe: pd.DataFrame):
         if dataframe is None:
             raise ValueError("Unknown error while loading import file")
-        if dataframe.empty:
-            raise ValueError("Import file is empty")
 
     def _load_import_file(self, import_file) -> pd.DataFrame:
-        if import_file.content_type not in self.import_loaders:
-            raise ValueError("Unsupported content type: {}".format(import_file.content_type))
+        reader = ImportReaderRegistryPoint.get_reader(import_file.content_type)
+        return reader.read(import_file, self._get_import_columns(reader))
 
-        return self.import_loaders[import_file.content_type](import_file)
+    def _iter_import_file_chunks(self, import_file) -> Iterator[pd.DataFrame]:
+        reader = ImportReaderRegistryPoint.get_reader(import_file.content_type)
+        for chunk in reader.iter_batches(import_file, IndividualConfig.import_chunk_size,
+                                         self._get_import_columns(reader)):
+            self._validate_dataframe(chunk)
+            yield chunk
 
-    def _save_data_source(self, dataframe: pd.DataFrame, upload: IndividualDataSourceUpload):
-        data_source_objects = []
-        
-        for _, row in dataframe.iterrows():
-            ds = IndividualDataSource(
+    @staticmethod
+    def _get_import_columns(reader: ImportReader):
+        return get_import_columns() if reader.column_projection else None
+
+    def _save_data_source(self, dataframe: pd.DataFrame, upload: IndividualDataSourceUpload) -> int:
+        # Whole chunk is serialized at once, records orient gives the same per-row mapping as row.to_json()
+        records = json.loads(dataframe.to_json(orient='records'))
+        if connection.vendor == 'postgresql':
+            return copy_individual_data_sources(records, upload.id, self.user.id)
+
+        data_source_objects = [
+            IndividualDataSource(
                 upload=upload,
-                json_ext=json.loads(row.to_json()),
+                json_ext=record,
                 validations={},
                 user_created=self.user,
                 user_updated=self.user,
                 uuid=uuid.uuid4()
             )
-            data_source_objects.append(ds)
+            for record in records
+        ]
 
-        IndividualDataSource.objects.bulk_create(data_source_objects)
+        IndividualDataSource.objects.bulk_create(
+            data_source_objects,
+            batch_size=IndividualConfig.import_bulk_create_batch_size
+        )
+        return len(data_source_objects)
 
     def _load_dataframe(self, individual_sources) -> pd.DataFrame:
         return load_dataframe(individual_sources)
@@ -716,28 +1152,24 @@ class IndividualImportService:
             return upload
 
     def save_validation_error_in_data_source_bulk(self, validated_dataframe):
-        data_sources_to_update = []
-
-        for field_validation in validated_dataframe:
-            row = field_validation['row']
-            error_fields = []
-
-            for key, value in field_validation['validations'].items():
-                if not value.get('success', False):
-                    error_fields.append({
-                        "field_name": value.get('field_name'),
-                        "note": value.get('note')
-                    })
-
-            data_sources_to_update.append(
-                IndividualDataSource(
-                    id=row['id'],
-                    validations={'validation_errors': error_fields}
-                )
-            )
+        write_data_source_validations(
+            {
+                'id': field_validation['row']['id'],
+                'validations': {'validation_errors': self._get_validation_errors(field_validation['validations'])}
+            }
+            for field_validation in validated_dataframe
+        )
 
-        if data_sources_to_update:
-            IndividualDataSource.objects.bulk_update(data_sources_to_update, ['validations'])
+    @staticmethod
+    def _get_validation_errors(validations):
+        error_fields = []
+        for key, value in validations.items():
+            if not value.get('success', False):
+                error_fields.append({
+                    "field_name": value.get('field_name'),
+                    "note": value.get('note')
+                })
+        return error_fields
 
     def create_task_with_importing_valid_items(self, upload_id: uuid):
         if IndividualConfig.enable_maker_checker_for_individual_upload:
@@ -790,6 +1222,216 @@ class IndividualImportService:
             individual.save(user=self.user.user)
 
 
+class IndividualChunkedUploadService:
+    """
+    Resumable upload of large import files. Each chunk is stored separately in the individual upload storage,
+    a dropped connection only requires resending missing chunks. Chunks are merged into the import file on
+    finalize, the import workflow starts only after the merge.
+    """
+    source_type = 'individual import'
+
+    def __init__(self, user):
+        self.user = user
+
+    @register_service_signal('individual.chunked_upload.init')
+    def init_upload(self, filename: str, content_type: str, workflow: WorkflowHandler, group_aggregation_column: str):
+        if not ImportReaderRegistryPoint.is_supported(content_type):
+            raise ValueError("Unsupported content type: {}".format(content_type))
+        self._check_target_file(filename)
+
+        upload = IndividualDataSourceUpload(
+            source_name=filename,
+            source_type=self.source_type,
+            json_ext={'chunked_upload': {
+                'content_type': content_type,
+                'workflow_name': workflow.name,
+                'workflow_group': workflow.group,
+                'group_aggregation_column': group_aggregation_column,
+            }}
+        )
+        upload.save(username=self.user.login_name)
+        return {'success': True, 'data': {'upload_uuid': upload.uuid}}
+
+    def append_chunk(self, upload_id: uuid, chunk_index: int, chunk):
+        self._get_pending_upload(upload_id)
+        if chunk_index < 0:
+            raise ValueError("Chunk index can't be negative")
+
+        chunk_path = IndividualConfig.get_individual_upload_chunk_path(upload_id, chunk_index)
+        # Chunk resent after a dropped connection replaces the previous copy
+        if default_storage.exists(chunk_path):
+            default_storage.delete(chunk_path)
+        default_storage.save(chunk_path, chunk)
+        return {'success': True, 'data': {'upload_uuid': upload_id, 'received_chunks': self.get_received_chunks(upload_id)}}
+
+    def get_received_chunks(self, upload_id: uuid):
+        try:
+            _, files = default_storage.listdir(IndividualConfig.get_individual_upload_chunk_path(upload_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name) for name in files if name.isdigit())
+
+    @register_service_signal('individual.chunked_upload.finalize')
+    def finalize_upload(self, upload_id: uuid, total_chunks: int):
+        with transaction.atomic():
+            # Locked and moved out of PENDING before the merge, concurrent finalize calls don't import twice
+            upload = self._get_pending_upload(upload_id, lock=True)
+            missing_chunks = sorted(set(range(total_chunks)) - set(self.get_received_chunks(upload_id)))
+            if total_chunks < 1 or missing_chunks:
+                raise ValueError("Missing chunks: {}".format(missing_chunks))
+
+            upload_details = upload.json_ext['chunked_upload']
+            workflow = resolve_workflow(upload_details['workflow_name'], upload_details['workflow_group'])
+            self._check_target_file(upload.source_name, exclude_id=upload.id)
+            upload.status = IndividualDataSourceUpload.Status.IN_PROGRESS
+            upload.save(username=self.user.login_name)
+
+        file_path = IndividualConfig.get_individual_upload_file_path(upload.source_name)
+        service = IndividualImportService(self.user)
+        try:
+            content_digest = self._merge_chunks(upload, total_chunks)
+            duplicate = service.get_duplicate_upload(content_digest, exclude_id=upload.id)
+            if duplicate is not None:
+                default_storage.delete(file_path)
+                self._delete_chunks(upload.id, total_chunks)
+                upload.delete(username=self.user.login_name)
+                return service.handle_duplicate_upload(duplicate)
+
+            upload.content_digest = content_digest
+            upload.save(username=self.user.login_name)
+            result = self._import_merged_file(service, upload, workflow, file_path)
+        except Exception as exc:
+            self._handle_finalize_error(upload, file_path, total_chunks, exc)
+            raise
+
+        # Chunks are kept until the import succeeded, a failed finalize can be retried
+        self._delete_chunks(upload.id, total_chunks)
+        return result
+
+    @staticmethod
+    def _import_merged_file(service, upload, workflow, file_path):
+        upload_details = upload.json_ext['chunked_upload']
+        if IndividualConfig.enable_async_import:
+            import_file = UploadedFile(name=upload.source_name, content_type=upload_details['content_type'])
+            return service.import_individuals_async(
+                import_file, workflow, upload_details['group_aggregation_column'], upload
+            )
+        with default_storage.open(file_path, 'rb') as stored_file:
+            import_file = UploadedFile(
+                stored_file, name=upload.source_name, content_type=upload_details['content_type']
+            )
+            return service.import_individuals(
+                import_file, workflow, upload_details['group_aggregation_column'], upload
+            )
+
+    def _handle_finalize_error(self, upload, file_path, total_chunks, exc):
+        """
+        Removes the merged file. If nothing was staged yet the upload goes back to PENDING with its chunks kept,
+        so finalize can be retried, otherwise the upload is marked FAIL.
+        """
+        if default_storage.exists(file_path):
+            default_storage.delete(file_path)
+        upload.refresh_from_db()
+        if upload.rows_staged:
+            upload.status = IndividualDataSourceUpload.Status.FAIL
+            upload.error = {'finalize': str(exc)}
+            self._delete_chunks(upload.id, total_chunks)
+        else:
+            upload.status = IndividualDataSourceUpload.Status.PENDING
+        upload.save(username=self.user.login_name)
+
+    def _merge_chunks(self, upload, total_chunks):
+        chunk_paths = [
+            IndividualConfig.get_individual_upload_chunk_path(upload.id, index) for index in range(total_chunks)
+        ]
+        content = _ContentDigestReader(_StorageChunksReader(chunk_paths))
+        default_storage.save(
+            IndividualConfig.get_individual_upload_file_path(upload.source_name),
+            File(io.BufferedReader(content), name=upload.source_name)
+        )
+        return content.hexdigest()
+
+    @staticmethod
+    def _delete_chunks(upload_id, total_chunks):
+        for index in range(total_chunks):
+            default_storage.delete(IndividualConfig.get_individual_upload_chunk_path(upload_id, index))
+        default_storage.delete(IndividualConfig.get_individual_upload_chunk_path(upload_id))
+
+    def _get_pending_upload(self, upload_id, lock=False):
+        uploads = IndividualDataSourceUpload.objects.filter(id=upload_id, is_deleted=False)
+        if lock:
+            uploads = uploads.select_for_update()
+        upload = uploads.first()
+        if not upload or not isinstance(upload.json_ext, dict) or 'chunked_upload' not in upload.json_ext:
+            raise ValueError("Chunked upload not found: {}".format(upload_id))
+        if upload.status != IndividualDataSourceUpload.Status.PENDING:
+            raise ValueError("Chunked upload {} is already finalized".format(upload_id))
+        return upload
+
+    @staticmethod
+    def _check_target_file(filename, exclude_id=None):
+        if default_storage.exists(IndividualConfig.get_individual_upload_file_path(filename)) \
+                and not IndividualImportService.remove_failed_upload_file(filename, exclude_id):
+            raise FileExistsError("File {} already exists".format(filename))
+
+
+class _StorageChunksReader(io.RawIOBase):
+    """
+    Read-only stream over consecutive storage files, used to merge chunks without loading them into memory.
+    """
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._current is None:
+                path = next(self._paths, None)
+                if path is None:
+                    return 0
+                self._current = default_storage.open(path, 'rb')
+            data = self._current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+class _ContentDigestReader(io.RawIOBase):
+    """
+    Read-only stream computing sha256 of the content passed through it, the digest is known once the stream
+    is consumed by the storage.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._digest = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._source.read(len(buffer))
+        if not data:
+            return 0
+        buffer[:len(data)] = data
+        self._digest.update(data)
+        return len(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
 class IndividualTaskCreatorService:
 
     def __init__(self, user):
@@ -835,14 +1477,5 @@ class IndividualTaskCreatorService:
         data_upload.save(user=self.user.user)
 
     def __calculate_percentage_of_invalid_items(self, upload_id):
-        number_of_valid_items = len(fetch_summary_of_valid_items(upload_id))
-        number_of_invalid_items = len(fetch_summary_of_broken_items(upload_id))
-        total_items = number_of_invalid_items + number_of_valid_items
-
-        if total_items == 0:
-            percentage_of_invalid_items = 0
-        else:
-            percentage_of_invalid_items = (number_of_invalid_items / total_items) * 100
+        return IndividualDataSourceUploadStatisticsService.get_statistics(upload_id)['percentage_of_invalid_items']
 
-        percentage_of_invalid_items = round(percentage_of_invalid_items, 2)
-        return percentage_of_invalid_items
@@ -13,6 +13,7 @@ from individual.models import (
     IndividualDataSource,
     IndividualDataUploadRecords, Group, GroupIndividual, Individual, GroupDataSource
 )
+from individual.profiling import upload_stage
 from individual.services import GroupIndividualService, GroupService
 from tasks_management.apps import TasksManagementConfig
 from tasks_management.models import Task
@@ -254,13 +255,14 @@ class IndividualItemsImportTaskCompletionEvent(BaseGroupColumnAggregationClass):
         if self.grouped_individuals is None or not self.grouped_individuals.exists():
             return
 
-        if self.group_aggregation_column == self.group_code_str:
-            self._create_or_update_groups_using_group_code()
-        else:
-            self._create_groups()
+        with upload_stage(self.upload_id, 'group_aggregation'):
+            if self.group_aggregation_column == self.group_code_str:
+                self._create_or_update_groups_using_group_code()
+            else:
+                self._create_groups()
 
-        self._create_task_or_data_source_into_entity()
-        self._clean_json_ext()
+            self._create_task_or_data_source_into_entity()
+            self._clean_json_ext()
 
 
 class IndividualItemsUploadTaskCompletionEvent(BaseGroupColumnAggregationClass):
@@ -270,9 +272,10 @@ class IndividualItemsUploadTaskCompletionEvent(BaseGroupColumnAggregationClass):
         if self.grouped_individuals is None or not self.grouped_individuals.exists():
             return
 
-        self._create_or_update_groups_using_group_code()
-        self._create_task_or_data_source_into_entity()
-        self._clean_json_ext()
+        with upload_stage(self.upload_id, 'group_aggregation'):
+            self._create_or_update_groups_using_group_code()
+            self._create_task_or_data_source_into_entity()
+            self._clean_json_ext()
 
 
 def on_task_complete_action(business_event, **kwargs):
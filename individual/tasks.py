@@ -15,3 +15,21 @@ def task_import_individual_workflow(user_uuid, upload_uuid):
 def task_import_individual_workflow_valid(user_uuid, upload_uuid, percentage_of_invalid_items):
     from individual.workflows.base_individual_upload import import_individual_workflow_valid
     return import_individual_workflow_valid(user_uuid, upload_uuid, percentage_of_invalid_items)
+
+
+@shared_task
+def task_import_individuals(user_uuid, upload_uuid, content_type, workflow_name, workflow_group):
+    from core.models import User
+    from individual.models import IndividualDataSourceUpload
+    from individual.services import IndividualImportService
+    try:
+        user = User.objects.get(id=user_uuid)
+        IndividualImportService(user).import_individuals_from_storage(
+            upload_uuid, content_type, workflow_name, workflow_group
+        )
+    except Exception as exc:
+        logger.error("Error while importing individuals of upload %s", upload_uuid, exc_info=exc)
+        # Plain UPDATE, the user may not be available for the history of the upload
+        IndividualDataSourceUpload.objects.filter(id=upload_uuid).update(
+            status=IndividualDataSourceUpload.Status.FAIL, error={'import': str(exc)}
+        )
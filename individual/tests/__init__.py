@@ -4,3 +4,22 @@ from .group_individual_service_test import GroupIndividualServiceTest
 from .graphql_query_test import IndividualGQLQueryTest
 from .graphql_mutation_individual_test import IndividualGQLMutationTest
 from .graphql_mutation_group_test import GroupGQLMutationTest
+from .individual_import_service_test import IndividualImportServiceTest
+from .profiling_test import StageProfilerTest
+from .chunked_upload_service_test import IndividualChunkedUploadServiceTest
+from .async_import_service_test import IndividualAsyncImportServiceTest
+from .upload_procedures_test import UploadProceduresTest
+from .update_procedures_test import UpdateProceduresTest
+from .sliced_workflow_test import SlicedWorkflowTest
+from .copy_staging_test import CopyFromStdinTest, CopyStagingTest
+from .fake_individuals_test import FakeIndividualsTest, FakeIndividualsUpdateSampleTest
+from .import_validation_test import (
+    ColumnarValidatorTest,
+    EmailRuleParityTest,
+    CompiledSchemaTest,
+    SqlUploadValidationTest,
+    ValidationMemoTest,
+    ValidationWorkerPoolTest,
+    StreamingValidationTest,
+    ValidationBackendsTest,
+)
@@ -0,0 +1,94 @@
+import tempfile
+import uuid
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.apps import IndividualConfig
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.services import IndividualImportService
+from individual.tasks import task_import_individuals
+
+CONTENT = b"first_name,last_name,dob\nJohn,Doe,1990-01-01\nJane,Doe,1991-02-02\n"
+
+
+class _Workflow:
+    name = 'async-test'
+    group = 'individual'
+
+    def run(self, payload):
+        return {'success': True}
+
+
+class IndividualAsyncImportServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(storage_dir.cleanup)
+        self.storage = FileSystemStorage(location=storage_dir.name)
+        for patcher in [
+            patch('individual.services.default_storage', self.storage),
+            patch('individual.services.resolve_workflow', return_value=_Workflow()),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = IndividualImportService(self.user)
+
+    def _store_upload(self, filename='async.csv'):
+        self.storage.save(IndividualConfig.get_individual_upload_file_path(filename), ContentFile(CONTENT))
+        upload = IndividualDataSourceUpload(source_name=filename, source_type='individual import')
+        upload.save(username=self.user.login_name)
+        return upload
+
+    def test_import_individuals_async_dispatches_task_on_commit(self):
+        import_file = SimpleUploadedFile('async.csv', CONTENT, content_type='text/csv')
+
+        with patch('individual.tasks.task_import_individuals.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            result = self.service.import_individuals_async(import_file, _Workflow(), None)
+
+        upload_uuid = result['data']['upload_uuid']
+        delay.assert_called_once_with(
+            str(self.user.id), str(upload_uuid), 'text/csv', _Workflow.name, _Workflow.group
+        )
+        self.assertFalse(IndividualDataSource.objects.filter(upload_id=upload_uuid).exists())
+
+    def test_import_individuals_from_storage(self):
+        upload = self._store_upload()
+
+        self.service.import_individuals_from_storage(upload.id, 'text/csv', _Workflow.name, _Workflow.group)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.TRIGGERED)
+        self.assertEqual(upload.rows_staged, 2)
+        self.assertEqual(IndividualDataSource.objects.filter(upload=upload, is_deleted=False).count(), 2)
+
+    def test_import_individuals_from_storage_missing_file(self):
+        upload = IndividualDataSourceUpload(source_name='missing.csv', source_type='individual import')
+        upload.save(username=self.user.login_name)
+
+        self.service.import_individuals_from_storage(upload.id, 'text/csv', _Workflow.name, _Workflow.group)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.FAIL)
+        self.assertIn('import', upload.error)
+
+    def test_task_import_individuals_marks_upload_failed(self):
+        upload = self._store_upload()
+
+        task_import_individuals(str(uuid.uuid4()), str(upload.id), 'text/csv', _Workflow.name, _Workflow.group)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.FAIL)
+        self.assertIn('import', upload.error)
+        self.assertFalse(IndividualDataSource.objects.filter(upload=upload).exists())
@@ -0,0 +1,135 @@
+import hashlib
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.services import IndividualChunkedUploadService, IndividualImportService
+
+CHUNKS = [
+    b"first_name,last_name,dob\n",
+    b"John,Doe,1990-01-01\n",
+    b"Jane,Doe,1991-02-02\n",
+]
+
+
+class _Workflow:
+    name = 'chunked-test'
+    group = 'individual'
+
+    def run(self, payload):
+        return {'success': True}
+
+
+class IndividualChunkedUploadServiceTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        storage_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(storage_dir.cleanup)
+        self.storage = FileSystemStorage(location=storage_dir.name)
+        for patcher in [
+            patch('individual.services.default_storage', self.storage),
+            patch('individual.services.resolve_workflow', return_value=_Workflow()),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = IndividualChunkedUploadService(self.user)
+
+    def _init_upload(self, filename='chunked.csv'):
+        result = self.service.init_upload(filename, 'text/csv', _Workflow(), None)
+        return result['data']['upload_uuid']
+
+    def _append_chunks(self, upload_id, indexes):
+        for index in indexes:
+            self.service.append_chunk(upload_id, index, ContentFile(CHUNKS[index]))
+
+    def test_append_and_resend_chunks(self):
+        upload_id = self._init_upload()
+
+        self._append_chunks(upload_id, [0, 2])
+        result = self.service.append_chunk(upload_id, 2, ContentFile(CHUNKS[2]))
+
+        self.assertEqual(result['data']['received_chunks'], [0, 2])
+        with self.assertRaises(ValueError):
+            self.service.append_chunk(upload_id, -1, ContentFile(b''))
+
+    def test_finalize_missing_chunks(self):
+        upload_id = self._init_upload()
+        self._append_chunks(upload_id, [0, 2])
+
+        with self.assertRaisesMessage(ValueError, "Missing chunks: [1]"):
+            self.service.finalize_upload(upload_id, 3)
+        self.assertEqual(IndividualDataSourceUpload.objects.get(id=upload_id).status,
+                         IndividualDataSourceUpload.Status.PENDING)
+
+    def test_finalize(self):
+        upload_id = self._init_upload()
+        self._append_chunks(upload_id, [0, 1, 2])
+
+        result = self.service.finalize_upload(upload_id, 3)
+
+        self.assertEqual(result['data']['upload_uuid'], upload_id)
+        self.assertEqual(IndividualDataSource.objects.filter(upload_id=upload_id).count(), 2)
+        self.assertEqual(self.service.get_received_chunks(upload_id), [])
+        with self.assertRaisesMessage(ValueError, "already finalized"):
+            self.service.finalize_upload(upload_id, 3)
+
+    def test_finalize_duplicate_digest(self):
+        earlier = IndividualDataSourceUpload(
+            source_name='earlier.csv', source_type='individual import',
+            status=IndividualDataSourceUpload.Status.SUCCESS,
+            content_digest=hashlib.sha256(b''.join(CHUNKS)).hexdigest(),
+        )
+        earlier.save(username=self.user.login_name)
+        upload_id = self._init_upload()
+        self._append_chunks(upload_id, [0, 1, 2])
+
+        result = self.service.finalize_upload(upload_id, 3)
+
+        self.assertEqual(result['data'], {'upload_uuid': earlier.uuid, 'duplicate': True})
+        self.assertFalse(self.storage.exists('individual_upload/chunked.csv'))
+        self.assertEqual(self.service.get_received_chunks(upload_id), [])
+
+    def test_finalize_failure_can_be_retried(self):
+        upload_id = self._init_upload()
+        self._append_chunks(upload_id, [0, 1, 2])
+
+        with patch.object(IndividualImportService, 'import_individuals', side_effect=RuntimeError('Import failed')):
+            with self.assertRaises(RuntimeError):
+                self.service.finalize_upload(upload_id, 3)
+
+        self.assertEqual(IndividualDataSourceUpload.objects.get(id=upload_id).status,
+                         IndividualDataSourceUpload.Status.PENDING)
+        self.assertFalse(self.storage.exists('individual_upload/chunked.csv'))
+        self.assertEqual(self.service.get_received_chunks(upload_id), [0, 1, 2])
+
+        self.service.finalize_upload(upload_id, 3)
+        self.assertEqual(IndividualDataSource.objects.filter(upload_id=upload_id).count(), 2)
+
+    def test_failed_upload_file_can_be_replaced(self):
+        failed = IndividualDataSourceUpload(
+            source_name='chunked.csv', source_type='individual import',
+            status=IndividualDataSourceUpload.Status.FAIL,
+        )
+        failed.save(username=self.user.login_name)
+        self.storage.save('individual_upload/chunked.csv', ContentFile(b'first_name\nJohn\n'))
+
+        upload_id = self._init_upload()
+        self._append_chunks(upload_id, [0, 1, 2])
+        self.service.finalize_upload(upload_id, 3)
+
+        self.assertEqual(IndividualDataSource.objects.filter(upload_id=upload_id).count(), 2)
+        with self.storage.open('individual_upload/chunked.csv') as stored_file:
+            self.assertEqual(stored_file.read(), b''.join(CHUNKS))
+        with self.assertRaises(FileExistsError):
+            self._init_upload()
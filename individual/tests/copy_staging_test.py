@@ -0,0 +1,123 @@
+import io
+import uuid
+from unittest import skipUnless
+
+from django.db import DataError, connection
+from django.test import SimpleTestCase, TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.utils import _copy_from_stdin, copy_individual_data_sources
+
+RECORDS = [
+    {'first_name': 'John', 'last_name': 'Doe', 'dob': '1990-01-01'},
+    {'first_name': 'Zoë', 'last_name': 'O\'Brien "Jr"', 'note': 'back\\slash\ttab\nnew line'},
+    {'first_name': 'Jane', 'income': 1200.5, 'tags': ['a', None], 'married': False},
+]
+
+
+class _Psycopg2Cursor:
+    def __init__(self):
+        self.copied = None
+
+    def copy_expert(self, sql, file, size=8192):
+        self.copied = (sql, file.read())
+
+
+class _Psycopg3Copy:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def write(self, block):
+        self.cursor.blocks.append(block)
+
+
+class _Psycopg3Cursor:
+    def __init__(self):
+        self.sql = None
+        self.blocks = []
+
+    def copy(self, sql):
+        self.sql = sql
+        return _Psycopg3Copy(self)
+
+
+class _CursorWrapper:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+class CopyFromStdinTest(SimpleTestCase):
+    sql = 'COPY individual_datasource_copy ("UUID", "Json_ext") FROM STDIN'
+    data = 'a' * 10 + '\n' + 'b' * 10 + '\n'
+
+    def test_psycopg2_copy_expert(self):
+        raw_cursor = _Psycopg2Cursor()
+        _copy_from_stdin(_CursorWrapper(raw_cursor), self.sql, io.StringIO(self.data))
+        self.assertEqual(raw_cursor.copied, (self.sql, self.data))
+
+    def test_psycopg3_copy_in_blocks(self):
+        raw_cursor = _Psycopg3Cursor()
+        _copy_from_stdin(_CursorWrapper(raw_cursor), self.sql, io.StringIO(self.data), block_size=8)
+        self.assertEqual(raw_cursor.sql, self.sql)
+        self.assertEqual(len(raw_cursor.blocks), 3)
+        self.assertEqual(''.join(raw_cursor.blocks), self.data)
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY staging requires PostgreSQL")
+class CopyStagingTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.upload = IndividualDataSourceUpload(source_name='copy.csv', source_type='individual import')
+        self.upload.save(username=self.user.login_name)
+
+    def _copy_table_exists(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pg_temp.individual_datasource_copy')")
+            return cursor.fetchone()[0] is not None
+
+    def test_copy_stages_rows(self):
+        rows = copy_individual_data_sources(RECORDS, self.upload.id, self.user.id)
+
+        self.assertEqual(rows, len(RECORDS))
+        data_sources = IndividualDataSource.objects.filter(upload=self.upload)
+        self.assertEqual(data_sources.count(), len(RECORDS))
+        self.assertCountEqual([data_source.json_ext for data_source in data_sources], RECORDS)
+        for data_source in data_sources:
+            self.assertEqual(data_source.validations, {})
+            self.assertEqual(data_source.user_created_id, self.user.id)
+            self.assertFalse(data_source.is_deleted)
+
+        # The temporary table of the transaction is emptied and reused by the next batch
+        self.assertEqual(copy_individual_data_sources(RECORDS[:1], self.upload.id, self.user.id), 1)
+        self.assertEqual(data_sources.count(), len(RECORDS) + 1)
+
+    def test_copy_nothing(self):
+        self.assertEqual(copy_individual_data_sources([], self.upload.id, self.user.id), 0)
+        self.assertFalse(IndividualDataSource.objects.filter(upload=self.upload).exists())
+
+    def test_copy_error_rolls_back(self):
+        with self.assertRaises(DataError):
+            copy_individual_data_sources(RECORDS, self.upload.id, 'not-a-uuid')
+
+        self.assertFalse(IndividualDataSource.objects.filter(upload=self.upload).exists())
+        self.assertFalse(self._copy_table_exists())
+        self.assertEqual(copy_individual_data_sources(RECORDS, self.upload.id, self.user.id), len(RECORDS))
+
+    def test_copy_ids_are_unique(self):
+        copy_individual_data_sources(RECORDS * 10, self.upload.id, self.user.id)
+        ids = IndividualDataSource.objects.filter(upload=self.upload).values_list('id', flat=True)
+        self.assertEqual(len(set(ids)), len(RECORDS) * 10)
+        self.assertTrue(all(isinstance(data_source_id, uuid.UUID) for data_source_id in ids))
@@ -0,0 +1,57 @@
+import json
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase
+from pandas.testing import assert_frame_equal
+
+from core.test_helpers import LogInHelper
+from individual.import_validation import compile_schema
+from individual.management.commands.fake_individuals import (
+    Command, build_generation_params, generate_block, json_schema
+)
+from individual.models import Individual
+
+
+class FakeIndividualsTest(SimpleTestCase):
+    reference_date = date(2024, 1, 1)
+
+    def _generate(self, seed, invalid_share=0.0):
+        params = build_generation_params(seed, '1:1,2:2,5:1', self.reference_date, invalid_share)
+        return [generate_block(index, start, 100, params) for index, start in enumerate(range(0, 300, 100))]
+
+    def test_same_seed_same_output(self):
+        for first, second in zip(self._generate(42, 0.1), self._generate(42, 0.1)):
+            assert_frame_equal(first, second)
+        self.assertFalse(self._generate(42)[0].equals(self._generate(43)[0]))
+
+    def test_invalid_numbers_rejected_by_schema(self):
+        dataframe = generate_block(0, 0, 1000, build_generation_params(42, '5', self.reference_date, 0.5))
+        invalid_rows = dataframe['number_of_children'] == 'many'
+
+        results = {
+            key: result.valid for key, field, result in
+            compile_schema(json.dumps({'properties': json_schema})).validate(dataframe)
+        }
+
+        self.assertTrue(invalid_rows.any())
+        self.assertEqual((~results['number_of_children_type']).tolist(), invalid_rows.tolist())
+
+
+class FakeIndividualsUpdateSampleTest(TestCase):
+
+    def test_update_ids_sampled_per_seed(self):
+        user = LogInHelper().get_or_create_user_api()
+        for index in range(10):
+            Individual(first_name=f'John{index}', last_name='Doe', dob='1990-01-01', json_ext={}) \
+                .save(username=user.login_name)
+        existing_ids = {str(individual_id) for individual_id in
+                        Individual.objects.filter(is_deleted=False).values_list('id', flat=True)}
+        command = Command()
+
+        sample = command._sample_update_ids(42, 10, 0.4)
+
+        self.assertEqual(len(sample), 4)
+        self.assertEqual(len(set(sample)), 4)
+        self.assertTrue(set(sample) <= existing_ids)
+        self.assertEqual(command._sample_update_ids(42, 10, 0.4), sample)
+        self.assertEqual(command._sample_update_ids(42, 10, 0), [])
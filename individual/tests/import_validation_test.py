@@ -0,0 +1,423 @@
+import json
+from unittest import skipUnless
+from unittest.mock import patch
+
+import pandas as pd
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.test_helpers import LogInHelper
+from individual.apps import IndividualConfig
+from individual.import_validation import (
+    ColumnarValidator, ColumnValidationRuleRegistryPoint, EmailColumnValidationRule, SqlUploadValidation,
+    ValidationMemo, ValidationWorkerPool, compile_schema
+)
+from individual.import_validation.pool import _get_worker_memo
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
+from individual.utils import (
+    fetch_duplicated_values, fetch_registered_values, iter_data_source_pages, write_data_source_validations
+)
+
+try:
+    from calcrule_validations.calculation_rule import ValidationsCalculationRule
+except ImportError:
+    ValidationsCalculationRule = None
+
+
+class _ScalarCalculation:
+    """
+    Validation calculation accepting only even values.
+    """
+
+    def active_for_object(self, validation_name, calculation_uuid):
+        return calculation_uuid == 'calculation-uuid'
+
+    def calculate_if_active_for_object(self, validation_name, calculation_uuid, field_name, field_value):
+        if not self.active_for_object(validation_name, calculation_uuid):
+            return None
+        success = field_value % 2 == 0
+        return {'success': success, 'field_name': field_name, 'note': None if success else 'Odd value'}
+
+
+class ColumnarValidatorTest(SimpleTestCase):
+    properties = {
+        'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}},
+        'number_of_children': {'type': 'integer', 'validationCalculation': {'name': 'EvenValidationStrategy'}},
+        'national_id': {'type': 'string', 'uniqueness': True},
+    }
+
+    def test_validate(self):
+        dataframe = pd.DataFrame({
+            'id': ['a', 'b', 'c'],
+            'email': ['john@example.com', 'invalid-email', None],
+            'number_of_children': [2, 4, 5],
+            'national_id': ['1', '2', '1'],
+        })
+
+        validator = ColumnarValidator(self.properties, _ScalarCalculation(), 'calculation-uuid')
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        self.assertEqual(result['a'], {
+            'national_id_uniqueness': {'success': False, 'field_name': 'national_id', 'note': 'Duplicated value'},
+        })
+        self.assertEqual(result['b'], {
+            'email': {'success': False, 'field_name': 'email', 'note': EmailColumnValidationRule.note},
+        })
+        self.assertEqual(set(result['c']), {'number_of_children', 'national_id_uniqueness'})
+        self.assertEqual(result['c']['number_of_children']['note'], 'Odd value')
+
+    def test_calculation_skips_missing_values(self):
+        dataframe = pd.DataFrame({'id': ['a', 'b'], 'number_of_children': [None, 5]})
+
+        validator = ColumnarValidator(self.properties, _ScalarCalculation(), 'calculation-uuid')
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        # Same as in the pool workers, which skip missing and null json values
+        self.assertEqual(result['a'], {})
+        self.assertEqual(set(result['b']), {'number_of_children'})
+
+    def test_validate_page_with_duplicated_values(self):
+        dataframe = pd.DataFrame({'id': ['a', 'b'], 'national_id': ['1', '2']})
+
+        validator = ColumnarValidator(
+            self.properties, _ScalarCalculation(), 'calculation-uuid', duplicated_values={'national_id': {'2'}}
+        )
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        self.assertEqual(result['a'], {})
+        self.assertEqual(set(result['b']), {'national_id_uniqueness'})
+
+    def test_validate_registered_values(self):
+        dataframe = pd.DataFrame({
+            'id': ['a', 'b', 'c'],
+            'ID': ['INDIVIDUAL-1', 'individual-3', None],
+            'national_id': ['1', '2', '3'],
+        })
+        registered = {'1': {'individual-1'}, '2': {'individual-2'}}
+
+        validator = ColumnarValidator(
+            self.properties, _ScalarCalculation(), 'calculation-uuid',
+            registered_values=lambda field, values: {value: registered[value] for value in values if value in registered}
+        )
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        self.assertEqual(result['a'], {})
+        self.assertEqual(result['b'], {
+            'national_id_registered': {'success': False, 'field_name': 'national_id', 'note': 'Value already registered'},
+        })
+        self.assertEqual(result['c'], {})
+
+    def test_inactive_rule_skipped(self):
+        dataframe = pd.DataFrame({'id': ['a', 'b'], 'email': ['invalid-email', 'john@example.com']})
+
+        validator = ColumnarValidator(self.properties, _ScalarCalculation(), 'other-calculation-uuid')
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        self.assertEqual(result, {'a': {}, 'b': {}})
+
+    def test_split_bounds(self):
+        self.assertEqual(ValidationWorkerPool.split_bounds([1, 2, 3, 4, 5], 2), [(1, 3), (4, 5)])
+        self.assertEqual(ValidationWorkerPool.split_bounds([1], 4), [(1, 1)])
+
+
+class CompiledSchemaTest(SimpleTestCase):
+    schema = json.dumps({
+        'required': ['national_id'],
+        'properties': {
+            'number_of_children': {'type': 'integer'},
+            'able_bodied': {'type': 'boolean'},
+            'educated_level': {'type': 'string', 'enum': ['primary', 'secondary']},
+            'national_id': {'type': 'string'},
+        },
+    })
+
+    def test_compile_schema_cached(self):
+        self.assertIs(compile_schema(self.schema), compile_schema(self.schema))
+
+    def test_validate(self):
+        dataframe = pd.DataFrame({
+            'number_of_children': [1, '2', 'many'],
+            'able_bodied': [True, 'false', 'yes'],
+            'educated_level': ['primary', None, 'tertiary'],
+            'national_id': ['1', 2, None],
+            'dob': ['2000-01-31', '2000-02-30', '31/01/2000'],
+        })
+
+        invalid = {
+            key: (~result.valid).to_numpy().nonzero()[0].tolist()
+            for key, field, result in compile_schema(self.schema).validate(dataframe)
+        }
+
+        self.assertEqual(invalid, {
+            'national_id_required': [2],
+            'dob_type': [],
+            'dob_format': [1, 2],
+            'number_of_children_type': [2],
+            'able_bodied_type': [2],
+            'educated_level_type': [],
+            'educated_level_enum': [2],
+            'national_id_type': [],
+        })
+
+
+class SqlUploadValidationTest(SimpleTestCase):
+
+    def test_compile(self):
+        schema = {
+            'required': ['national_id'],
+            'properties': {
+                'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}},
+                'number_of_children': {'type': 'integer', 'minimum': 0,
+                                       'validationCalculation': {'name': 'EvenValidationStrategy'}},
+                'national_id': {'type': 'string', 'uniqueness': True},
+            },
+        }
+        validation = SqlUploadValidation(
+            schema['properties'], compile_schema(json.dumps(schema)), registry_uniqueness=True,
+            calculation=_ScalarCalculation(), calculation_uuid='calculation-uuid'
+        )
+
+        sql, params = validation.get_sql('upload-id')
+
+        self.assertEqual(validation.python_properties, {
+            'number_of_children': {'validationCalculation': {'name': 'EvenValidationStrategy'}},
+        })
+        self.assertEqual(sql.count('%s'), len(params))
+        self.assertEqual(params.count('upload-id'), 2)
+        self.assertIn(EmailColumnValidationRule.note, params)
+        self.assertIn('Value already registered', params)
+
+    def test_compile_inactive_rule(self):
+        properties = {'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}}}
+
+        validation = SqlUploadValidation(
+            properties, calculation=_ScalarCalculation(), calculation_uuid='other-calculation-uuid'
+        )
+
+        self.assertEqual(validation.python_properties, {})
+        self.assertNotIn(EmailColumnValidationRule.note, validation.get_sql('upload-id')[1])
+
+
+@skipUnless(ValidationsCalculationRule, "calcrule_validations is not installed")
+class EmailRuleParityTest(SimpleTestCase):
+    properties = {'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}}}
+    emails = [
+        'john@example.com', 'John.Doe+tag@example.co.uk', 'john_doe@my-domain.org', 'john@example.c',
+        'john@example', 'john@sub_domain.com', 'john@@example.com', '@example.com', 'jo hn@example.com',
+        'john%doe@example.com', 'john@example.com\n', 'john@example..com', 'invalid-email', '',
+    ]
+
+    def _validate(self, calculation_uuid, rules):
+        dataframe = pd.DataFrame({'id': list(range(len(self.emails))), 'email': self.emails})
+        with patch.dict(ColumnValidationRuleRegistryPoint.REGISTERED_RULES, rules, clear=True):
+            validator = ColumnarValidator(self.properties, ValidationsCalculationRule, calculation_uuid)
+            return [item['validations'] for item in validator.validate(dataframe)]
+
+    def test_rule_matches_strategy(self):
+        calculation_uuid = IndividualConfig.validation_calculation_uuid
+        rule = EmailColumnValidationRule()
+
+        columnar = self._validate(calculation_uuid, {rule.name: rule})
+        scalar = self._validate(calculation_uuid, {})
+
+        self.assertEqual(columnar, scalar)
+        self.assertTrue(any(columnar) and not all(columnar))
+
+    def test_inactive_calculation(self):
+        rule = EmailColumnValidationRule()
+
+        self.assertEqual(self._validate('other-calculation-uuid', {rule.name: rule}), [{}] * len(self.emails))
+        self.assertEqual(self._validate('other-calculation-uuid', {}), [{}] * len(self.emails))
+
+
+@patch('individual.import_validation.memo.is_pure_validation', lambda name: name == 'EvenValidationStrategy')
+class ValidationMemoTest(SimpleTestCase):
+
+    def test_calculate(self):
+        memo = ValidationMemo(max_size=2)
+        calculation = _ScalarCalculation()
+
+        results = [
+            memo.calculate(calculation, 'EvenValidationStrategy', 'calculation-uuid', 'number', value)
+            for value in [2, 3, 2, 2.0, 5, 2]
+        ]
+        memo.calculate(calculation, 'OtherValidationStrategy', 'calculation-uuid', 'number', 2)
+
+        self.assertEqual([result['success'] for result in results], [True, False, True, True, False, True])
+        # 2.0 is kept apart from 2, 2 is dropped when 5 is added
+        self.assertEqual(memo.counters(), {'memo_hits': 1, 'memo_misses': 5})
+
+    def test_validate_with_memo(self):
+        dataframe = pd.DataFrame({'id': ['a', 'b', 'c'], 'number_of_children': [1, 1, 2]})
+        memo = ValidationMemo()
+
+        validator = ColumnarValidator(
+            ColumnarValidatorTest.properties, _ScalarCalculation(), 'calculation-uuid', memo=memo
+        )
+        result = {item['row']['id']: item['validations'] for item in validator.validate(dataframe)}
+
+        self.assertEqual(set(result['b']), {'number_of_children'})
+        self.assertEqual(result['c'], {})
+        self.assertEqual(memo.counters(), {'memo_hits': 1, 'memo_misses': 2})
+
+
+class ValidationWorkerPoolTest(TestCase):
+
+    def test_slice_bounds(self):
+        user = LogInHelper().get_or_create_user_api()
+        upload = IndividualDataSourceUpload(source_name='pool.csv', source_type='individual import')
+        upload.save(username=user.login_name)
+        for index in range(5):
+            IndividualDataSource(upload=upload, json_ext={'index': index}).save(username=user.login_name)
+        source_ids = sorted(IndividualDataSource.objects.filter(upload=upload).values_list('id', flat=True))
+
+        bounds = ValidationWorkerPool._slice_bounds(upload.id, 2)
+
+        self.assertEqual(bounds, [
+            (source_ids[0], source_ids[1]),
+            (source_ids[2], source_ids[3]),
+            (source_ids[4], source_ids[4]),
+        ])
+        self.assertFalse(ValidationWorkerPool.can_dispatch())
+
+    def test_worker_memo_per_upload(self):
+        memo = _get_worker_memo('upload-1')
+
+        self.assertIs(_get_worker_memo('upload-1'), memo)
+        self.assertIsNot(_get_worker_memo('upload-2'), memo)
+
+    @patch.object(IndividualConfig, 'validation_workers', 1)
+    def test_workers_number(self):
+        self.assertEqual(ValidationWorkerPool.get_workers_number(), 1)
+        with patch.object(IndividualConfig, 'validation_workers', 0), patch('os.cpu_count', return_value=3):
+            self.assertEqual(ValidationWorkerPool.get_workers_number(), 3)
+
+
+class StreamingValidationTest(TestCase):
+
+    def test_pages_and_duplicated_values(self):
+        user = LogInHelper().get_or_create_user_api()
+        upload = IndividualDataSourceUpload(source_name='pages.csv', source_type='individual import')
+        upload.save(username=user.login_name)
+        for national_id in ['1', '2', '1', '3', '2']:
+            IndividualDataSource(upload=upload, json_ext={'national_id': national_id}).save(username=user.login_name)
+        source_ids = sorted(IndividualDataSource.objects.filter(upload=upload).values_list('id', flat=True))
+
+        pages = list(iter_data_source_pages(upload.id, 2))
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([source['id'] for page in pages for source in page], source_ids)
+        self.assertEqual(set(pages[0][0]), {'id', 'json_ext'})
+        self.assertEqual(fetch_duplicated_values(upload.id, 'national_id'), {'1', '2'})
+
+    def test_fetch_registered_values(self):
+        user = LogInHelper().get_or_create_user_api()
+        individual = Individual(first_name='Jane', last_name='Doe', dob='1990-01-01',
+                                json_ext={'national_id': 'N-1', 'number_of_children': 2})
+        individual.save(username=user.login_name)
+
+        self.assertEqual(
+            fetch_registered_values('national_id', ['N-1', 'N-2']), {'N-1': {str(individual.id)}}
+        )
+        self.assertEqual(
+            fetch_registered_values('number_of_children', [2, 3], batch_size=1), {2: {str(individual.id)}}
+        )
+        self.assertEqual(
+            fetch_registered_values('number_of_children', [2.0, 2.5]), {2.0: {str(individual.id)}}
+        )
+
+    def test_write_data_source_validations(self):
+        user = LogInHelper().get_or_create_user_api()
+        upload = IndividualDataSourceUpload(source_name='write.csv', source_type='individual import')
+        upload.save(username=user.login_name)
+        sources = []
+        for index in range(3):
+            source = IndividualDataSource(upload=upload, json_ext={'index': index}, validations={'validation_errors': []})
+            source.save(username=user.login_name)
+            sources.append(source)
+        errors = [{'field_name': 'index', 'note': 'Invalid'}]
+
+        updated = write_data_source_validations([
+            {'id': sources[0].id, 'validations': {'validation_errors': []}},
+            {'id': sources[1].id, 'validations': {'validation_errors': errors}},
+            {'id': sources[2].id, 'validations': {'validation_errors': errors}},
+        ], batch_size=2)
+
+        self.assertEqual(updated, 2)
+        validations = dict(IndividualDataSource.objects.filter(upload=upload).values_list('id', 'validations'))
+        self.assertEqual(validations[sources[0].id], {'validation_errors': []})
+        self.assertEqual(validations[sources[2].id], {'validation_errors': errors})
+
+
+@skipUnless(connection.vendor == 'postgresql', "Database validation backend requires PostgreSQL")
+class ValidationBackendsTest(TestCase):
+    schema = {
+        'properties': {
+            'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}},
+            'national_id': {'type': 'string', 'uniqueness': True},
+        },
+    }
+
+    def test_backends_agree(self):
+        user = LogInHelper().get_or_create_user_api()
+        upload = IndividualDataSourceUpload(source_name='backends.csv', source_type='individual import')
+        upload.save(username=user.login_name)
+        for json_ext in [
+            {'email': 'john@example.com', 'national_id': '1'},
+            {'email': 'invalid-email', 'national_id': '1'},
+            {'email': None, 'national_id': None},
+            {'national_id': None},
+            {'email': 'jim@example.com'},
+            {'email': 'jane@example.com', 'national_id': '2'},
+            {'email': 'jim@example.com\n'},
+            {'email': 'John.Doe+tag@my-domain.co.uk'},
+            {'email': 'john@sub_domain.com'},
+        ]:
+            IndividualDataSource(upload=upload, json_ext=json_ext).save(username=user.login_name)
+        schema = compile_schema(json.dumps(self.schema))
+
+        python_errors, sql_errors = self._errors_of_backends(upload, self.schema['properties'], schema)
+
+        self.assertEqual(python_errors, sql_errors)
+        self.assertEqual(sum(1 for errors in sql_errors.values() if errors), 3)
+
+    def test_backends_agree_on_registered_values(self):
+        user = LogInHelper().get_or_create_user_api()
+        for national_id in (2, '7', 3.5):
+            individual = Individual(first_name='John', last_name='Doe', dob='1990-01-01',
+                                    json_ext={'national_id': national_id})
+            individual.save(username=user.login_name)
+        upload = IndividualDataSourceUpload(source_name='registered.csv', source_type='individual import')
+        upload.save(username=user.login_name)
+        # 2.0 is read from a spreadsheet column with missing cells, it's the registered 2
+        for national_id in (2.0, '7', 3.5, 4, None):
+            IndividualDataSource(upload=upload, json_ext={'national_id': national_id}).save(username=user.login_name)
+
+        python_errors, sql_errors = self._errors_of_backends(
+            upload, {'national_id': {'uniqueness': True}}, registry_uniqueness=True
+        )
+
+        self.assertEqual(python_errors, sql_errors)
+        self.assertEqual(sum(1 for errors in sql_errors.values() if errors), 3)
+
+    @staticmethod
+    def _errors_of_backends(upload, properties, schema=None, registry_uniqueness=False):
+        SqlUploadValidation(
+            properties, schema, registry_uniqueness=registry_uniqueness,
+            calculation=_ScalarCalculation(), calculation_uuid='calculation-uuid'
+        ).execute(upload.id)
+        sources = IndividualDataSource.objects.filter(upload=upload).values_list('id', 'json_ext', 'validations')
+        sql_errors = {
+            str(source_id): {(error['field_name'], error['note']) for error in validations['validation_errors']}
+            for source_id, _, validations in sources
+        }
+        dataframe = pd.DataFrame([{'id': str(source_id), **json_ext} for source_id, json_ext, _ in sources])
+        validator = ColumnarValidator(
+            properties, _ScalarCalculation(), 'calculation-uuid', schema=schema,
+            registered_values=fetch_registered_values if registry_uniqueness else None
+        )
+        python_errors = {
+            item['row']['id']: {(error['field_name'], error['note']) for error in item['validations'].values()}
+            for item in validator.validate(dataframe)
+        }
+        return python_errors, sql_errors
@@ -0,0 +1,284 @@
+import datetime
+import io
+import json
+from unittest import skipUnless
+from unittest.mock import patch
+
+import openpyxl
+import pandas as pd
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.apps import IndividualConfig
+from individual.import_readers import CsvReader, ParquetReader
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.services import IndividualImportService, IndividualDataSourceUploadStatisticsService
+from individual.utils import compute_content_digest, iter_pending_source_slices
+from individual.workflows.utils import SqlProcedurePythonWorkflow
+from workflow.exceptions import PythonWorkflowHandlerException
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def _csv_file(content, name='individuals.csv'):
+    return SimpleUploadedFile(name, content.encode('utf-8'), content_type='text/csv')
+
+
+def _xlsx_file(rows, name='individuals.xlsx'):
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    content = io.BytesIO()
+    workbook.save(content)
+    return SimpleUploadedFile(
+        name, content.getvalue(),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+def _arrow_file(content_type, name):
+    table = pyarrow.Table.from_pandas(pd.DataFrame({
+        'first_name': ['John', 'Jane', 'Jim'],
+        'last_name': ['Doe', 'Doe', 'Roe'],
+        'dob': [pd.Timestamp('1990-01-01'), pd.Timestamp('1991-02-02'), None],
+    }), preserve_index=False)
+    content = pyarrow.BufferOutputStream()
+    if content_type == 'application/vnd.apache.parquet':
+        pyarrow.parquet.write_table(table, content, row_group_size=2)
+    else:
+        new_writer = pyarrow.ipc.new_stream if content_type.endswith('stream') else pyarrow.ipc.new_file
+        with new_writer(content, table.schema) as writer:
+            writer.write_table(table, max_chunksize=2)
+    return SimpleUploadedFile(name, content.getvalue().to_pybytes(), content_type=content_type)
+
+
+class _EmailCalculation:
+    def calculate_if_active_for_object(self, validation_name, calculation_uuid, field_name, field_value):
+        success = '@' in field_value
+        return {'success': success, 'field_name': field_name, 'note': None if success else 'Invalid email format'}
+
+
+class IndividualImportServiceTest(TestCase):
+    user = None
+    service = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.service = IndividualImportService(cls.user)
+
+    @patch.object(IndividualConfig, 'import_chunk_size', 2)
+    def test_save_sources_in_chunks(self):
+        import_file = _csv_file(
+            "first_name,last_name,dob,number_of_children\n"
+            "John,Doe,1990-01-01,2\n"
+            "Jane,Doe,1991-02-02,\n"
+            "Jim,Roe,1992-03-03,0\n"
+        )
+        upload = self.service._save_sources(import_file)
+
+        data_sources = IndividualDataSource.objects.filter(upload=upload)
+        self.assertEqual(data_sources.count(), 3)
+        json_ext = {source.json_ext['first_name']: source.json_ext for source in data_sources}
+        self.assertEqual(json_ext['John']['dob'], '1990-01-01')
+        self.assertEqual(json_ext['Jim']['number_of_children'], 0)
+        # First chunk has a gap and is read as float, the value is staged as in the other chunks
+        self.assertEqual(json_ext['John']['number_of_children'], 2)
+        self.assertIsInstance(json_ext['John']['number_of_children'], int)
+        self.assertIsNone(json_ext['Jane']['number_of_children'])
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.stage_metrics['save_sources']['rows'], 3)
+        self.assertFalse(upload.stage_metrics['save_sources']['failed'])
+
+    def test_workflow_reads_upload_columns(self):
+        upload = self.service._save_sources(_csv_file(
+            "Unnamed: 0,first_name,last_name,dob\n"
+            "0,John,Doe,1990-01-01\n"
+            "1,Jane,Doe,1991-02-02\n"
+        ))
+
+        workflow = SqlProcedurePythonWorkflow(str(upload.id), str(self.user.id))
+
+        self.assertEqual(workflow.rows, 2)
+        self.assertEqual(workflow.columns, {'id', 'first_name', 'last_name', 'dob'})
+        workflow.validate_dataframe_headers()
+        with self.assertRaisesMessage(PythonWorkflowHandlerException, "missing essential header: ID"):
+            workflow.validate_dataframe_headers(is_update=True)
+
+    def test_save_sources_empty_file(self):
+        import_file = _csv_file("first_name,last_name,dob\n")
+        with self.assertRaises(ValueError):
+            self.service._save_sources(import_file)
+
+    @patch.object(IndividualConfig, 'import_chunk_size', 2)
+    def test_save_sources_xlsx_streamed(self):
+        import_file = _xlsx_file([
+            ['first_name', 'last_name', 'dob'],
+            ['John', 'Doe', datetime.date(1990, 1, 1)],
+            [None, None, None],
+            ['Jane', 'Doe', datetime.date(1991, 2, 2)],
+            ['Jim', 'Roe', datetime.date(1992, 3, 3)],
+        ])
+        upload = self.service._save_sources(import_file)
+
+        data_sources = IndividualDataSource.objects.filter(upload=upload)
+        self.assertEqual(data_sources.count(), 3)
+        dobs = {source.json_ext['first_name']: source.json_ext['dob'] for source in data_sources}
+        self.assertEqual(dobs, {'John': '1990-01-01', 'Jane': '1991-02-02', 'Jim': '1992-03-03'})
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    @patch.object(IndividualConfig, 'import_chunk_size', 2)
+    def test_save_sources_arrow_formats(self):
+        for content_type, name in [
+            ('application/vnd.apache.parquet', 'individuals.parquet'),
+            ('application/vnd.apache.arrow.file', 'individuals.arrow'),
+            ('application/vnd.apache.arrow.stream', 'individuals.arrows'),
+        ]:
+            with self.subTest(content_type=content_type):
+                upload = self.service._save_sources(_arrow_file(content_type, name))
+
+                data_sources = IndividualDataSource.objects.filter(upload=upload)
+                dobs = {source.json_ext['first_name']: source.json_ext['dob'] for source in data_sources}
+                self.assertEqual(dobs, {'John': '1990-01-01', 'Jane': '1991-02-02', 'Jim': None})
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_reader_rejects_unsupported_options(self):
+        import_file = _arrow_file('application/vnd.apache.parquet', 'individuals.parquet')
+        with self.assertRaises(TypeError):
+            ParquetReader().read(import_file, dtype=str)
+
+    def test_reader_availability(self):
+        self.assertTrue(CsvReader().is_available())
+        with patch('individual.import_readers.importlib.util.find_spec', return_value=None):
+            self.assertFalse(ParquetReader().is_available())
+            self.assertTrue(CsvReader().is_available())
+
+    def test_get_duplicate_upload(self):
+        content_digest = compute_content_digest(_csv_file("first_name,last_name,dob\nJohn,Doe,1990-01-01\n"))
+        upload = self.service._create_upload_entry('duplicate.csv', content_digest)
+
+        self.assertEqual(self.service.get_duplicate_upload(content_digest), upload)
+        self.assertIsNone(self.service.get_duplicate_upload(content_digest, exclude_id=upload.id))
+
+        upload.status = IndividualDataSourceUpload.Status.FAIL
+        upload.save(username=self.user.login_name)
+        self.assertIsNone(self.service.get_duplicate_upload(content_digest))
+
+    def test_handle_duplicate_upload(self):
+        upload = self.service._create_upload_entry('duplicate.csv', 'digest')
+
+        result = self.service.handle_duplicate_upload(upload)
+        self.assertEqual(result['data']['upload_uuid'], upload.uuid)
+
+        with patch.object(IndividualConfig, 'import_duplicate_upload_policy', 'reject'):
+            with self.assertRaises(FileExistsError):
+                self.service.handle_duplicate_upload(upload)
+
+    @patch.object(IndividualConfig, 'individual_schema', json.dumps({
+        'properties': {'national_id': {'type': 'string', 'uniqueness': True}},
+    }))
+    @patch.object(IndividualConfig, 'enable_columnar_validation', True)
+    @patch.object(IndividualConfig, 'enable_streaming_validation', True)
+    @patch.object(IndividualConfig, 'enable_schema_validation', True)
+    @patch('individual.services.get_calculation_object', lambda calculation_uuid: None)
+    def test_revalidate_changed_rows(self):
+        import_file = _csv_file(
+            "first_name,last_name,dob,national_id\n"
+            "John,Doe,1990-01-01,A1\n"
+            "Jane,Doe,1991-02-02,A1\n"
+            "Jim,Roe,1992-13-03,A2\n"
+        )
+        upload = self.service._save_sources(import_file)
+        self.service.validate_import_individuals(upload.id, None)
+        upload.refresh_from_db()
+        self.assertEqual(upload.rows_invalid, 3)
+
+        jane = IndividualDataSource.objects.get(upload=upload, json_ext__first_name='Jane')
+        jane.json_ext['national_id'] = 'A3'
+        jane.save(username=self.user.login_name)
+        result = self.service.validate_import_individuals(upload.id, None)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.rows_invalid, 1)
+        self.assertEqual(upload.stage_metrics['validate']['rows_revalidated'], 1)
+        self.assertEqual(result['summary_invalid_count'], 1)
+        jim = IndividualDataSource.objects.get(upload=upload, json_ext__first_name='Jim')
+        self.assertEqual(result['summary_invalid_items'], [jim.id])
+        john = IndividualDataSource.objects.get(upload=upload, json_ext__first_name='John')
+        self.assertEqual(john.validations['validation_errors'], [])
+
+    @patch.object(IndividualConfig, 'individual_schema', json.dumps({
+        'properties': {'email': {'type': 'string', 'validationCalculation': {'name': 'EmailValidationStrategy'}}},
+    }))
+    @patch('individual.services.get_calculation_object', lambda calculation_uuid: _EmailCalculation())
+    def test_default_validation_memoizes_pure_calculation(self):
+        upload = self.service._save_sources(_csv_file(
+            "first_name,last_name,dob,email\n"
+            "John,Doe,1990-01-01,doe@example.com\n"
+            "Jane,Doe,1991-02-02,doe@example.com\n"
+            "Jim,Roe,1992-03-03,invalid-email\n"
+        ))
+
+        result = self.service.validate_import_individuals(upload.id, IndividualDataSource.objects.filter(upload=upload))
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.stage_metrics['validate']['memo_hits'], 1)
+        self.assertEqual(upload.stage_metrics['validate']['memo_misses'], 2)
+        self.assertEqual(result['summary_invalid_count'], 1)
+        self.assertEqual(len(result['summary_invalid_items']), 1)
+
+    def test_upload_validation_statistics(self):
+        upload = self.service._create_upload_entry('statistics.csv')
+        email_error = {'field_name': 'email', 'note': 'Invalid email format'}
+        dob_error = {'field_name': 'dob', 'note': 'Invalid date, expected YYYY-MM-DD'}
+        for validations in [
+            {'validation_errors': []},
+            {'validation_errors': [email_error]},
+            {'validation_errors': [email_error, dob_error]},
+            {},
+        ]:
+            IndividualDataSource(upload=upload, json_ext={}, validations=validations).save(
+                username=self.user.login_name
+            )
+
+        statistics = IndividualDataSourceUploadStatisticsService.get_statistics(upload.id)
+
+        self.assertEqual(statistics['total'], 4)
+        self.assertEqual(statistics['valid'], 1)
+        self.assertEqual(statistics['invalid'], 2)
+        self.assertEqual(statistics['percentage_of_invalid_items'], 66.67)
+        self.assertEqual(statistics['field_errors'], [
+            {**email_error, 'count': 2},
+            {**dob_error, 'count': 1},
+        ])
+
+        annotated = IndividualDataSourceUploadStatisticsService.annotate_counts(
+            IndividualDataSourceUpload.objects.filter(id=upload.id)
+        ).get()
+        annotated_statistics = IndividualDataSourceUploadStatisticsService.get_annotated_statistics(annotated)
+        for key in ('total', 'valid', 'invalid', 'percentage_of_invalid_items'):
+            self.assertEqual(annotated_statistics[key], statistics[key])
+
+    def test_pending_source_slices(self):
+        upload = self.service._create_upload_entry('slices.csv')
+        for index in range(5):
+            IndividualDataSource(upload=upload, json_ext={'index': index}).save(username=self.user.login_name)
+        source_ids = sorted(IndividualDataSource.objects.filter(upload=upload).values_list('id', flat=True))
+
+        self.assertEqual(list(iter_pending_source_slices(upload.id, 2)), [
+            source_ids[0:2], source_ids[2:4], source_ids[4:5],
+        ])
+        # Resumed after the checkpoint, only the accepted data sources
+        self.assertEqual(
+            list(iter_pending_source_slices(upload.id, 2, after_id=source_ids[1], accepted=source_ids[1:4])),
+            [source_ids[2:4]]
+        )
@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from individual.models import IndividualDataSourceUpload
+from individual.profiling import StageProfiler
+
+
+class StageProfilerTest(TestCase):
+
+    def test_stage_metrics(self):
+        profiler = StageProfiler()
+        with profiler.stage('count') as stage:
+            stage['rows'] = IndividualDataSourceUpload.objects.count()
+            list(IndividualDataSourceUpload.objects.all())
+        with profiler.stage('idle', rows=0):
+            pass
+
+        results = profiler.results()
+        count, idle = results['stages']
+        self.assertEqual(count['name'], 'count')
+        self.assertEqual(count['rows'], 0)
+        self.assertEqual(count['queries'], 2)
+        self.assertEqual(idle['queries'], 0)
+        self.assertIn('peak_traced_memory_bytes', count)
+        self.assertEqual(results['total']['queries'], 2)
+
+    def test_stage_without_memory_tracing(self):
+        profiler = StageProfiler(trace_memory=False)
+        with profiler.stage('idle'):
+            pass
+
+        stage, = profiler.results()['stages']
+        self.assertNotIn('peak_traced_memory_bytes', stage)
+        self.assertGreater(stage['process_peak_rss_bytes'], 0)
+        self.assertIn('rss_delta_bytes', stage)
+
+    def test_nested_stages_across_profilers(self):
+        outer, inner = StageProfiler(), StageProfiler()
+        with outer.stage('outer'):
+            with inner.stage('inner'):
+                data = [0] * 100000
+            del data
+
+        outer_stage, = outer.results()['stages']
+        inner_stage, = inner.results()['stages']
+        self.assertGreaterEqual(outer_stage['peak_traced_memory_bytes'], inner_stage['peak_traced_memory_bytes'])
+        self.assertGreater(inner_stage['peak_traced_memory_bytes'], 0)
@@ -0,0 +1,110 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.apps import IndividualConfig
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
+from individual.workflows import base_individual_upload
+from individual.workflows.utils import SqlProcedurePythonWorkflow
+
+Status = IndividualDataSourceUpload.Status
+
+
+class SlicedWorkflowTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.upload = IndividualDataSourceUpload(source_name='slices.csv', source_type='individual import')
+        self.upload.save(username=self.user.login_name)
+
+    def _data_source(self, validation_errors=(), **json_ext):
+        data_source = IndividualDataSource(
+            upload=self.upload,
+            json_ext={'first_name': 'John', 'last_name': 'Doe', 'dob': '1990-01-01', **json_ext},
+            validations={'validation_errors': list(validation_errors)},
+        )
+        data_source.save(username=self.user.login_name)
+        return data_source
+
+    def _workflow(self, accepted=None):
+        return SqlProcedurePythonWorkflow(str(self.upload.id), str(self.user.id), accepted=accepted)
+
+    def _finish(self, initial_status, sliced_run_status=None):
+        IndividualDataSourceUpload.objects.filter(id=self.upload.id).update(
+            status=Status.IN_PROGRESS, error={'errors': {'error': 'Invalid entries'}},
+            sql_procedure_checkpoint=self.upload.id
+        )
+        workflow = self._workflow()
+        workflow.sliced_run_status = sliced_run_status
+        workflow._finish_sliced_run(initial_status)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.error, {})
+        self.assertIsNone(self.upload.sql_procedure_checkpoint)
+        return self.upload.status
+
+    @patch.object(IndividualConfig, 'sql_procedure_batch_size', 2)
+    def test_slices_fall_back_in_transaction(self):
+        workflow = self._workflow()
+        with patch.object(workflow, '_execute_sql_logic') as execute_sql_logic, \
+                patch.object(workflow, '_execute_sql_logic_in_slices') as execute_in_slices:
+            # Test cases run in a transaction, slices couldn't be committed separately
+            workflow._execute_sql_logic_or_slices('SELECT 1', [], slice_sql='SELECT 2')
+
+        execute_in_slices.assert_not_called()
+        execute_sql_logic.assert_called_once_with('SELECT 1', [])
+
+    def test_finish_accepted_run(self):
+        self.assertEqual(self._finish(Status.SUCCESS), Status.SUCCESS)
+        self.assertEqual(self._finish(Status.PARTIAL_SUCCESS), Status.PARTIAL_SUCCESS)
+        # Resumed after a failed slice
+        self.assertEqual(self._finish(Status.FAIL), Status.PARTIAL_SUCCESS)
+
+    def test_finish_run_of_all_data_sources(self):
+        self._data_source()
+        self.assertEqual(self._finish(None, sliced_run_status=Status.SUCCESS), Status.SUCCESS)
+        self.assertEqual(self._finish(None), Status.SUCCESS)
+
+        self._data_source(validation_errors=[{'field_name': 'first_name', 'note': 'Invalid name'}])
+        self.assertEqual(self._finish(None), Status.PARTIAL_SUCCESS)
+        self.assertEqual(self._finish(None, sliced_run_status=Status.SUCCESS), Status.SUCCESS)
+
+    @skipUnless(connection.vendor == 'postgresql', "Upload procedures require PostgreSQL")
+    def test_resume_failed_run(self):
+        for _ in range(4):
+            self._data_source()
+        source_ids = sorted(IndividualDataSource.objects.filter(upload=self.upload).values_list('id', flat=True))
+        # Missing required field in the second slice
+        failing = IndividualDataSource.objects.get(id=source_ids[2])
+        failing.json_ext.pop('dob')
+        failing.save(username=self.user.login_name)
+        individuals = Individual.objects.count()
+
+        self._workflow()._execute_sql_logic_in_slices(base_individual_upload.upload_sql_partial, 2)
+
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, Status.FAIL)
+        self.assertEqual(self.upload.sql_procedure_checkpoint, source_ids[1])
+        self.assertEqual(self.upload.rows_imported, 2)
+        linked = IndividualDataSource.objects.filter(upload=self.upload, individual__isnull=False)
+        self.assertCountEqual(linked.values_list('id', flat=True), source_ids[:2])
+
+        failing.json_ext['dob'] = '1990-01-01'
+        failing.save(username=self.user.login_name)
+        self._workflow()._execute_sql_logic_in_slices(base_individual_upload.upload_sql_partial, 2)
+
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, Status.SUCCESS)
+        self.assertEqual(self.upload.error, {})
+        self.assertIsNone(self.upload.sql_procedure_checkpoint)
+        self.assertEqual(self.upload.rows_imported, 4)
+        self.assertEqual(linked.count(), 4)
+        # Slices committed by the failed run are not imported again
+        self.assertEqual(Individual.objects.count() - individuals, 4)
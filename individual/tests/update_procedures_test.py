@@ -0,0 +1,63 @@
+import uuid
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
+from individual.workflows.individual_update_valid import upload_sql
+
+UNKNOWN_ID_ERROR = {'field_name': 'ID', 'note': 'Individual not found'}
+
+
+@skipUnless(connection.vendor == 'postgresql', "Update procedures require PostgreSQL")
+class UpdateProceduresTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def _data_source(self, upload, individual_id, first_name):
+        data_source = IndividualDataSource(
+            upload=upload,
+            json_ext={'ID': individual_id, 'first_name': first_name, 'last_name': 'Doe', 'dob': '1990-01-01'},
+            validations={'validation_errors': []},
+        )
+        data_source.save(username=self.user.login_name)
+        return data_source
+
+    def test_update_flags_unknown_individual_ids(self):
+        individual = Individual(first_name='John', last_name='Doe', dob='1990-01-01', json_ext={})
+        individual.save(username=self.user.login_name)
+        upload = IndividualDataSourceUpload(source_name='update.csv', source_type='individual import')
+        upload.save(username=self.user.login_name)
+        known = self._data_source(upload, str(individual.id).upper(), 'Johnny')
+        unknown = self._data_source(upload, str(uuid.uuid4()), 'Jane')
+        malformed = self._data_source(upload, 'not-an-id', 'Jim')
+
+        with connection.cursor() as cursor:
+            cursor.execute(upload_sql, [str(upload.id), str(self.user.id)])
+
+        upload.refresh_from_db()
+        individual.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.PARTIAL_SUCCESS)
+        self.assertEqual(upload.rows_invalid, 2)
+        self.assertEqual(individual.first_name, 'Johnny')
+        for data_source in (known, unknown, malformed):
+            data_source.refresh_from_db()
+        self.assertEqual(known.individual_id, individual.id)
+        self.assertEqual(known.validations['validation_errors'], [])
+        for data_source in (unknown, malformed):
+            self.assertIsNone(data_source.individual_id)
+            self.assertEqual(data_source.validations['validation_errors'], [UNKNOWN_ID_ERROR])
+
+        # Flagged rows are not flagged nor counted again on a rerun
+        with connection.cursor() as cursor:
+            cursor.execute(upload_sql, [str(upload.id), str(self.user.id)])
+        upload.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(upload.rows_invalid, 2)
+        self.assertEqual(unknown.validations['validation_errors'], [UNKNOWN_ID_ERROR])
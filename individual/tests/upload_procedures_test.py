@@ -0,0 +1,128 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
+from individual.workflows import base_individual_upload, individual_upload_valid
+
+INVALID_NAME_ERROR = {'field_name': 'first_name', 'note': 'Invalid name'}
+
+
+@skipUnless(connection.vendor == 'postgresql', "Upload procedures require PostgreSQL")
+class UploadProceduresTest(TestCase):
+    user = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+
+    def setUp(self):
+        self.upload = IndividualDataSourceUpload(source_name='upload.csv', source_type='individual import')
+        self.upload.save(username=self.user.login_name)
+
+    def _data_source(self, first_name, validation_errors=(), **json_ext):
+        data_source = IndividualDataSource(
+            upload=self.upload,
+            json_ext={'first_name': first_name, 'last_name': 'Doe', 'dob': '1990-01-01', **json_ext},
+            validations={'validation_errors': list(validation_errors)},
+        )
+        data_source.save(username=self.user.login_name)
+        return data_source
+
+    def _run(self, sql, *params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [str(self.upload.id), str(self.user.id), *params])
+        self.upload.refresh_from_db()
+
+    def _assert_linked(self, *data_sources):
+        for data_source in data_sources:
+            data_source.refresh_from_db()
+            self.assertIsNotNone(data_source.individual_id)
+            individual = Individual.objects.get(id=data_source.individual_id)
+            # Each data source is linked to the individual created from its own row
+            self.assertEqual(individual.first_name, data_source.json_ext['first_name'])
+            self.assertEqual(individual.json_ext, data_source.json_ext)
+        self.assertEqual(len({data_source.individual_id for data_source in data_sources}), len(data_sources))
+
+    def _assert_not_linked(self, *data_sources):
+        for data_source in data_sources:
+            data_source.refresh_from_db()
+            self.assertIsNone(data_source.individual_id)
+
+    def test_base_upload(self):
+        # Same json_ext apart from the name, linking can't rely on matching the content
+        data_sources = [self._data_source(name, hhid='1') for name in ('John', 'Jane', 'Jim')]
+
+        self._run(base_individual_upload.upload_sql)
+
+        self.assertEqual(self.upload.status, IndividualDataSourceUpload.Status.SUCCESS)
+        self._assert_linked(*data_sources)
+        self.assertEqual(Individual.objects.filter(id__in=[ds.individual_id for ds in data_sources]).count(), 3)
+
+    def test_base_upload_partial(self):
+        accepted = [self._data_source('John'), self._data_source('Jane')]
+        rest = self._data_source('Jim')
+
+        self._run(base_individual_upload.upload_sql_partial, [str(data_source.id) for data_source in accepted])
+
+        self._assert_linked(*accepted)
+        self._assert_not_linked(rest)
+
+    def test_upload_valid(self):
+        valid = [self._data_source('John'), self._data_source('Jane')]
+        invalid = self._data_source('J4ne', [INVALID_NAME_ERROR])
+
+        self._run(individual_upload_valid.upload_sql)
+
+        self.assertEqual(self.upload.status, IndividualDataSourceUpload.Status.PARTIAL_SUCCESS)
+        self._assert_linked(*valid)
+        self._assert_not_linked(invalid)
+
+    def test_upload_valid_all_valid(self):
+        data_sources = [self._data_source('John'), self._data_source('Jane')]
+
+        self._run(individual_upload_valid.upload_sql)
+
+        self.assertEqual(self.upload.status, IndividualDataSourceUpload.Status.SUCCESS)
+        self._assert_linked(*data_sources)
+
+    def test_upload_valid_partial(self):
+        accepted = self._data_source('John')
+        accepted_invalid = self._data_source('J4ne', [INVALID_NAME_ERROR])
+        rest = self._data_source('Jim')
+
+        self._run(
+            individual_upload_valid.upload_sql_partial, [str(accepted.id), str(accepted_invalid.id)]
+        )
+
+        self._assert_linked(accepted)
+        self._assert_not_linked(accepted_invalid, rest)
+
+    def _assert_missing_dob_fails(self, sql, accepted=False):
+        complete = self._data_source('John')
+        missing_dob = self._data_source('Jane')
+        missing_dob.json_ext.pop('dob')
+        missing_dob.save(username=self.user.login_name)
+
+        params = [[str(complete.id), str(missing_dob.id)]] if accepted else []
+        self._run(sql, *params)
+
+        self.assertEqual(self.upload.status, IndividualDataSourceUpload.Status.FAIL)
+        self.assertEqual(self.upload.error['errors']['failing_entries_dob'], [str(missing_dob.id)])
+        self._assert_not_linked(complete, missing_dob)
+        self.assertFalse(Individual.objects.filter(json_ext__first_name__in=['John', 'Jane']).exists())
+
+    def test_base_upload_missing_required_field(self):
+        self._assert_missing_dob_fails(base_individual_upload.upload_sql)
+
+    def test_base_upload_partial_missing_required_field(self):
+        self._assert_missing_dob_fails(base_individual_upload.upload_sql_partial, accepted=True)
+
+    def test_upload_valid_missing_required_field(self):
+        self._assert_missing_dob_fails(individual_upload_valid.upload_sql)
+
+    def test_upload_valid_partial_missing_required_field(self):
+        self._assert_missing_dob_fails(individual_upload_valid.upload_sql_partial, accepted=True)
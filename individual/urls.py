@@ -2,6 +2,10 @@ from django.urls import path
 
 from .views import (
     import_individuals,
+    init_chunked_import,
+    append_import_chunk,
+    chunked_import_status,
+    finalize_chunked_import,
     download_invalid_items,
     download_individual_upload,
     download_template_file
@@ -9,6 +13,10 @@ from .views import (
 
 urlpatterns = [
     path('import_individuals/', import_individuals),
+    path('import_individuals/chunked/init/', init_chunked_import),
+    path('import_individuals/chunked/append/', append_import_chunk),
+    path('import_individuals/chunked/status/', chunked_import_status),
+    path('import_individuals/chunked/finalize/', finalize_chunked_import),
     path('download_invalid_items/', download_invalid_items),
     path('download_individual_upload_file/', download_individual_upload),
     path('download_template_file/', download_template_file),
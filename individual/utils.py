@@ -1,10 +1,17 @@
+import hashlib
+import io
+import json
+import uuid
 from typing import Iterable
 
 import pandas as pd
 
-from django.db.models import Q, Value, Func, F
+from django.db import connection, transaction
+from django.db.models import Q, Value, Func, F, Count
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
 
-from individual.models import IndividualDataSource
+from individual.apps import IndividualConfig
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
 
 
 def load_dataframe(individual_sources: Iterable[IndividualDataSource]) -> pd.DataFrame:
@@ -17,6 +24,155 @@ def load_dataframe(individual_sources: Iterable[IndividualDataSource]) -> pd.Dat
     return recreated_df
 
 
+def get_import_columns():
+    """
+    Columns accepted in the import file, the same set is allowed by the python workflows header validation.
+    """
+    schema = json.loads(IndividualConfig.individual_schema)
+    columns = set(schema.get('properties', {}).keys())
+    columns.update(['first_name', 'last_name', 'dob', 'ID', 'recipient_info', 'individual_role', 'group_code'])
+    return columns
+
+
+def fetch_upload_columns(upload_id) -> set:
+    """
+    Keys of json_ext of the data sources of the upload. PostgreSQL returns them with a single DISTINCT query,
+    other databases read the data sources page by page, the data sources are never loaded at once.
+    """
+    if connection.vendor != 'postgresql':
+        columns = set()
+        for page in iter_data_source_pages(upload_id, IndividualConfig.validation_page_size):
+            for data_source in page:
+                columns.update(data_source['json_ext'] or {})
+        return columns
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT jsonb_object_keys("Json_ext")
+            FROM individual_individualdatasource
+            WHERE upload_id = %s::UUID AND "isDeleted" = False AND jsonb_typeof("Json_ext") = 'object'
+        """, [str(upload_id)])
+        return {column for column, in cursor.fetchall()}
+
+
+def iter_data_source_pages(upload_id, page_size, fields=('id', 'json_ext')):
+    """
+    Yields data sources of the upload as lists of at most page_size dicts with the given fields (id is required).
+    Pages are read with keyset pagination on the primary key, the next page is fetched when the previous
+    one was consumed, so only one page is held in memory.
+    """
+    data_sources = IndividualDataSource.objects \
+        .filter(upload_id=upload_id, is_deleted=False) \
+        .order_by('id')
+    last_id = None
+    while True:
+        page_query = data_sources if last_id is None else data_sources.filter(id__gt=last_id)
+        page = list(page_query.values(*fields)[:page_size])
+        if not page:
+            return
+        yield page
+        last_id = page[-1]['id']
+
+
+def iter_pending_source_slices(upload_id, slice_size, after_id=None, accepted=None):
+    """
+    Yields ids of data sources of the upload not linked to an individual yet, in lists of at most slice_size ids
+    ordered by id and starting after after_id. With accepted, only the given data sources are included.
+    Slices are read with keyset pagination like in iter_data_source_pages.
+    """
+    data_sources = IndividualDataSource.objects \
+        .filter(upload_id=upload_id, is_deleted=False, individual__isnull=True) \
+        .order_by('id')
+    if accepted is not None:
+        data_sources = data_sources.filter(id__in=accepted)
+    last_id = after_id
+    while True:
+        slice_query = data_sources if last_id is None else data_sources.filter(id__gt=last_id)
+        source_ids = list(slice_query.values_list('id', flat=True)[:slice_size])
+        if not source_ids:
+            return
+        yield source_ids
+        last_id = source_ids[-1]
+
+
+def fetch_duplicated_values(upload_id, field):
+    """
+    Values of the json_ext field occurring in more than one data source of the upload.
+    """
+    return set(
+        IndividualDataSource.objects
+        .filter(upload_id=upload_id, is_deleted=False, json_ext__has_key=field)
+        .order_by()
+        .values(value=KeyTransform(field, 'json_ext'))
+        .annotate(occurrences=Count('id'))
+        .filter(occurrences__gt=1)
+        .values_list('value', flat=True)
+    )
+
+
+def fetch_registered_values(field, values, batch_size=1000):
+    """
+    Looks up values of the json_ext field among individuals that are not deleted.
+    Returns ids (as str) of the individuals by the found value. Values are compared as text of json_ext->>field,
+    which is covered by the indexes of the create_uniqueness_indexes command. The values are sent in one query
+    on PostgreSQL, in batches of batch_size elsewhere because of the limits of query parameters.
+    """
+    values_by_text = {}
+    for value in values:
+        values_by_text.setdefault(_registered_value_text(value), []).append(value)
+    texts = list(values_by_text)
+    if connection.vendor == 'postgresql':
+        batch_size = len(texts) or 1
+
+    registered = {}
+    for start in range(0, len(texts), batch_size):
+        matches = Individual.objects \
+            .filter(is_deleted=False) \
+            .annotate(unique_value=KeyTextTransform(field, 'json_ext')) \
+            .filter(unique_value__in=texts[start:start + batch_size]) \
+            .values_list('unique_value', 'id')
+        for text, individual_id in matches:
+            for value in values_by_text[text]:
+                registered.setdefault(value, set()).add(str(individual_id))
+    return registered
+
+
+def _registered_value_text(value):
+    # Numbers of spreadsheet columns with missing cells are read as floats, json_ext->>field of 123 is '123'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def compute_row_hash(json_ext) -> str:
+    """
+    sha256 of the data source json_ext, independent of the order of the keys.
+    """
+    content = json.dumps(json_ext, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_validation_version() -> str:
+    """
+    sha256 of the configuration the validation results depend on, rows validated with a different version
+    are revalidated.
+    """
+    from individual.import_validation import ColumnValidationRuleRegistryPoint
+
+    rules = {
+        name: f'{type(rule).__module__}.{type(rule).__qualname__}'
+        for name, rule in ColumnValidationRuleRegistryPoint.REGISTERED_RULES.items()
+    }
+    configuration = [
+        IndividualConfig.individual_schema,
+        IndividualConfig.validation_calculation_uuid,
+        IndividualConfig.enable_schema_validation,
+        IndividualConfig.enable_registry_uniqueness_validation,
+        rules,
+    ]
+    return hashlib.sha256(json.dumps(configuration, sort_keys=True).encode('utf-8')).hexdigest()
+
+
 def fetch_summary_of_broken_items(upload_id):
     return list(IndividualDataSource.objects.filter(
         Q(is_deleted=False) &
@@ -25,9 +181,251 @@ def fetch_summary_of_broken_items(upload_id):
     ).values_list('uuid', flat=True))
 
 
-def fetch_summary_of_valid_items(upload_id):
-    return list(IndividualDataSource.objects.filter(
-        Q(is_deleted=False) &
-        Q(upload_id=upload_id) &
-        Q(validations__validation_errors=[])
-    ).values_list('uuid', flat=True))
+def fetch_upload_validation_statistics(upload_id) -> dict:
+    """
+    Numbers of data sources of the upload (total, valid, invalid) and number of validation errors by field and note.
+    Data sources without validation results are counted only in total. One aggregate query is used on PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        return _aggregate_upload_validation_statistics(upload_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            WITH sources AS (
+                SELECT validations -> 'validation_errors' AS errors
+                FROM individual_individualdatasource
+                WHERE upload_id = %s::UUID AND "isDeleted" = False
+            )
+            SELECT
+                count(*),
+                count(*) FILTER (WHERE errors = '[]'::jsonb),
+                count(*) FILTER (WHERE jsonb_typeof(errors) = 'array' AND errors <> '[]'::jsonb),
+                (
+                    SELECT coalesce(jsonb_agg(jsonb_build_object(
+                        'field_name', field_name, 'note', note, 'count', occurrences
+                    ) ORDER BY occurrences DESC, field_name, note), '[]'::jsonb)
+                    FROM (
+                        SELECT error ->> 'field_name' AS field_name, error ->> 'note' AS note, count(*) AS occurrences
+                        FROM sources, jsonb_array_elements(
+                            CASE WHEN jsonb_typeof(errors) = 'array' THEN errors ELSE '[]'::jsonb END
+                        ) AS error
+                        GROUP BY 1, 2
+                    ) AS histogram
+                )
+            FROM sources
+        """, [str(upload_id)])
+        total, valid, invalid, field_errors = cursor.fetchone()
+    if isinstance(field_errors, str):
+        field_errors = json.loads(field_errors)
+    return {'total': total, 'valid': valid, 'invalid': invalid, 'field_errors': field_errors}
+
+
+def _aggregate_upload_validation_statistics(upload_id) -> dict:
+    sources = IndividualDataSource.objects.filter(upload_id=upload_id, is_deleted=False)
+    histogram = {}
+    total = valid = invalid = 0
+    for validations in sources.values_list('validations', flat=True).iterator():
+        total += 1
+        errors = validations.get('validation_errors') if isinstance(validations, dict) else None
+        if not isinstance(errors, list):
+            continue
+        if not errors:
+            valid += 1
+            continue
+        invalid += 1
+        for error in errors:
+            key = (error.get('field_name'), error.get('note'))
+            histogram[key] = histogram.get(key, 0) + 1
+    field_errors = [
+        {'field_name': field_name, 'note': note, 'count': count}
+        for (field_name, note), count in histogram.items()
+    ]
+    field_errors.sort(key=lambda error: (-error['count'], str(error['field_name']), str(error['note'])))
+    return {'total': total, 'valid': valid, 'invalid': invalid, 'field_errors': field_errors}
+
+
+def update_upload_progress(upload_id, **counters):
+    """
+    Updates progress counters (rows_staged, rows_validated, rows_invalid, rows_imported) of the upload.
+    Plain UPDATE is used so polling the counters doesn't produce upload history entries.
+    """
+    IndividualDataSourceUpload.objects.filter(id=upload_id).update(**counters)
+
+
+def increment_upload_counters(upload_id, **deltas):
+    """
+    Adds the deltas to the counters of the upload in the database, see update_upload_progress.
+    """
+    IndividualDataSourceUpload.objects.filter(id=upload_id).update(
+        **{counter: F(counter) + delta for counter, delta in deltas.items()}
+    )
+
+
+def record_upload_stage_metrics(upload_id, stage, metrics):
+    """
+    Stores metrics of the import stage in stage_metrics of the upload, metrics of a repeated stage are replaced.
+    Plain UPDATE is used for the same reason as in update_upload_progress.
+    """
+    stage_metrics = IndividualDataSourceUpload.objects.filter(id=upload_id) \
+        .values_list('stage_metrics', flat=True).first()
+    if stage_metrics is None:
+        return
+    IndividualDataSourceUpload.objects.filter(id=upload_id).update(stage_metrics={**stage_metrics, stage: metrics})
+
+
+def compute_content_digest(file) -> str:
+    """
+    sha256 of an uploaded file, the file is rewound afterwards so it can be read again.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def count_imported_items(upload_id):
+    return IndividualDataSource.objects.filter(
+        upload_id=upload_id,
+        is_deleted=False,
+        individual__isnull=False
+    ).count()
+
+
+def copy_individual_data_sources(records: Iterable[dict], upload_id, user_id) -> int:
+    """
+    Stages upload rows with COPY ... FROM STDIN, PostgreSQL only.
+    Rows are copied into a temporary table first and moved to individual_individualdatasource with a single
+    INSERT ... SELECT that fills the HistoryModel audit columns on the database side. Ids are generated in Python,
+    gen_random_uuid() is only built in since PostgreSQL 13.
+    """
+    buffer = io.StringIO()
+    rows = 0
+    for record in records:
+        # COPY text format, json.dumps already escapes control characters, only backslashes need doubling
+        buffer.write(str(uuid.uuid4()))
+        buffer.write('\t')
+        buffer.write(json.dumps(record).replace('\\', '\\\\'))
+        buffer.write('\n')
+        rows += 1
+
+    if not rows:
+        return 0
+
+    buffer.seek(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE IF NOT EXISTS individual_datasource_copy ("UUID" uuid, "Json_ext" jsonb) '
+            'ON COMMIT DROP'
+        )
+        _copy_from_stdin(cursor, 'COPY individual_datasource_copy ("UUID", "Json_ext") FROM STDIN', buffer)
+        cursor.execute("""
+            INSERT INTO individual_individualdatasource (
+                "UUID", "isDeleted", "Json_ext", "DateCreated", "DateUpdated", version,
+                "UserCreatedUUID", "UserUpdatedUUID", upload_id, validations
+            )
+            SELECT "UUID", false, "Json_ext", NOW(), NOW(), 1, %s::UUID, %s::UUID, %s::UUID, '{}'::jsonb
+            FROM individual_datasource_copy
+        """, [str(user_id), str(user_id), str(upload_id)])
+        cursor.execute('TRUNCATE individual_datasource_copy')
+    return rows
+
+
+# Columns of IndividualDataSource written back by validation, with their type in the temporary table
+VALIDATION_WRITE_COLUMNS = {
+    'validations': 'jsonb',
+    'content_hash': 'varchar(64)',
+    'validation_version': 'varchar(64)',
+}
+
+
+def write_data_source_validations(records: Iterable[dict], batch_size=None) -> int:
+    """
+    Writes validation results of data sources. Records are dicts with id and validations, optionally also with
+    content_hash and validation_version, all records have the same keys. Records are written in batches of
+    validation_write_batch_size, rows whose values didn't change are not updated. Returns the number of updated rows.
+    """
+    batch_size = batch_size or IndividualConfig.validation_write_batch_size
+    write = _write_validations_copy if connection.vendor == 'postgresql' else _write_validations_bulk_update
+    updated = 0
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            updated += write(batch)
+            batch = []
+    if batch:
+        updated += write(batch)
+    return updated
+
+
+def _write_validations_copy(batch) -> int:
+    """
+    PostgreSQL, the batch is copied into a temporary table and applied with a single UPDATE ... FROM.
+    """
+    columns = [column for column in VALIDATION_WRITE_COLUMNS if column in batch[0]]
+    buffer = io.StringIO()
+    for record in batch:
+        values = [str(record['id'])]
+        for column in columns:
+            value = record[column]
+            if value is None:
+                values.append('\\N')
+            elif column == 'validations':
+                values.append(json.dumps(value).replace('\\', '\\\\'))
+            else:
+                values.append(value)
+        buffer.write('\t'.join(values))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    column_definitions = ', '.join(f'{column} {VALIDATION_WRITE_COLUMNS[column]}' for column in columns)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE IF NOT EXISTS individual_validation_write '
+            f'("UUID" uuid, {column_definitions}) ON COMMIT DROP'
+        )
+        _copy_from_stdin(
+            cursor, f'COPY individual_validation_write ("UUID", {", ".join(columns)}) FROM STDIN', buffer
+        )
+        cursor.execute(f"""
+            UPDATE individual_individualdatasource AS ds
+            SET {', '.join(f'{column} = w.{column}' for column in columns)}
+            FROM individual_validation_write AS w
+            WHERE ds."UUID" = w."UUID"
+              AND ({' OR '.join(f'ds.{column} IS DISTINCT FROM w.{column}' for column in columns)})
+        """)
+        updated = cursor.rowcount
+        # Dropped right away, writes in the same transaction can have different columns
+        cursor.execute('DROP TABLE individual_validation_write')
+    return updated
+
+
+def _write_validations_bulk_update(batch) -> int:
+    columns = [column for column in VALIDATION_WRITE_COLUMNS if column in batch[0]]
+    current = {
+        source['id']: source
+        for source in IndividualDataSource.objects.filter(id__in=[record['id'] for record in batch]).values('id', *columns)
+    }
+    data_sources_to_update = [
+        IndividualDataSource(id=record['id'], **{column: record[column] for column in columns})
+        for record in batch
+        if any(current.get(record['id'], {}).get(column) != record[column] for column in columns)
+    ]
+    if data_sources_to_update:
+        IndividualDataSource.objects.bulk_update(data_sources_to_update, columns, batch_size=len(batch))
+    return len(data_sources_to_update)
+
+
+def _copy_from_stdin(cursor, sql, buffer, block_size=65536):
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        # psycopg2
+        raw_cursor.copy_expert(sql, buffer, size=block_size)
+        return
+    # psycopg 3
+    with raw_cursor.copy(sql) as copy:
+        block = buffer.read(block_size)
+        while block:
+            copy.write(block)
+            block = buffer.read(block_size)
@@ -12,33 +12,17 @@ from rest_framework.response import Response
 from core.utils import DefaultStorageFileHandler
 from im_export.views import check_user_rights
 from individual.apps import IndividualConfig
+from individual.import_readers import ImportReaderRegistryPoint
 from individual.models import IndividualDataSource
-from individual.services import IndividualImportService
+from individual.services import IndividualImportService, IndividualChunkedUploadService, resolve_workflow
 
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from workflow.services import WorkflowService
-
 logger = logging.getLogger(__name__)
 
-_import_loaders = {
-    # .csv
-    'text/csv': lambda f, **kwargs: pd.read_csv(f, **kwargs),
-    # .xlsx
-    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': lambda f, **kwargs: pd.read_excel(f, **kwargs),
-    # .xls
-    'application/vnd.ms-excel': lambda f, **kwargs: pd.read_excel(f, **kwargs),
-    # .ods
-    'application/vnd.oasis.opendocument.spreadsheet': lambda f, **kwargs: pd.read_excel(f, **kwargs),
-}
-
 
 def load_spreadsheet(file: InMemoryUploadedFile, **kwargs) -> pd.DataFrame:
-    content_type = file.content_type
-    if content_type not in _import_loaders:
-        raise ValueError("Unsupported content type: {}".format(content_type))
-
-    return _import_loaders[content_type](file, **kwargs)
+    return ImportReaderRegistryPoint.get_reader(file.content_type).read(file, **kwargs)
 
 
 def get_global_schema_fields():
@@ -78,8 +62,18 @@ def import_individuals(request):
     try:
         user = request.user
         import_file, workflow, group_aggregation_column = _resolve_import_individuals_args(request)
-        _handle_file_upload(import_file)
-        result = IndividualImportService(user).import_individuals(import_file, workflow, group_aggregation_column)
+        service = IndividualImportService(user)
+        content_digest, duplicate = service.store_import_file(import_file)
+        if duplicate is not None:
+            return Response(service.handle_duplicate_upload(duplicate))
+        if IndividualConfig.enable_async_import:
+            result = service.import_individuals_async(
+                import_file, workflow, group_aggregation_column, content_digest=content_digest
+            )
+        else:
+            result = service.import_individuals(
+                import_file, workflow, group_aggregation_column, content_digest=content_digest
+            )
         if not result.get('success'):
             raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
 
@@ -97,6 +91,91 @@ def import_individuals(request):
         return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(["POST"])
+@permission_classes([check_user_rights(IndividualConfig.gql_individual_create_perms, )])
+def init_chunked_import(request):
+    try:
+        filename = request.POST.get('filename')
+        content_type = request.POST.get('content_type')
+        if not filename:
+            raise ValueError(f'File name not provided')
+        if not content_type:
+            raise ValueError(f'Content type not provided')
+        workflow, group_aggregation_column = _resolve_workflow_args(request)
+        result = IndividualChunkedUploadService(request.user).init_upload(
+            filename, content_type, workflow, group_aggregation_column
+        )
+        return Response(result)
+    except ValueError as e:
+        logger.error("Error while initializing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except FileExistsError as e:
+        logger.error("Error while initializing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        logger.error("Unexpected error while initializing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["POST"])
+@permission_classes([check_user_rights(IndividualConfig.gql_individual_create_perms, )])
+def append_import_chunk(request):
+    try:
+        upload_id = request.POST.get('upload_uuid')
+        chunk_index = request.POST.get('chunk_index')
+        chunk = request.FILES.get('chunk')
+        if not upload_id or chunk_index is None or not chunk:
+            raise ValueError(f'upload_uuid, chunk_index and chunk are required')
+        result = IndividualChunkedUploadService(request.user).append_chunk(upload_id, int(chunk_index), chunk)
+        return Response(result)
+    except ValueError as e:
+        logger.error("Error while uploading chunk", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error("Unexpected error while uploading chunk", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([check_user_rights(IndividualConfig.gql_individual_create_perms, )])
+def chunked_import_status(request):
+    try:
+        upload_id = request.query_params.get('upload_uuid')
+        if not upload_id:
+            raise ValueError(f'upload_uuid not provided')
+        received_chunks = IndividualChunkedUploadService(request.user).get_received_chunks(upload_id)
+        return Response({'success': True, 'data': {'upload_uuid': upload_id, 'received_chunks': received_chunks}})
+    except ValueError as e:
+        logger.error("Error while fetching chunked upload status", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error("Unexpected error while fetching chunked upload status", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["POST"])
+@permission_classes([check_user_rights(IndividualConfig.gql_individual_create_perms, )])
+def finalize_chunked_import(request):
+    try:
+        upload_id = request.POST.get('upload_uuid')
+        total_chunks = request.POST.get('total_chunks')
+        if not upload_id or total_chunks is None:
+            raise ValueError(f'upload_uuid and total_chunks are required')
+        result = IndividualChunkedUploadService(request.user).finalize_upload(upload_id, int(total_chunks))
+        if not result.get('success'):
+            raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
+        return Response(result)
+    except ValueError as e:
+        logger.error("Error while finalizing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except FileExistsError as e:
+        logger.error("Error while finalizing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        logger.error("Unexpected error while finalizing chunked upload", exc_info=e)
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["GET"])
 @permission_classes([check_user_rights(IndividualConfig.gql_individual_search_perms, )])
 def download_invalid_items(request):
@@ -159,15 +238,6 @@ def download_individual_upload(request):
         return Response({'success': False, 'error': str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def _handle_file_upload(file):
-    try:
-        target_file_path = IndividualConfig.get_individual_upload_file_path(file.name)
-        file_handler = DefaultStorageFileHandler(target_file_path)
-        file_handler.save_file(file)
-    except FileExistsError as exc:
-        raise exc
-
-
 def _remove_file(file):
     target_file_path = IndividualConfig.get_individual_upload_file_path(file.name)
     file_handler = DefaultStorageFileHandler(target_file_path)
@@ -176,28 +246,25 @@ def _remove_file(file):
 
 def _resolve_import_individuals_args(request):
     import_file = request.FILES.get('file')
+
+    if not import_file:
+        raise ValueError(f'Import file not provided')
+
+    workflow, group_aggregation_column = _resolve_workflow_args(request)
+
+    return import_file, workflow, group_aggregation_column
+
+
+def _resolve_workflow_args(request):
     workflow_name = request.POST.get('workflow_name')
     workflow_group = request.POST.get('workflow_group')
     group_aggregation_column = request.POST.get('group_aggregation_column')
 
-    if not import_file:
-        raise ValueError(f'Import file not provided')
     if not workflow_name:
         raise ValueError(f'Workflow name not provided')
     if not workflow_group:
         raise ValueError(f'Workflow group not provided')
 
-    result = WorkflowService.get_workflows(workflow_name, workflow_group)
-    if not result.get('success'):
-        raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
+    workflow = resolve_workflow(workflow_name, workflow_group)
 
-    workflows = result.get('data', {}).get('workflows')
-
-    if not workflows:
-        raise ValueError('Workflow not found: group={} name={}'.format(workflow_group, workflow_name))
-    if len(workflows) > 1:
-        raise ValueError('Multiple workflows found: group={} name={}'.format(workflow_group, workflow_name))
-
-    workflow = workflows[0]
-
-    return import_file, workflow, group_aggregation_column
+    return workflow, group_aggregation_column
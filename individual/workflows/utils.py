@@ -6,13 +6,17 @@ import logging
 from abc import ABCMeta, abstractmethod
 from typing import Iterable
 
-from django.db import ProgrammingError, connection
+from django.db import ProgrammingError, connection, transaction
 
 from core.models import User
 from individual.apps import IndividualConfig
-from individual.models import IndividualDataSource
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.profiling import upload_stage
 from individual.services import IndividualImportService
-from individual.utils import load_dataframe
+from individual.utils import (
+    fetch_upload_columns, update_upload_progress, count_imported_items, increment_upload_counters,
+    iter_pending_source_slices
+)
 from workflow.exceptions import PythonWorkflowHandlerException
 
 logger = logging.getLogger(__name__)
@@ -25,21 +29,28 @@ class BasePythonWorkflowExecutor(metaclass=ABCMeta):
         self.user_uuid = user_uuid
         self.user = User.objects.get(id=self.user_uuid)
         self.accepted = accepted
-        self._load_df()
+        self._load_upload_columns()
 
-    def _load_df(self):
-        df = load_dataframe(IndividualDataSource.objects.filter(upload_id=self.upload_uuid))
-        self.df = self.clean_data(df)
+    def _load_upload_columns(self):
+        # Only the headers and the number of rows are needed, the data sources are processed by the procedures
+        with upload_stage(self.upload_uuid, 'load_sources') as stage:
+            self.rows = IndividualDataSource.objects.filter(upload_id=self.upload_uuid, is_deleted=False).count()
+            columns = fetch_upload_columns(self.upload_uuid)
+            if self.rows:
+                # Id of the data source is passed to the procedures with every row
+                columns.add('id')
+            stage['rows'] = self.rows
+        self.columns = self.clean_columns(columns)
         self.schema = json.loads(IndividualConfig.individual_schema)
 
     @staticmethod
-    def clean_data(df):
-        if 'Unnamed: 0' in df.columns:
-            # Drop the 'Unnamed: 0' column
-            df.drop('Unnamed: 0', axis=1, inplace=True)
-            logger.info("Provided dataframe contains Unnamed column for python workflow. "
-                        "It'll be removed from upload.")
-        return df
+    def clean_columns(columns):
+        if 'Unnamed: 0' in columns:
+            # Ignore the 'Unnamed: 0' column
+            columns.discard('Unnamed: 0')
+            logger.info("Provided upload contains Unnamed column for python workflow. "
+                        "It'll be ignored by the upload.")
+        return columns
 
     def validate_dataframe_headers(self, is_update=False):
         """
@@ -49,7 +60,7 @@ class BasePythonWorkflowExecutor(metaclass=ABCMeta):
         3. 'id' is field automatically added to DataFrame which is used for upload.
         4. If action is data upload then 'ID' unique identifier is required as well.
         """
-        df_headers = set(self.df.columns)
+        df_headers = set(self.columns)
         schema_properties = set(self.schema.get('properties', {}).keys())
         schema_properties.update(['recipient_info', 'group_code', 'individual_role'])
         required_headers = {'first_name', 'last_name', 'dob', 'id'}
@@ -81,12 +92,17 @@ class SqlProcedurePythonWorkflow(BasePythonWorkflowExecutor):
     """
         Implementation of the PythonWorkflowExecutor that executes provided sql with
             current_upload_id, userUUID
-        parameters.
+        parameters. The sql is a call of a procedure installed by migrations, e.g.
+            SELECT individual_upload_valid_v1(%s::UUID, %s::UUID)
+        If slice_sql taking current_upload_id, userUUID and an array of data source ids is provided
+        and sql_procedure_batch_size is set, the upload is processed in slices, see _execute_sql_logic_in_slices.
     """
+    # Status of the upload after a sliced run of all data sources, None if it depends on their validation
+    sliced_run_status = None
 
-    def execute(self, sql: str, params: Iterable):
+    def execute(self, sql: str, params: Iterable, slice_sql: str = None):
         try:
-            self._execute_sql_logic(sql, params)
+            self._execute_sql_logic_or_slices(sql, params, slice_sql)
         except ProgrammingError as e:
             # The exception on procedure execution is handled by the procedure itself.
             logger.log(logging.WARNING, F'Error during individuals upload workflow, details:\n{str(e)}')
@@ -94,8 +110,18 @@ class SqlProcedurePythonWorkflow(BasePythonWorkflowExecutor):
         except Exception as e:
             raise PythonWorkflowHandlerException(str(e))
 
+    def _execute_sql_logic_or_slices(self, sql: str, params: Iterable, slice_sql: str = None):
+        if slice_sql and IndividualConfig.sql_procedure_batch_size:
+            if not connection.in_atomic_block:
+                self._execute_sql_logic_in_slices(slice_sql, IndividualConfig.sql_procedure_batch_size)
+                return
+            # Slices can't be committed separately inside of a transaction, e.g. of a caller running the workflow
+            logger.warning(f'Upload {self.upload_uuid} is processed inside of a transaction, '
+                           f'the procedure runs for the whole upload instead of slices')
+        self._execute_sql_logic(sql, params)
+
     def _execute_sql_logic(self, sql_func: str, params: Iterable):
-        with connection.cursor() as cursor:
+        with upload_stage(self.upload_uuid, 'sql_procedure', rows=self.rows), connection.cursor() as cursor:
             current_upload_id = self.upload_uuid
             userUUID = self.user_uuid
             accepted = self.accepted
@@ -105,6 +131,69 @@ class SqlProcedurePythonWorkflow(BasePythonWorkflowExecutor):
                 sql_func, params
             )
             # Process the cursor results or handle exceptions
+        update_upload_progress(self.upload_uuid, rows_imported=count_imported_items(self.upload_uuid))
+
+    def _execute_sql_logic_in_slices(self, slice_sql: str, slice_size: int):
+        """
+        Runs the procedure for slices of slice_size data sources ordered by id, every slice is committed with
+        the checkpoint of the upload, so locks are held and WAL is written per slice. A run resumes after
+        the checkpoint left by a failed one. Required fields are checked by the procedure for each slice,
+        slices committed before a failing one are kept.
+        Slices are committed only outside of a transaction, _execute_sql_logic_or_slices doesn't slice in an atomic
+        block. Called in one directly, slices are savepoints and nothing is committed before the outer block ends.
+        """
+        upload = IndividualDataSourceUpload.objects.get(id=self.upload_uuid)
+        accepted = self.accepted if isinstance(self.accepted, list) else None
+        # FAIL left by a resumed run would be taken for a failure of the first slice
+        self._set_upload_status(IndividualDataSourceUpload.Status.IN_PROGRESS)
+        update_upload_progress(self.upload_uuid, rows_imported=count_imported_items(self.upload_uuid))
+
+        with upload_stage(self.upload_uuid, 'sql_procedure', rows=self.rows) as stage:
+            stage['slices'] = 0
+            slices = iter_pending_source_slices(
+                self.upload_uuid, slice_size, after_id=upload.sql_procedure_checkpoint, accepted=accepted
+            )
+            for source_ids in slices:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(slice_sql, [self.upload_uuid, self.user_uuid, source_ids])
+                    # Procedures handle their errors, a failed slice is reported by the status of the upload
+                    if self._get_upload_status() == IndividualDataSourceUpload.Status.FAIL:
+                        logger.warning(f'Upload {self.upload_uuid} failed in the slice starting at {source_ids[0]}, '
+                                       f'the next run resumes from it')
+                        return
+                    IndividualDataSourceUpload.objects.filter(id=self.upload_uuid) \
+                        .update(sql_procedure_checkpoint=source_ids[-1])
+                    imported = IndividualDataSource.objects \
+                        .filter(id__in=source_ids, individual__isnull=False).count()
+                    increment_upload_counters(self.upload_uuid, rows_imported=imported)
+                stage['slices'] += 1
+
+        self._finish_sliced_run(upload.status if accepted is not None else None)
+
+    def _get_upload_status(self):
+        return IndividualDataSourceUpload.objects.filter(id=self.upload_uuid).values_list('status', flat=True).first()
+
+    def _set_upload_status(self, status, **fields):
+        # Plain UPDATE like the procedures do, the upload history is not changed
+        IndividualDataSourceUpload.objects.filter(id=self.upload_uuid).update(status=status, **fields)
+
+    def _finish_sliced_run(self, initial_status=None):
+        """
+        Sets the status like the procedures for the whole upload do. Runs for the accepted data sources keep
+        the status the upload had before the run, a resumed failed one ends with PARTIAL_SUCCESS.
+        """
+        if initial_status and initial_status != IndividualDataSourceUpload.Status.FAIL:
+            status = initial_status
+        elif initial_status:
+            status = IndividualDataSourceUpload.Status.PARTIAL_SUCCESS
+        elif self.sliced_run_status:
+            status = self.sliced_run_status
+        else:
+            data_sources = IndividualDataSource.objects.filter(upload_id=self.upload_uuid, is_deleted=False)
+            all_valid = data_sources.filter(validations__validation_errors=[]).count() == data_sources.count()
+            status = IndividualDataSourceUpload.Status.SUCCESS if all_valid \
+                else IndividualDataSourceUpload.Status.PARTIAL_SUCCESS
+        self._set_upload_status(status, error={}, sql_procedure_checkpoint=None)
 
 
 class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=ABCMeta):
@@ -130,14 +219,14 @@ class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=A
         """
         raise NotImplementedError()
 
-    def execute(self, sql):
+    def execute(self, sql, slice_sql=None):
         try:
             if self.should_create_task:
                 # If some records were not validated, call the task creation service
                 self._create_task_function()
             else:
                 # All records are fine, execute SQL logic
-                self._execute_sql_logic(sql)
+                self._execute_sql_logic_or_slices(sql, [self.upload_uuid, self.user_uuid], slice_sql)
         except ProgrammingError as e:
             import traceback
             # The exception on procedure execution is handled by the procedure itself.
@@ -150,6 +239,8 @@ class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=A
 
 
 class DataUploadWorkflow(MakerCheckerPythonWorkflowExecutor):
+    # Base upload procedures import all data sources
+    sliced_run_status = IndividualDataSourceUpload.Status.SUCCESS
 
     def __init__(self, upload_uuid, user_uuid, import_service=IndividualImportService):
         super().__init__(upload_uuid, user_uuid)
@@ -168,6 +259,8 @@ class DataUploadWorkflow(MakerCheckerPythonWorkflowExecutor):
 
 
 class DataUpdateWorkflow(MakerCheckerPythonWorkflowExecutor):
+    # Base update procedures end with PARTIAL_SUCCESS
+    sliced_run_status = IndividualDataSourceUpload.Status.PARTIAL_SUCCESS
 
     def __init__(self, upload_uuid, user_uuid, import_service=IndividualImportService):
         super().__init__(upload_uuid, user_uuid)
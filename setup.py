@@ -25,6 +25,10 @@ setup(
         'djangorestframework',
         'openimis-be-core'
     ],
+    extras_require={
+        'spreadsheets': ['openpyxl', 'xlrd'],
+        'parquet': ['pyarrow'],
+    },
     classifiers=[
         'Environment :: Web Environment',
         'Framework :: Django',